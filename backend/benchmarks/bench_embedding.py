@@ -0,0 +1,77 @@
+# backend/benchmarks/bench_embedding.py
+"""
+Embedding throughput benchmark using the local stub embedder.
+
+Compares one request per text (the old get_embedding loop), a single batched
+call, and many concurrent uploads coalesced by the shared EmbeddingBatcher.
+
+Run from backend/:  python -m benchmarks.bench_embedding
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.embedding_service import EmbeddingBatcher, StubEmbeddingBackend
+
+
+def make_texts(n: int):
+    return [f"Clause {i}: the party shall indemnify the other party against claim number {i}." for i in range(n)]
+
+
+def bench_per_item(texts, latency_ms):
+    backend = StubEmbeddingBackend(dimensions=256, request_latency_ms=latency_ms)
+    start = time.perf_counter()
+    for text in texts:
+        backend.embed([text])
+    return time.perf_counter() - start, backend.requests
+
+
+def bench_batched(texts, latency_ms, batch_size):
+    backend = StubEmbeddingBackend(dimensions=256, request_latency_ms=latency_ms)
+    batcher = EmbeddingBatcher(backend, max_batch_inputs=batch_size)
+    start = time.perf_counter()
+    batcher.embed(texts)
+    return time.perf_counter() - start, backend.requests
+
+
+def bench_coalesced(texts, latency_ms, batch_size, uploads):
+    backend = StubEmbeddingBackend(dimensions=256, request_latency_ms=latency_ms)
+    batcher = EmbeddingBatcher(backend, max_batch_inputs=batch_size)
+    per_upload = max(1, len(texts) // uploads)
+    parts = [texts[i:i + per_upload] for i in range(0, len(texts), per_upload)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+        # Each "upload" embeds its texts one at a time, like the old per-email loop
+        list(pool.map(lambda part: [batcher.embed([text]) for text in part], parts))
+    return time.perf_counter() - start, backend.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round-trip per request")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--uploads", type=int, default=20, help="concurrent uploads for the coalescing run")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    results = {}
+    for name, run in [
+        ("per_item", lambda: bench_per_item(texts, args.latency_ms)),
+        ("batched", lambda: bench_batched(texts, args.latency_ms, args.batch_size)),
+        ("coalesced", lambda: bench_coalesced(texts, args.latency_ms, args.batch_size, args.uploads)),
+    ]:
+        seconds, requests = run()
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "requests": requests,
+            "texts_per_sec": round(len(texts) / seconds, 1),
+        }
+
+    print(json.dumps({"benchmark": "embedding", "params": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
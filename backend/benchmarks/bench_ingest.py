@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_ingest.py
+"""
+Ingestion throughput (docs/sec, chunks/sec) with stub embeddings.
+
+Generates synthetic contract-like .txt files and runs them through the same
+path as uploads (parse, chunk, embed, Chroma upsert, lexical index), serially
+and with concurrent workers. Per-stage time comes from the metrics histograms.
+
+Run from backend/:  python -m benchmarks.bench_ingest --docs 50 --workers 1 4
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import make_document, report, use_offline_backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=30, help="paragraphs per document")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--embed-request-latency-ms", type=float, default=0.0, help="simulated embedding round-trip")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    data_dir = use_offline_backends(
+        EMBEDDING_STUB_DIMENSIONS=args.dimensions,
+        EMBEDDING_STUB_REQUEST_LATENCY_MS=args.embed_request_latency_ms,
+        EMBEDDING_CACHE_ENABLED="false",
+    )
+    from services import metrics
+    from services.document_service import document_source_id, ingest_document_file
+
+    rng = random.Random(args.seed)
+    doc_dir = os.path.join(data_dir, "docs")
+    os.makedirs(doc_dir, exist_ok=True)
+    paths = []
+    total_bytes = 0
+    for i in range(args.docs):
+        path = os.path.join(doc_dir, f"contract_{i}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            total_bytes += f.write(make_document(rng, i, args.paragraphs))
+        paths.append(path)
+
+    results = []
+    for run, workers in enumerate(args.workers):
+        client_id = 1000 + run
+        stages_before = {stage: metrics.STAGE_SECONDS.snapshot(stage=stage) or {"count": 0, "sum": 0.0}
+                         for stage in ("parse", "chunk", "embed", "chroma_add", "lexical_add")}
+
+        def ingest(doc):
+            path = paths[doc]
+            return ingest_document_file(client_id, document_source_id(doc), path, os.path.basename(path), "txt")["chunks"]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunks = sum(pool.map(ingest, range(len(paths))))
+        seconds = time.perf_counter() - start
+
+        stage_seconds = {}
+        for stage, before in stages_before.items():
+            after = metrics.STAGE_SECONDS.snapshot(stage=stage) or {"count": 0, "sum": 0.0}
+            stage_seconds[stage] = round(after["sum"] - before["sum"], 4)
+        results.append({
+            "workers": workers,
+            "documents": len(paths),
+            "chunks": chunks,
+            "seconds": round(seconds, 4),
+            "docs_per_sec": round(len(paths) / seconds, 2),
+            "chunks_per_sec": round(chunks / seconds, 1),
+            "mb_per_sec": round(total_bytes / seconds / 1e6, 3),
+            # Summed over workers, so stages can add up to more than wall time
+            "stage_seconds": stage_seconds,
+        })
+
+    report("ingest", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
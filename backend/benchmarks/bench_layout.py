@@ -0,0 +1,169 @@
+# backend/benchmarks/bench_layout.py
+"""
+Per-client vs shared Chroma layout: load time, memory, open files and query latency.
+
+For each layout, one process loads --clients tenants of --chunks-per-client
+synthetic chunks, then a fresh process queries random tenants, so memory and
+file-descriptor counts reflect a server that has touched every tenant.
+Queries run in vector mode, since the lexical index is the same in both.
+
+Run from backend/:  python -m benchmarks.bench_layout --clients 200 --chunks-per-client 200 --shards 1 4
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_paragraph, make_question, percentiles, report, use_offline_backends
+
+PHASE_MARKER = "BENCH_LAYOUT_RESULT "
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def open_files() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def disk_usage(path: str) -> dict:
+    files = size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return {"files": files, "mb": round(size / 1e6, 1)}
+
+
+def load_phase(args) -> dict:
+    from services.vector_service import add_texts_to_vectorstore
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    for client_id in range(1, args.clients + 1):
+        texts = [make_paragraph(rng, client_id, i, sentences=2) for i in range(args.chunks_per_client)]
+        metadatas = [
+            {"source_type": "document", "filename": f"contract_{i // 20}.txt",
+             "source_id": f"bench_doc_{i // 20}", "chunk_index": i % 20}
+            for i in range(args.chunks_per_client)
+        ]
+        add_texts_to_vectorstore(client_id, texts, metadatas, replace_sources=False)
+    seconds = time.perf_counter() - start
+    chunks = args.clients * args.chunks_per_client
+    return {"load_seconds": round(seconds, 3), "load_chunks_per_sec": round(chunks / seconds, 1)}
+
+
+def query_phase(args) -> dict:
+    start = time.perf_counter()
+    from services.vector_service import similarity_search
+    rng = random.Random(args.seed + 1)
+    similarity_search(rng.randint(1, args.clients), make_question(rng), k=args.k, mode="vector")
+    first_query = time.perf_counter() - start
+    baseline_rss = rss_mb()
+
+    samples = []
+    for _ in range(args.queries):
+        client_id = rng.randint(1, args.clients)
+        question = make_question(rng)
+        start = time.perf_counter()
+        results = similarity_search(client_id, question, k=args.k, mode="vector")
+        samples.append(time.perf_counter() - start)
+        if len(results["ids"][0]) != min(args.k, args.chunks_per_client):
+            raise RuntimeError(f"client {client_id} got {len(results['ids'][0])} results")
+
+    # Then every tenant once, as a long-running server eventually would
+    for client_id in range(1, args.clients + 1):
+        similarity_search(client_id, make_question(rng), k=args.k, mode="vector")
+    return {
+        "first_query_ms": round(first_query * 1000, 1),
+        "rss_after_first_query_mb": baseline_rss,
+        "rss_after_all_clients_mb": rss_mb(),
+        "open_files_after_all_clients": open_files(),
+        "query": percentiles(samples),
+    }
+
+
+def run_phase(phase: str, layout: str, shards: int, data_dir: str, args) -> dict:
+    command = [
+        sys.executable, "-m", "benchmarks.bench_layout", "--phase", phase, "--layout", layout,
+        "--shards", str(shards), "--data-dir", data_dir, "--clients", str(args.clients),
+        "--chunks-per-client", str(args.chunks_per_client), "--queries", str(args.queries),
+        "--k", str(args.k), "--dimensions", str(args.dimensions),
+        "--max-open-clients", str(args.max_open_clients), "--seed", str(args.seed),
+    ]
+    output = subprocess.run(command, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    for line in output.splitlines():
+        if line.startswith(PHASE_MARKER):
+            return json.loads(line[len(PHASE_MARKER):])
+    raise RuntimeError(f"{phase} phase for {layout} printed no result")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--chunks-per-client", type=int, default=200)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1], help="shard counts to try for the shared layout")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--max-open-clients", type=int, default=64, help="per-client layout's open store limit")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    # Internal: one phase of one layout, run in a fresh process
+    parser.add_argument("--phase", choices=["load", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--layout", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        use_offline_backends(
+            args.data_dir,
+            CHROMA_LAYOUT=args.layout,
+            CHROMA_SHARDS=args.shards[0],
+            CHROMA_MAX_OPEN_CLIENTS=args.max_open_clients,
+            EMBEDDING_STUB_DIMENSIONS=args.dimensions,
+            EMBEDDING_CACHE_ENABLED="false",
+            QUERY_EMBEDDING_CACHE_SIZE=0,
+        )
+        result = load_phase(args) if args.phase == "load" else query_phase(args)
+        print(PHASE_MARKER + json.dumps(result))
+        return
+
+    layouts = [("per_client", 1)] + [("shared", shards) for shards in args.shards]
+    results = []
+    for layout, shards in layouts:
+        data_dir = tempfile.mkdtemp(prefix=f"lexsy_layout_{layout}_")
+        loaded = run_phase("load", layout, shards, data_dir, args)
+        queried = run_phase("query", layout, shards, data_dir, args)
+        results.append({
+            "layout": layout,
+            "shards": shards if layout == "shared" else None,
+            **loaded,
+            **queried,
+            "disk": disk_usage(os.path.join(data_dir, "chroma")),
+        })
+
+    params = {key: value for key, value in vars(args).items() if key not in ("phase", "layout", "data_dir")}
+    report("layout", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# backend/benchmarks/bench_load.py
+"""
+Concurrent-user load test against the FastAPI app, fully offline.
+
+Seeds a few clients with synthetic documents, then has N simulated users
+each send questions back to back to /api/chat/{id}/ask (or the streaming
+endpoint) through httpx's in-process ASGI transport. The stub chat model's
+latency is configurable, so the app's own overhead and its behaviour under
+concurrency (queueing, 503s from the concurrency limiter) can be measured.
+Streaming runs report the server-measured time to first token, since the
+ASGI transport buffers response bodies.
+
+Run from backend/:  python -m benchmarks.bench_load --users 1 10 50 --llm-latency-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import (
+    init_database, make_document, make_question, percentiles, report, use_offline_backends
+)
+
+
+def seed_clients(clients: int, docs: int, paragraphs: int, rng: random.Random):
+    from services.document_service import document_source_id, index_document
+    from services.vector_service import similarity_search
+    for client_id in range(1, clients + 1):
+        for doc in range(docs):
+            index_document(client_id, document_source_id(doc), f"contract_{doc}.txt", [(make_document(rng, doc, paragraphs), None)])
+        # One query per client first, as a warm server would have had: the first
+        # concurrent HNSW queries in a fresh process can deadlock on lazy imports
+        similarity_search(client_id, make_question(rng))
+
+
+async def simulate_user(client: httpx.AsyncClient, rng: random.Random, clients: int, requests: int,
+                        stream: bool, stats: dict):
+    for _ in range(requests):
+        client_id = rng.randint(1, clients)
+        path = f"/api/chat/{client_id}/ask" + ("/stream" if stream else "")
+        data = {"question": make_question(rng)}
+        start = time.perf_counter()
+        try:
+            if stream:
+                async with client.stream("POST", path, data=data) as response:
+                    status = str(response.status_code)
+                    event = None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                            if event == "error":
+                                status = "stream_error"
+                        elif line.startswith("data: ") and event == "done":
+                            # The ASGI transport buffers the body, so use the server's own measurement
+                            done = json.loads(line[len("data: "):])
+                            stats["first_token"].append(done["time_to_first_token_ms"] / 1000)
+            else:
+                response = await client.post(path, data=data)
+                status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        stats["latency"].append(time.perf_counter() - start)
+        stats["status"][status] += 1
+
+
+async def run_level(app, users: int, args, rng: random.Random) -> dict:
+    stats = {"latency": [], "first_token": [], "status": Counter()}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_user(client, random.Random(rng.random()), args.clients, args.requests_per_user,
+                          args.stream, stats)
+            for _ in range(users)
+        ))
+        seconds = time.perf_counter() - start
+    total = sum(stats["status"].values())
+    result = {
+        "users": users,
+        "requests": total,
+        "seconds": round(seconds, 3),
+        "requests_per_sec": round(total / seconds, 2),
+        "errors": total - stats["status"].get("200", 0),
+        "status": dict(stats["status"]),
+        "latency": percentiles(stats["latency"]),
+    }
+    if args.stream:
+        result["first_token"] = percentiles(stats["first_token"])
+    return result
+
+
+async def run(args, rng: random.Random):
+    import main
+    # httpx's ASGI transport doesn't send lifespan events, so run startup/shutdown here
+    async with main.app.router.lifespan_context(main.app):
+        return [await run_level(main.app, users, args, rng) for users in args.users]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests-per-user", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--docs", type=int, default=10, help="documents per client")
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--stream", action="store_true", help="use the SSE endpoint and report time to first token")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="stub model time to first token")
+    parser.add_argument("--llm-token-latency-ms", type=float, default=5.0, help="stub model time per token")
+    parser.add_argument("--answer-cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    use_offline_backends(
+        LLM_STUB_LATENCY_MS=args.llm_latency_ms,
+        LLM_STUB_TOKEN_LATENCY_MS=args.llm_token_latency_ms,
+        ANSWER_CACHE_ENABLED=str(args.answer_cache).lower(),
+        EMBEDDING_STUB_DIMENSIONS=256,
+    )
+    init_database()
+    rng = random.Random(args.seed)
+    seed_clients(args.clients, args.docs, args.paragraphs, rng)
+    results = asyncio.run(run(args, rng))
+    report("load", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_pdf_extraction.py
+"""
+Serial vs. parallel PDF text extraction on generated multi-page PDFs.
+
+Run from backend/:  python -m benchmarks.bench_pdf_extraction --pages 100 500
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from config import get_settings
+from services.concurrency import get_process_executor
+from services.document_service import extract_segments
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Write a plain PDF with `pages` pages of Helvetica text"""
+    objects = []
+    page_ids = []
+    font_id = 3
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for p in range(pages):
+        lines = [
+            f"{p + 1}.{n + 1} The Company shall pay the Consultant within thirty days of invoice number {p * 100 + n}."
+            for n in range(lines_per_page)
+        ]
+        body = "BT /F1 9 Tf 11 TL 40 780 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = body.encode("latin-1")
+        content_id = font_id + len(objects)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(font_id + len(objects))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    all_objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages]
+    all_objects += objects
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(all_objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(all_objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(all_objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def time_extraction(path: str, parallel: bool):
+    start = time.perf_counter()
+    segments = extract_segments(path, "pdf", parallel=parallel)
+    return time.perf_counter() - start, segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100, 500])
+    args = parser.parse_args()
+
+    settings = get_settings()
+    get_process_executor().submit(int).result()  # start the pool outside the timings
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"bench_{pages}.pdf")
+            make_pdf(path, pages)
+            serial_s, serial_segments = time_extraction(path, parallel=False)
+            parallel_s, parallel_segments = time_extraction(path, parallel=True)
+            assert serial_segments == parallel_segments, "parallel extraction changed page order or text"
+            results.append({
+                "pages": pages,
+                "serial_seconds": round(serial_s, 4),
+                "parallel_seconds": round(parallel_s, 4),
+                "speedup": round(serial_s / parallel_s, 2) if parallel_s else None,
+            })
+
+    print(json.dumps({
+        "benchmark": "pdf_extraction",
+        "params": {
+            "parse_pool_size": settings.parse_pool_size,
+            "pdf_max_workers_per_document": settings.pdf_max_workers_per_document,
+            "pdf_pages_per_task": settings.pdf_pages_per_task,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_query.py
+"""
+Query latency percentiles as one client's corpus grows.
+
+Loads synthetic chunks (stub embeddings, small dimensions) into a single
+client's collection in steps, and after each step times similarity_search in
+vector and hybrid mode, a vector search narrowed to a few sources, and the
+two-stage tier (document centroids first, then their chunks) in both modes.
+Loading a million chunks takes a while; pass --sizes to pick the steps.
+
+Run from backend/:  python -m benchmarks.bench_query --sizes 1000 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import make_paragraph, make_question, percentiles, report, use_offline_backends
+
+CLIENT_ID = 1
+
+
+def load_chunks(add_texts, rng, start: int, end: int, chunks_per_doc: int, batch_size: int):
+    """Add chunks start..end-1, grouped into documents of chunks_per_doc chunks"""
+    for batch_start in range(start, end, batch_size):
+        texts, metadatas = [], []
+        for n in range(batch_start, min(end, batch_start + batch_size)):
+            doc, index = divmod(n, chunks_per_doc)
+            texts.append(make_paragraph(rng, doc, index, sentences=2))
+            metadatas.append({
+                "source_type": "document",
+                "filename": f"contract_{doc}.txt",
+                "source_id": f"bench_doc_{doc}",
+                "chunk_index": index,
+            })
+        add_texts(CLIENT_ID, texts, metadatas, replace_sources=False)
+
+
+def time_queries(search, questions, **kwargs):
+    samples = []
+    for question in questions:
+        start = time.perf_counter()
+        search(CLIENT_ID, question, **kwargs)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=100, help="queries per mode and size")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--filter-sources", type=int, default=5, help="sources in the narrowed search")
+    parser.add_argument("--source-candidates", type=int, default=8, help="documents searched by the two-stage tier")
+    parser.add_argument("--dimensions", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    use_offline_backends(
+        EMBEDDING_STUB_DIMENSIONS=args.dimensions,
+        EMBEDDING_CACHE_ENABLED="false",
+        # Every timed query pays for its embedding, as a new question would
+        QUERY_EMBEDDING_CACHE_SIZE=0,
+        ANSWER_CACHE_ENABLED="false",
+    )
+    from services.vector_service import add_texts_to_vectorstore, similarity_search, update_source_vectors
+
+    rng = random.Random(args.seed)
+    results = []
+    loaded = 0
+    for size in sorted(args.sizes):
+        start = time.perf_counter()
+        load_chunks(add_texts_to_vectorstore, rng, loaded, size, args.chunks_per_doc, args.batch_size)
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        update_source_vectors(CLIENT_ID, {
+            f"bench_doc_{doc}" for doc in range(loaded // args.chunks_per_doc, (size - 1) // args.chunks_per_doc + 1)
+        })
+        source_index_seconds = time.perf_counter() - start
+        added, loaded = size - loaded, size
+
+        questions = [make_question(rng) for _ in range(args.queries)]
+        similarity_search(CLIENT_ID, questions[0], k=args.k, mode="hybrid")  # warm up
+        docs = max(1, size // args.chunks_per_doc)
+        source_ids = [f"bench_doc_{rng.randrange(docs)}" for _ in range(args.filter_sources)]
+        results.append({
+            "chunks": size,
+            "load_seconds": round(load_seconds, 3),
+            "load_chunks_per_sec": round(added / load_seconds, 1) if load_seconds else None,
+            "source_index_seconds": round(source_index_seconds, 3),
+            "vector": time_queries(similarity_search, questions, k=args.k, mode="vector"),
+            "hybrid": time_queries(similarity_search, questions, k=args.k, mode="hybrid"),
+            "vector_filtered": time_queries(
+                similarity_search, questions, k=args.k, mode="vector", source_ids=source_ids
+            ),
+            "two_stage_vector": time_queries(
+                similarity_search, questions, k=args.k, mode="vector", tier="two_stage",
+                source_candidates=args.source_candidates,
+            ),
+            "two_stage_hybrid": time_queries(
+                similarity_search, questions, k=args.k, mode="hybrid", tier="two_stage",
+                source_candidates=args.source_candidates,
+            ),
+        })
+
+    report("query", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
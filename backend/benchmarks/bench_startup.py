@@ -0,0 +1,119 @@
+# backend/benchmarks/bench_startup.py
+"""
+Cold start: import time, time to /health and /ready, and the first question's latency.
+
+Each run is a fresh process that imports the app, starts its lifespan with
+STARTUP_PREWARM=<mode>, polls /ready and then asks one question of a seeded
+client, so the first query shows what the warm-up saved. Times are measured
+from just before the app import (interpreter start-up is not included).
+The heaviest packages on the import path come from `python -X importtime`.
+
+Run from backend/:  python -m benchmarks.bench_startup --runs 5 --modes off background blocking
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+
+START = time.perf_counter()
+
+from benchmarks.common import init_database, make_document, percentiles, report, use_offline_backends  # noqa: E402
+
+RUN_MARKER = "BENCH_STARTUP_RESULT "
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$")
+
+
+def serve_run(args) -> dict:
+    import asyncio
+    use_offline_backends(args.data_dir, STARTUP_PREWARM=args.mode, CHROMA_WARM_CLIENTS="1")
+
+    import_start = time.perf_counter()
+    import httpx
+    import main
+    imported = time.perf_counter() - import_start
+
+    async def run():
+        result = {"import_seconds": imported}
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                (await client.get("/health")).raise_for_status()
+                result["health_seconds"] = time.perf_counter() - START
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.01)
+                result["ready_seconds"] = time.perf_counter() - START
+                start = time.perf_counter()
+                response = await client.post("/api/chat/1/ask", data={"question": "What are the termination terms?"})
+                response.raise_for_status()
+                result["first_query_seconds"] = time.perf_counter() - start
+        return result
+
+    return asyncio.run(run())
+
+
+def seed(data_dir: str, paragraphs: int):
+    use_offline_backends(data_dir)
+    init_database()
+    from services.document_service import document_source_id, index_document
+    index_document(1, document_source_id(1), "contract.txt", [(make_document(random.Random(7), 1, paragraphs), None)])
+
+
+def heaviest_imports(top: int) -> dict:
+    """Cumulative import time (ms) of the largest top-level packages imported by main"""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True,
+                            text=True, cwd=BACKEND_DIR, env={**os.environ, "STARTUP_PREWARM": "off"}).stderr
+    packages = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match or match.group(2) == "main":
+            continue
+        package = match.group(2).split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(match.group(1)))
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {package: round(us / 1000, 1) for package, us in ranked}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["off", "background", "blocking"])
+    parser.add_argument("--paragraphs", type=int, default=40, help="size of the seeded document")
+    parser.add_argument("--top-imports", type=int, default=12)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    # Internal: one start-up in a fresh process
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(RUN_MARKER + json.dumps(serve_run(args)))
+        return
+
+    data_dir = use_offline_backends()
+    seed(data_dir, args.paragraphs)
+    results = []
+    for mode in args.modes:
+        runs = []
+        for _ in range(args.runs):
+            command = [sys.executable, "-m", "benchmarks.bench_startup", "--mode", mode, "--data-dir", data_dir]
+            output = subprocess.run(command, capture_output=True, text=True, check=True, cwd=BACKEND_DIR).stdout
+            line = next(line for line in output.splitlines() if line.startswith(RUN_MARKER))
+            runs.append(json.loads(line[len(RUN_MARKER):]))
+        results.append({
+            "mode": mode,
+            **{key.replace("_seconds", ""): percentiles([run[key] for run in runs]) for key in runs[0]},
+        })
+
+    results.append({"heaviest_imports_ms": heaviest_imports(args.top_imports)})
+    params = {key: value for key, value in vars(args).items() if key not in ("mode", "data_dir")}
+    report("startup", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
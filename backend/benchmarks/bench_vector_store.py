@@ -0,0 +1,126 @@
+# backend/benchmarks/bench_vector_store.py
+"""
+Recall and latency of the vector store backends: Chroma (HNSW) against the
+NumPy memory-mapped store in float16 and int8.
+
+Loads the same synthetic chunks (stub embeddings) into each backend, then
+compares each backend's top k with the exact float32 neighbours (recall@k)
+and times single queries, a 32-query batch, and queries filtered to a few
+sources.
+
+Run from backend/:  python -m benchmarks.bench_vector_store --chunks 10000 50000 --dimensions 384
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import make_paragraph, make_question, percentiles, report, use_offline_backends
+
+CHUNKS_PER_DOC = 20
+
+
+def dir_mb(path: str) -> float:
+    return round(sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 1e6, 1)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    distances = (queries ** 2).sum(axis=1)[:, None] + (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def bench_backend(collection, ids, vectors, documents, metadatas, queries, truth, args, rng) -> dict:
+    start = time.perf_counter()
+    for batch in range(0, len(ids), args.batch_size):
+        end = batch + args.batch_size
+        collection.upsert(ids=ids[batch:end], embeddings=vectors[batch:end].tolist(),
+                          documents=documents[batch:end], metadatas=metadatas[batch:end])
+    load_seconds = time.perf_counter() - start
+
+    samples, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=args.k)
+        samples.append(time.perf_counter() - start)
+        found.append(result["ids"][0])
+    recall = np.mean([
+        len(set(hits) & {ids[i] for i in expected}) / args.k for hits, expected in zip(found, truth)
+    ])
+
+    batch_samples = []
+    for start_index in range(0, len(queries), 32):
+        batch = queries[start_index:start_index + 32].tolist()
+        start = time.perf_counter()
+        collection.query(query_embeddings=batch, n_results=args.k)
+        batch_samples.append((time.perf_counter() - start) / len(batch))
+
+    docs = len(ids) // CHUNKS_PER_DOC
+    filtered = []
+    for query in queries[:50]:
+        sources = [f"bench_doc_{rng.randrange(docs)}" for _ in range(5)]
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=args.k,
+                         where={"source_id": {"$in": sources}})
+        filtered.append(time.perf_counter() - start)
+
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "load_chunks_per_sec": round(len(ids) / load_seconds, 1),
+        f"recall_at_{args.k}": round(float(recall), 4),
+        "query": percentiles(samples),
+        "batched_query_per_question": percentiles(batch_samples),
+        "filtered_query": percentiles(filtered),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy-float16", "numpy-int8"])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    data_dir = use_offline_backends(EMBEDDING_STUB_DIMENSIONS=args.dimensions)
+    from services.chroma_registry import ChromaClientRegistry
+    from services.embedding_service import StubEmbeddingBackend
+    from services.numpy_store import NumpyStoreRegistry
+
+    embedder = StubEmbeddingBackend(dimensions=args.dimensions)
+    rng = random.Random(args.seed)
+    results = []
+    for size in args.chunks:
+        texts = [make_paragraph(rng, n // CHUNKS_PER_DOC, n % CHUNKS_PER_DOC, sentences=2) for n in range(size)]
+        vectors = np.asarray(embedder.embed(texts), dtype=np.float32)
+        ids = [f"bench_doc_{n // CHUNKS_PER_DOC}:{n % CHUNKS_PER_DOC}" for n in range(size)]
+        metadatas = [{"source_id": f"bench_doc_{n // CHUNKS_PER_DOC}", "chunk_index": n % CHUNKS_PER_DOC}
+                     for n in range(size)]
+        queries = np.asarray(embedder.embed([make_question(rng) for _ in range(args.queries)]), dtype=np.float32)
+        truth = exact_neighbours(vectors, queries, args.k)
+
+        for backend in args.backends:
+            base_dir = tempfile.mkdtemp(prefix=f"{backend}_", dir=data_dir)
+            if backend == "chroma":
+                registry = ChromaClientRegistry(base_dir)
+            else:
+                registry = NumpyStoreRegistry(base_dir, dtype=backend.split("-", 1)[1])
+            collection = registry.get_collection(1)
+            result = bench_backend(collection, ids, vectors, texts, metadatas, queries, truth, args, rng)
+            results.append({"backend": backend, "chunks": size, **result, "disk_mb": dir_mb(base_dir)})
+            registry.evict(1)
+
+    report("vector_store", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
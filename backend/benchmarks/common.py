@@ -0,0 +1,125 @@
+# backend/benchmarks/common.py
+"""
+Shared helpers for the offline benchmarks.
+
+Call use_offline_backends() before importing config or services: settings
+are read once per process, so the environment must be in place first.
+"""
+
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from typing import List
+
+WORDS = (
+    "agreement party parties shall indemnify liability clause section term termination notice breach "
+    "warranty representation confidential information payment invoice fee schedule exhibit governing "
+    "law jurisdiction dispute arbitration assignment consent amendment waiver severability force majeure "
+    "license intellectual property employee contractor equity option vesting cliff acceleration board "
+    "approval shareholder director officer lease premises landlord tenant rent deposit renewal"
+).split()
+NAMES = ["John Smith", "Jane Doe", "Acme Corp", "Globex LLC", "Initech Inc", "Maria Garcia", "Wei Chen"]
+
+
+def use_offline_backends(data_dir: str = None, **overrides) -> str:
+    """
+    Point the app at stub embeddings, the stub chat model, the fake Gmail API
+    and throwaway storage. Explicit environment variables still win, except
+    for `overrides`, which always apply. Returns the data directory.
+    """
+    data_dir = data_dir or tempfile.mkdtemp(prefix="lexsy_bench_")
+    defaults = {
+        "EMBEDDING_BACKEND": "stub",
+        "LLM_BACKEND": "stub",
+        "GMAIL_BACKEND": "fake",
+        "CHROMA_PERSIST_DIR": os.path.join(data_dir, "chroma"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(data_dir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(data_dir, "uploads"),
+        "INGEST_WORKERS": "0",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    for key, value in overrides.items():
+        os.environ[key.upper()] = str(value)
+    return data_dir
+
+
+def init_database():
+    """Create the tables in the benchmark database"""
+    import init_db  # noqa: F401 - creates tables on import
+
+
+def make_paragraph(rng: random.Random, doc: int, index: int, sentences: int = 4) -> str:
+    parts = []
+    for s in range(sentences):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18)))
+        parts.append(f"{words.capitalize()} under section {doc}.{index}.{s} involving {rng.choice(NAMES)}.")
+    return " ".join(parts)
+
+
+def make_document(rng: random.Random, doc: int, paragraphs: int) -> str:
+    """A synthetic contract-like text with numbered sections"""
+    blocks = []
+    for p in range(paragraphs):
+        if p % 5 == 0:
+            blocks.append(f"SECTION {p // 5 + 1}. {rng.choice(WORDS).upper()}")
+        blocks.append(make_paragraph(rng, doc, p))
+    return "\n\n".join(blocks)
+
+
+def make_question(rng: random.Random) -> str:
+    return f"What does the {rng.choice(WORDS)} {rng.choice(WORDS)} clause say about {rng.choice(NAMES)}?"
+
+
+def percentiles(samples: List[float]) -> dict:
+    """Latency summary in milliseconds for samples given in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p90_ms": round(pick(0.90), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def environment() -> dict:
+    """What the numbers were measured on, so runs from different commits can be compared"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "git_commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def report(benchmark: str, params: dict, results, output: str = None) -> dict:
+    """Print the result document as JSON and optionally write it to a file"""
+    document = {"benchmark": benchmark, "environment": environment(), "params": params, "results": results}
+    text = json.dumps(document, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return document
@@ -0,0 +1,73 @@
+# backend/benchmarks/compare.py
+"""
+Compare two benchmark result files and flag regressions.
+
+Walks both JSON documents in parallel and compares every numeric leaf whose
+name says which direction is better: *_ms and *seconds are lower-is-better,
+*_per_sec higher-is-better. Exits 1 if any metric got worse by more than
+--threshold (a fraction), so it can gate CI.
+
+Run from backend/:  python -m benchmarks.compare baseline.json current.json --threshold 0.2
+"""
+
+import argparse
+import json
+import sys
+
+
+def direction(name: str):
+    """+1 if higher is better, -1 if lower is better, None if not a compared metric"""
+    if name.endswith("_per_sec"):
+        return 1
+    if name.endswith("_ms") or name.endswith("seconds"):
+        return -1
+    return None
+
+
+def compare(baseline, current, path: str = ""):
+    """Yield (path, baseline, current, relative change for the better) for comparable leaves"""
+    if isinstance(baseline, dict) and isinstance(current, dict):
+        for key in baseline:
+            if key in current and key not in ("environment", "params"):
+                yield from compare(baseline[key], current[key], f"{path}.{key}" if path else key)
+    elif isinstance(baseline, list) and isinstance(current, list):
+        for i, (b, c) in enumerate(zip(baseline, current)):
+            yield from compare(b, c, f"{path}[{i}]")
+    elif isinstance(baseline, (int, float)) and isinstance(current, (int, float)):
+        sign = direction(path.rsplit(".", 1)[-1])
+        if sign is not None and baseline:
+            yield path, baseline, current, sign * (current - baseline) / abs(baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("benchmark") != current.get("benchmark"):
+        sys.exit(f"Different benchmarks: {baseline.get('benchmark')} vs {current.get('benchmark')}")
+
+    rows = list(compare(baseline["results"], current["results"]))
+    regressions = [row for row in rows if row[3] < -args.threshold]
+    print(json.dumps({
+        "benchmark": current["benchmark"],
+        "baseline_commit": baseline.get("environment", {}).get("git_commit"),
+        "current_commit": current.get("environment", {}).get("git_commit"),
+        "threshold": args.threshold,
+        "compared": len(rows),
+        "regressions": [
+            {"metric": path, "baseline": b, "current": c, "change": round(change, 4)}
+            for path, b, c, change in regressions
+        ],
+    }, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
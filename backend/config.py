@@ -12,10 +12,110 @@ class Settings(BaseSettings):
     # Database settings
     database_url: str = Field(default="sqlite:///./lexsy.db", env="DATABASE_URL")
     chroma_persist_dir: str = Field(default="./chroma", env="CHROMA_PERSIST_DIR")
+    chroma_layout: str = Field(default="per_client", env="CHROMA_LAYOUT")  # per_client | shared
+    chroma_shards: int = Field(default=1, env="CHROMA_SHARDS")  # collections in the shared layout
+    vector_store_backend: str = Field(default="chroma", env="VECTOR_STORE_BACKEND")  # chroma | numpy
+    numpy_store_dtype: str = Field(default="float16", env="NUMPY_STORE_DTYPE")  # float16 | int8
+    chroma_max_open_clients: int = Field(default=64, env="CHROMA_MAX_OPEN_CLIENTS")
+    chroma_warm_clients: str = Field(default="", env="CHROMA_WARM_CLIENTS")  # comma-separated client IDs to open at startup
+    
+    # Chunking settings
+    chunk_size_tokens: int = Field(default=400, env="CHUNK_SIZE_TOKENS")
+    chunk_overlap_tokens: int = Field(default=50, env="CHUNK_OVERLAP_TOKENS")
+    tokenizer_encoding: str = Field(default="cl100k_base", env="TOKENIZER_ENCODING")
+    
+    # Embedding settings
+    embedding_backend: str = Field(default="openai", env="EMBEDDING_BACKEND")  # openai | stub
+    embedding_model: str = Field(default="text-embedding-ada-002", env="EMBEDDING_MODEL")
+    embedding_batch_size: int = Field(default=256, env="EMBEDDING_BATCH_SIZE")
+    embedding_batch_max_tokens: int = Field(default=100000, env="EMBEDDING_BATCH_MAX_TOKENS")
+    embedding_max_input_tokens: int = Field(default=8191, env="EMBEDDING_MAX_INPUT_TOKENS")
+    embedding_batch_max_wait_ms: int = Field(default=10, env="EMBEDDING_BATCH_MAX_WAIT_MS")
+    embedding_max_concurrent_batches: int = Field(default=4, env="EMBEDDING_MAX_CONCURRENT_BATCHES")
+    embedding_timeout_seconds: float = Field(default=300.0, env="EMBEDDING_TIMEOUT_SECONDS")  # max wait for a call's vectors, queueing included
+    embedding_stub_dimensions: int = Field(default=1536, env="EMBEDDING_STUB_DIMENSIONS")
+    embedding_stub_request_latency_ms: float = Field(default=0.0, env="EMBEDDING_STUB_REQUEST_LATENCY_MS")
+    embedding_stub_item_latency_ms: float = Field(default=0.0, env="EMBEDDING_STUB_ITEM_LATENCY_MS")
+    embedding_cache_enabled: bool = Field(default=True, env="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_path: str = Field(default="", env="EMBEDDING_CACHE_PATH")  # defaults to <chroma_persist_dir>/embedding_cache.sqlite3
+    embedding_cache_max_entries: int = Field(default=200000, env="EMBEDDING_CACHE_MAX_ENTRIES")
+    query_embedding_cache_size: int = Field(default=1024, env="QUERY_EMBEDDING_CACHE_SIZE")
+    
+    # Answer cache settings
+    answer_cache_enabled: bool = Field(default=True, env="ANSWER_CACHE_ENABLED")
+    answer_cache_ttl_seconds: float = Field(default=3600, env="ANSWER_CACHE_TTL_SECONDS")
+    answer_cache_max_entries_per_client: int = Field(default=256, env="ANSWER_CACHE_MAX_ENTRIES_PER_CLIENT")
+    answer_cache_semantic: bool = Field(default=False, env="ANSWER_CACHE_SEMANTIC")
+    answer_cache_semantic_threshold: float = Field(default=0.95, env="ANSWER_CACHE_SEMANTIC_THRESHOLD")
+
+    # Retrieval settings
+    retrieval_mode: str = Field(default="hybrid", env="RETRIEVAL_MODE")  # hybrid | vector
+    retrieval_top_k: int = Field(default=4, env="RETRIEVAL_TOP_K")  # passages sent to the model
+    retrieval_candidates: int = Field(default=20, env="RETRIEVAL_CANDIDATES")  # per retriever, before fusion
+    rrf_k: int = Field(default=60, env="RRF_K")
+    retrieval_tier: str = Field(default="chunks", env="RETRIEVAL_TIER")  # chunks | two_stage
+    retrieval_source_candidates: int = Field(default=8, env="RETRIEVAL_SOURCE_CANDIDATES")  # documents/threads searched in two_stage
+    source_index_enabled: bool = Field(default=True, env="SOURCE_INDEX_ENABLED")  # keep a centroid vector per document/thread
+    context_max_tokens: int = Field(default=2000, env="CONTEXT_MAX_TOKENS")  # budget for retrieved passages in the prompt
+    context_passage_max_tokens: int = Field(default=400, env="CONTEXT_PASSAGE_MAX_TOKENS")
+    context_min_passage_tokens: int = Field(default=40, env="CONTEXT_MIN_PASSAGE_TOKENS")
+    context_duplicate_threshold: float = Field(default=0.8, env="CONTEXT_DUPLICATE_THRESHOLD")  # shared shingle fraction
+    context_sentence_window: int = Field(default=1, env="CONTEXT_SENTENCE_WINDOW")
+
+    # OpenAI client settings
+    openai_timeout_seconds: float = Field(default=60.0, env="OPENAI_TIMEOUT_SECONDS")
+    openai_connect_timeout_seconds: float = Field(default=5.0, env="OPENAI_CONNECT_TIMEOUT_SECONDS")
+    openai_max_retries: int = Field(default=2, env="OPENAI_MAX_RETRIES")
+    openai_max_connections: int = Field(default=100, env="OPENAI_MAX_CONNECTIONS")
+    chat_model: str = Field(default="gpt-3.5-turbo", env="CHAT_MODEL")
+    llm_backend: str = Field(default="openai", env="LLM_BACKEND")  # openai | stub
+    llm_stub_latency_ms: float = Field(default=0.0, env="LLM_STUB_LATENCY_MS")  # simulated time to first token
+    llm_stub_token_latency_ms: float = Field(default=0.0, env="LLM_STUB_TOKEN_LATENCY_MS")
+    llm_max_concurrency: int = Field(default=8, env="LLM_MAX_CONCURRENCY")  # concurrent completions in batch QA
+    llm_requests_per_minute: int = Field(default=0, env="LLM_REQUESTS_PER_MINUTE")  # 0 = no limit
+    llm_tokens_per_minute: int = Field(default=0, env="LLM_TOKENS_PER_MINUTE")  # 0 = no limit
+    llm_rate_limit_retries: int = Field(default=3, env="LLM_RATE_LIMIT_RETRIES")
+    batch_max_questions: int = Field(default=100, env="BATCH_MAX_QUESTIONS")
+    
+    # Request concurrency settings
+    blocking_pool_size: int = Field(default=32, env="BLOCKING_POOL_SIZE")
+    parse_pool_size: int = Field(default_factory=lambda: min(4, os.cpu_count() or 1), env="PARSE_POOL_SIZE")
+    pdf_parallel_min_pages: int = Field(default=40, env="PDF_PARALLEL_MIN_PAGES")  # smaller PDFs are parsed serially
+    pdf_max_workers_per_document: int = Field(default=4, env="PDF_MAX_WORKERS_PER_DOCUMENT")
+    pdf_pages_per_task: int = Field(default=16, env="PDF_PAGES_PER_TASK")
+    chat_max_concurrency: int = Field(default=64, env="CHAT_MAX_CONCURRENCY")
+    upload_max_concurrency: int = Field(default=4, env="UPLOAD_MAX_CONCURRENCY")
+    ingest_max_concurrency: int = Field(default=4, env="INGEST_MAX_CONCURRENCY")
+    concurrency_queue_timeout_seconds: float = Field(default=30.0, env="CONCURRENCY_QUEUE_TIMEOUT_SECONDS")
+    
+    # Background ingestion settings
+    upload_dir: str = Field(default="./uploads", env="UPLOAD_DIR")
+    max_upload_mb: int = Field(default=250, env="MAX_UPLOAD_MB")
+    ingest_workers: int = Field(default=2, env="INGEST_WORKERS")  # 0 disables the in-process workers
+    ingest_max_attempts: int = Field(default=3, env="INGEST_MAX_ATTEMPTS")
+    ingest_retry_backoff_seconds: float = Field(default=5.0, env="INGEST_RETRY_BACKOFF_SECONDS")
+    ingest_lease_seconds: int = Field(default=300, env="INGEST_LEASE_SECONDS")
+    ingest_batch_chunks: int = Field(default=64, env="INGEST_BATCH_CHUNKS")
+    bulk_max_files: int = Field(default=5000, env="BULK_MAX_FILES")
+    bulk_max_archive_mb: int = Field(default=500, env="BULK_MAX_ARCHIVE_MB")  # size of one uploaded ZIP
+    bulk_max_uncompressed_mb: int = Field(default=2000, env="BULK_MAX_UNCOMPRESSED_MB")  # supported files extracted from one ZIP
+    
+    # Observability settings
+    metrics_enabled: bool = Field(default=True, env="METRICS_ENABLED")
+    trace_log_enabled: bool = Field(default=False, env="TRACE_LOG_ENABLED")  # one JSON log line per request
+    trace_log_min_ms: float = Field(default=0.0, env="TRACE_LOG_MIN_MS")  # only log requests at least this slow
     
     # Gmail OAuth settings (optional)
     google_client_id: str = Field(default="", env="GOOGLE_CLIENT_ID")
     google_client_secret: str = Field(default="", env="GOOGLE_CLIENT_SECRET")
+    gmail_backend: str = Field(default="google", env="GMAIL_BACKEND")  # google | fake (offline in-memory mailbox)
+    gmail_credentials_path: str = Field(default="credentials.json", env="GMAIL_CREDENTIALS_PATH")
+    gmail_token_path: str = Field(default="token.json", env="GMAIL_TOKEN_PATH")
+    gmail_redirect_uri: str = Field(default="http://localhost:8000/auth/callback", env="GMAIL_REDIRECT_URI")
+    gmail_sync_query: str = Field(default="", env="GMAIL_SYNC_QUERY")  # Gmail search filter for the first full sync
+    gmail_page_size: int = Field(default=100, env="GMAIL_PAGE_SIZE")
+    gmail_fetch_concurrency: int = Field(default=8, env="GMAIL_FETCH_CONCURRENCY")
+    gmail_max_pages: int = Field(default=50, env="GMAIL_MAX_PAGES")  # per sync call
     
     # CORS settings for production
     cors_origins: str = Field(default="*", env="CORS_ORIGINS")  # Change to specific domains in production
@@ -23,6 +123,7 @@ class Settings(BaseSettings):
     # App settings
     app_name: str = Field(default="Lexsy Legal Assistant", env="APP_NAME")
     debug: bool = Field(default=False, env="DEBUG")
+    startup_prewarm: str = Field(default="background", env="STARTUP_PREWARM")  # background | blocking | off
     
     model_config = {
         "env_file": ".env",
@@ -44,16 +145,11 @@ class Settings(BaseSettings):
             return ["*"]
         return [origin.strip() for origin in self.cors_origins.split(",")]
 
+    @property
+    def chroma_warm_client_ids(self) -> List[int]:
+        """Convert warm client IDs string to list"""
+        return [int(client_id) for client_id in self.chroma_warm_clients.split(",") if client_id.strip()]
+
 @lru_cache()
 def get_settings():
-    # Debug environment variables before creating Settings
-    print("=== ENVIRONMENT DEBUG ===")
-    print(f"OPENAI_API_KEY in os.environ: {'OPENAI_API_KEY' in os.environ}")
-    print(f"OPENAI_API_KEY value: {os.environ.get('OPENAI_API_KEY', 'NOT_FOUND')[:10]}***" if os.environ.get('OPENAI_API_KEY') else "NOT_FOUND")
-    print(f"All env vars starting with OPENAI: {[k for k in os.environ.keys() if k.startswith('OPENAI')]}")
-    print(f"Total env vars: {len(os.environ)}")
-    print("========================")
-    
-    settings = Settings()
-    print(f"Settings loaded - OpenAI key: {settings.openai_api_key[:10]}***" if settings.openai_api_key != 'NOT_SET' else "NOT_SET")
-    return settings
+    return Settings()
@@ -0,0 +1,24 @@
+# backend/conftest.py
+"""
+Pytest setup: an isolated data directory and offline backends, set before
+config.get_settings() is first called (services read settings at import)
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_data_dir = tempfile.mkdtemp(prefix="lexsy-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_data_dir, 'lexsy.db')}")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_data_dir, "chroma"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_data_dir, "uploads"))
+os.environ.setdefault("EMBEDDING_BACKEND", "stub")
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("GMAIL_BACKEND", "fake")
+os.environ.setdefault("STARTUP_PREWARM", "off")
+os.environ.setdefault("INGEST_WORKERS", "0")
+
+# test_app.py is a manual check against a running server, not a pytest module
+collect_ignore = ["test_app.py"]
@@ -1,5 +1,36 @@
 # backend/init_db.py
-from db.database import engine, Base
-import models.client, models.document, models.email
+from sqlalchemy import inspect, text
+from db.database import engine, Base, SessionLocal
+import models.client, models.document, models.email, models.gmail_sync_state, models.ingestion_job
+from models.document import Document
+
+def add_missing_columns():
+    """create_all doesn't alter existing tables, so add columns (and their indexes) introduced later"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def backfill_document_source_ids():
+    """Documents created before source_id existed get it from their filename, which is what their chunks used"""
+    from services.vector_service import make_source_id
+    db = SessionLocal()
+    try:
+        for document in db.query(Document).filter(Document.source_id.is_(None)).all():
+            document.source_id = make_source_id({"filename": document.filename, "source_type": "document"}, "")
+        db.commit()
+    finally:
+        db.close()
 
 Base.metadata.create_all(bind=engine)
+add_missing_columns()
+backfill_document_source_ids()
@@ -1,17 +1,53 @@
 # backend/main.py - COMPLETE UPDATED VERSION
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-from services.document_service import process_document_upload
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from services.bulk_ingest_service import ingest_bulk_uploads
+from services.document_service import UploadTooLargeError
+from services.ingestion_service import enqueue_document_upload, get_ingestion_workers, get_job, list_client_jobs
 from services.email_service import ingest_sample_emails
 from services.gmail_service import gmail_service
-from services.ai_service import ask_question
+from services.ai_service import answer_batch, ask_question_async, stream_answer
+from services.concurrency import OverloadedError, limit_concurrency, run_blocking, shutdown_executors
+from services.vector_store import get_vector_store
+from services.source_catalog import build_filters
+from services.vector_service import build_retrieval_options
+from services import metrics
+from services.answer_cache import get_answer_cache
+from services.embedding_cache import get_embedding_cache
+from services.rate_limiter import get_completion_scheduler
+from services.warmup import get_warmup
+from config import get_settings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the ingestion workers and warm up backends; stop the worker pools on shutdown.
+
+    With STARTUP_PREWARM=background the app serves immediately and /ready turns
+    200 once warm; with blocking, startup waits for the warm-up.
+    """
+    if get_settings().ingest_workers > 0:
+        get_ingestion_workers().start()
+    warmup = get_warmup()
+    if warmup.mode == "blocking":
+        await run_blocking(warmup.run)
+    elif warmup.mode == "background":
+        warmup.start()
+    yield
+    get_ingestion_workers().stop()
+    shutdown_executors()
 
 app = FastAPI(
     title="Lexsy Legal Assistant API",
     description="AI-powered legal document assistant with Gmail integration and RAG capabilities",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
 )
 
 # CORS - Update for production
@@ -23,6 +59,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def finish_after_body(body_iterator, finish):
+    """Pass a response body through, calling finish() once it has been sent (or abandoned)"""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        finish()
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Time every request and, if enabled, log its trace of pipeline stages.
+
+    A request is observed when its response body is done, so streamed answers
+    (SSE) count until the last event rather than until the headers.
+    """
+    trace, token = metrics.start_trace(request.headers.get("x-request-id"))
+    start = time.perf_counter()
+
+    def finish(status: int):
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        if get_settings().metrics_enabled:
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=path, status=status)
+        metrics.log_trace(trace, method=request.method, route=path, status=status)
+
+    try:
+        # The route runs in a task with a copy of this context, so it keeps the trace after the reset
+        response = await call_next(request)
+    except BaseException:
+        finish(500)
+        raise
+    finally:
+        metrics.end_trace(token)
+    response.headers["X-Request-ID"] = trace.trace_id
+    response.body_iterator = finish_after_body(response.body_iterator, lambda: finish(response.status_code))
+    return response
+
+metrics.registry.register_collector(
+    "lexsy_vector_store", "Open vector stores (Chroma or NumPy) or shards (shared Chroma layout)",
+    lambda: get_vector_store().stats()
+)
+metrics.registry.register_collector(
+    "lexsy_answer_cache", "Answer cache size and hit counts", lambda: get_answer_cache().stats()
+)
+metrics.registry.register_collector(
+    "lexsy_completion_scheduler", "Batch QA completion scheduler: 429s seen and remaining rate budget",
+    lambda: get_completion_scheduler().stats()
+)
+metrics.registry.register_collector(
+    "lexsy_startup", "Readiness and duration of each startup warm-up step", lambda: get_warmup().stats()
+)
+metrics.registry.register_collector(
+    "lexsy_embedding_cache", "Persistent embedding cache size and hit counts",
+    lambda: get_embedding_cache().stats() if get_embedding_cache() is not None else None
+)
+
+def overloaded_response(e: OverloadedError):
+    return JSONResponse(status_code=503, content={"success": False, "error": str(e)}, headers={"Retry-After": "1"})
+
 @app.get("/")
 def root():
     return {
@@ -35,25 +131,80 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "gmail_available": True}
+    return {"status": "ok", "gmail_available": gmail_service.is_configured()}
+
+@app.get("/ready")
+def ready():
+    """Readiness: 503 until the startup warm-up has loaded models, parsers and hot vector stores"""
+    report = get_warmup().report()
+    if report["ready"]:
+        return report
+    return JSONResponse(status_code=503, content=report, headers={"Retry-After": "1"})
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint: stage and request latency histograms, token and cache counters"""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Document endpoints
 @app.post("/api/documents/{client_id}/upload")
 async def upload_document(client_id: int, file: UploadFile = File(...)):
-    """Upload and process a document (PDF, DOCX, TXT) for a specific client"""
+    """Upload a document (PDF, DOCX, TXT) for a specific client and queue it for processing"""
     try:
-        result = process_document_upload(client_id, file) 
-        return JSONResponse(content={"success": True, **result})
+        async with limit_concurrency("upload"):
+            job = await run_blocking(enqueue_document_upload, client_id, file)
+        return JSONResponse(
+            status_code=202,
+            content={"success": True, "message": f"Queued {file.filename} for processing", **job}
+        )
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ValueError as e:
+        status_code = 413 if isinstance(e, UploadTooLargeError) else 400
+        return JSONResponse(status_code=status_code, content={"success": False, "error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
 
+@app.post("/api/documents/{client_id}/bulk-upload")
+async def bulk_upload_documents(client_id: int, files: List[UploadFile] = File(...)):
+    """Upload many documents and/or ZIP archives at once and queue them for processing; returns a per-file summary"""
+    try:
+        async with limit_concurrency("upload"):
+            result = await run_blocking(ingest_bulk_uploads, client_id, files)
+        return JSONResponse(status_code=202, content={"success": True, **result})
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+@app.get("/api/documents/{client_id}/jobs")
+async def list_ingestion_jobs(client_id: int, limit: int = Query(50, ge=1, le=500)):
+    """List the most recent ingestion jobs for a client"""
+    jobs = await run_blocking(list_client_jobs, client_id, limit)
+    return JSONResponse(content={"success": True, "jobs": jobs})
+
+@app.get("/api/jobs/{job_id}")
+async def get_ingestion_job(job_id: int):
+    """Poll the status and progress of an ingestion job"""
+    job = await run_blocking(get_job, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"Job {job_id} not found"})
+    return JSONResponse(content={"success": True, **job})
+
 # Email endpoints
 @app.post("/api/emails/{client_id}/ingest-sample-emails")
 async def ingest_emails(client_id: int):
     """Ingest sample emails for a specific client"""
     try:
-        result = ingest_sample_emails(client_id)
+        async with limit_concurrency("ingest"):
+            result = await run_blocking(ingest_sample_emails, client_id)
+        if result["emails_failed"]:
+            # Partial ingestion is reported with the per-email errors; nothing ingested is a 500
+            status_code = 200 if result["emails_processed"] else 500
+            return JSONResponse(status_code=status_code, content={"success": False, "error": result["message"], **result})
         return JSONResponse(content={"success": True, **result})
+    except OverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
 
@@ -62,7 +213,7 @@ async def ingest_emails(client_id: int):
 async def initiate_gmail_auth():
     """Initiate Gmail OAuth flow"""
     try:
-        auth_url = gmail_service.get_authorization_url()
+        auth_url = await run_blocking(gmail_service.get_authorization_url)
         return JSONResponse(content={"auth_url": auth_url})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -71,7 +222,7 @@ async def initiate_gmail_auth():
 async def gmail_auth_callback(code: str = Query(...)):
     """Handle Gmail OAuth callback"""
     try:
-        result = gmail_service.handle_oauth_callback(code)
+        result = await run_blocking(gmail_service.handle_oauth_callback, code)
         # Redirect to frontend with success message
         return RedirectResponse(url="/?gmail_auth=success")
     except Exception as e:
@@ -80,7 +231,7 @@ async def gmail_auth_callback(code: str = Query(...)):
 @app.get("/auth/gmail/status")
 async def gmail_auth_status():
     """Check Gmail authentication status"""
-    is_authenticated = gmail_service.is_authenticated()
+    is_authenticated = await run_blocking(gmail_service.is_authenticated)
     return JSONResponse(content={"authenticated": is_authenticated})
 
 # Gmail Integration Endpoints
@@ -88,8 +239,11 @@ async def gmail_auth_status():
 async def ingest_mock_gmail(client_id: int):
     """Ingest mock Gmail conversation for demo"""
     try:
-        result = gmail_service.create_mock_conversation(client_id)
+        async with limit_concurrency("ingest"):
+            result = await run_blocking(gmail_service.create_mock_conversation, client_id)
         return JSONResponse(content={"success": True, **result})
+    except OverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
 
@@ -97,17 +251,155 @@ async def ingest_mock_gmail(client_id: int):
 async def ingest_gmail_thread(client_id: int, thread_id: str = Form(...)):
     """Ingest a specific Gmail thread"""
     try:
-        result = gmail_service.ingest_gmail_thread(client_id, thread_id)
+        async with limit_concurrency("ingest"):
+            result = await run_blocking(gmail_service.ingest_gmail_thread, client_id, thread_id)
+        return JSONResponse(content={"success": True, **result})
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+@app.post("/api/gmail/{client_id}/sync")
+async def sync_gmail_mailbox(client_id: int):
+    """Incrementally sync the connected mailbox, ingesting only messages not seen before"""
+    try:
+        async with limit_concurrency("ingest"):
+            result = await run_blocking(gmail_service.sync_mailbox, client_id)
         return JSONResponse(content={"success": True, **result})
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
 
 # AI Chat endpoint
 @app.post("/api/chat/{client_id}/ask")
-async def chat_with_ai(client_id: int, question: str = Form(...)):
-    """Ask a question about the client's documents and emails using AI"""
+async def chat_with_ai(
+    client_id: int,
+    question: str = Form(...),
+    semantic_cache: Optional[bool] = Form(None),
+    source_type: Optional[str] = Form(None),
+    sender: Optional[str] = Form(None),
+    filename: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None),
+    tier: Optional[str] = Form(None),
+    source_candidates: Optional[int] = Form(None),
+    candidates: Optional[int] = Form(None),
+):
+    """
+    Ask a question about the client's documents and emails using AI, optionally restricted by filters.
+    tier=two_stage first picks the source_candidates closest documents/threads, then searches their chunks.
+    """
+    try:
+        filters = build_filters(source_type, sender, filename, date_from, date_to)
+        retrieval = build_retrieval_options(tier, source_candidates, candidates)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
     try:
-        result = ask_question(client_id, question)
+        async with limit_concurrency("chat"):
+            result = await ask_question_async(client_id, question, semantic_cache, filters, retrieval)
         return JSONResponse(content={"success": True, **result})
+    except OverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
\ No newline at end of file
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/chat/{client_id}/ask/stream")
+async def chat_with_ai_stream(
+    client_id: int,
+    question: str = Form(...),
+    semantic_cache: Optional[bool] = Form(None),
+    source_type: Optional[str] = Form(None),
+    sender: Optional[str] = Form(None),
+    filename: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None),
+    tier: Optional[str] = Form(None),
+    source_candidates: Optional[int] = Form(None),
+    candidates: Optional[int] = Form(None),
+):
+    """Stream the answer as Server-Sent Events: sources, then tokens, then a timing summary"""
+    try:
+        filters = build_filters(source_type, sender, filename, date_from, date_to)
+        retrieval = build_retrieval_options(tier, source_candidates, candidates)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+
+    async def events():
+        try:
+            async with limit_concurrency("chat"):
+                async for event, data in stream_answer(client_id, question, semantic_cache, filters, retrieval):
+                    yield format_sse(event, data)
+        except Exception as e:
+            yield format_sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/chat/{client_id}/batch")
+async def chat_batch(
+    client_id: int,
+    questions: List[str] = Form(...),
+    semantic_cache: Optional[bool] = Form(None),
+    source_type: Optional[str] = Form(None),
+    sender: Optional[str] = Form(None),
+    filename: Optional[str] = Form(None),
+    date_from: Optional[str] = Form(None),
+    date_to: Optional[str] = Form(None),
+    tier: Optional[str] = Form(None),
+    source_candidates: Optional[int] = Form(None),
+    candidates: Optional[int] = Form(None),
+):
+    """
+    Answer a checklist of questions (repeat the `questions` field) as Server-Sent Events:
+    an "answer" event per question as soon as it is ready, then a summary
+    """
+    questions = [question.strip() for question in questions if question.strip()]
+    if not questions:
+        return JSONResponse(status_code=400, content={"success": False, "error": "No questions given"})
+    max_questions = get_settings().batch_max_questions
+    if len(questions) > max_questions:
+        return JSONResponse(status_code=400, content={
+            "success": False, "error": f"At most {max_questions} questions per batch"
+        })
+    try:
+        filters = build_filters(source_type, sender, filename, date_from, date_to)
+        retrieval = build_retrieval_options(tier, source_candidates, candidates)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+
+    async def events():
+        start = time.perf_counter()
+        answered = failed = cached = 0
+        try:
+            async with limit_concurrency("chat"):
+                async for index, result in answer_batch(client_id, questions, semantic_cache, filters, retrieval):
+                    if "error" in result:
+                        failed += 1
+                    else:
+                        answered += 1
+                        cached += bool(result.get("cached"))
+                    yield format_sse("answer", {"index": index, "question": questions[index], **result})
+        except Exception as e:
+            yield format_sse("error", {"error": str(e)})
+        yield format_sse("done", {
+            "questions": len(questions),
+            "answered": answered,
+            "failed": failed,
+            "cached": cached,
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
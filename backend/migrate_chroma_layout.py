@@ -0,0 +1,105 @@
+# backend/migrate_chroma_layout.py
+"""
+Copy per-client Chroma stores (<persist dir>/client_<id>) into the shared
+Chroma layout or the NumPy vector store.
+
+Vectors are copied as they are, without re-embedding. Upserts make it safe to
+re-run; the per-client directories are left in place, to be removed by hand
+once CHROMA_LAYOUT=shared (or VECTOR_STORE_BACKEND=numpy) has been verified.
+
+Run from backend/:  python migrate_chroma_layout.py [--target shared|numpy] [--shards 4] [--clients 1 2] [--dry-run]
+"""
+
+import argparse
+import os
+import re
+import time
+
+from config import get_settings
+from services.chroma_registry import ChromaClientRegistry, SharedChromaRegistry
+from services.numpy_store import NumpyStoreRegistry
+
+settings = get_settings()
+
+CLIENT_DIR_RE = re.compile(r"^client_(\d+)$")
+
+
+def find_client_ids(base_dir: str):
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(
+        int(match.group(1)) for match in map(CLIENT_DIR_RE.match, os.listdir(base_dir))
+        if match and os.path.isdir(os.path.join(base_dir, match.group(0)))
+    )
+
+
+def migrate_client(source: ChromaClientRegistry, target, client_id: int,
+                   batch_size: int, dry_run: bool) -> dict:
+    collection = source.get_collection(client_id, create=False)
+    if collection is None:
+        return {"client_id": client_id, "chunks": 0, "skipped": "no collection"}
+    try:
+        total = collection.count()
+        copied = 0
+        if not dry_run:
+            tenant = target.get_collection(client_id)
+            while copied < total:
+                page = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=copied)
+                if not page["ids"]:
+                    break
+                tenant.upsert(
+                    ids=page["ids"], embeddings=page["embeddings"],
+                    documents=page["documents"], metadatas=page["metadatas"],
+                )
+                copied += len(page["ids"])
+            migrated = tenant.count()
+            if migrated != total:
+                return {"client_id": client_id, "chunks": total, "migrated": migrated, "error": "count mismatch"}
+        return {"client_id": client_id, "chunks": total, "migrated": copied}
+    finally:
+        # Close each source store once copied, so memory stays flat across many clients
+        source.evict(client_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-dir", default=settings.chroma_persist_dir)
+    parser.add_argument("--target", choices=["shared", "numpy"], default="shared")
+    parser.add_argument("--shards", type=int, default=settings.chroma_shards, help="shared layout only")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default=settings.numpy_store_dtype, help="numpy only")
+    parser.add_argument("--clients", type=int, nargs="+", help="only these client IDs")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count the chunks to copy")
+    args = parser.parse_args()
+
+    source = ChromaClientRegistry(args.persist_dir, max_clients=1)
+    if args.target == "numpy":
+        target = NumpyStoreRegistry(os.path.join(args.persist_dir, "numpy"), dtype=args.dtype, max_clients=1)
+        description = f"{target.base_dir} ({args.dtype})"
+    else:
+        target = SharedChromaRegistry(args.persist_dir, shards=args.shards)
+        description = f"{target.path} ({target.shards} shards)"
+    client_ids = args.clients or find_client_ids(args.persist_dir)
+    print(f"Migrating {len(client_ids)} clients from {args.persist_dir} into {description}")
+
+    start = time.perf_counter()
+    failed = 0
+    total = 0
+    for client_id in client_ids:
+        result = migrate_client(source, target, client_id, args.batch_size, args.dry_run)
+        total += result["chunks"]
+        failed += "error" in result
+        print(result)
+
+    print(f"{'Counted' if args.dry_run else 'Copied'} {total} chunks in {time.perf_counter() - start:.1f}s, "
+          f"{failed} clients failed")
+    if not args.dry_run and not failed:
+        if args.target == "numpy":
+            print(f"Set VECTOR_STORE_BACKEND=numpy and NUMPY_STORE_DTYPE={args.dtype} to serve from the NumPy store")
+        else:
+            print("Set CHROMA_LAYOUT=shared (and CHROMA_SHARDS) to serve from the shared store")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
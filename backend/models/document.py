@@ -6,7 +6,9 @@ class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
-    filename = Column(String)
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
+    source_id = Column(String, nullable=True, index=True)  # vector store source of the document's chunks
+    filename = Column(String, index=True)
     file_type = Column(String)
     processing_status = Column(String, default="completed")
+    content_hash = Column(String, nullable=True, index=True)
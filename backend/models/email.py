@@ -1,14 +1,19 @@
 # backend/models/email.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, DateTime
 from db.database import Base
 
 class Email(Base):
     __tablename__ = "emails"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
+    source_id = Column(String, nullable=True, index=True)  # vector store source of the email's chunks
     subject = Column(String)
-    sender = Column(String)
+    sender = Column(String, index=True)
     recipient = Column(String)
     body = Column(Text)
-    date_sent = Column(DateTime)
+    date_sent = Column(DateTime, index=True)
+    # Gmail identifiers; history_id is the message's own (the sync checkpoint is in gmail_sync_state)
+    gmail_message_id = Column(String, nullable=True, index=True)
+    gmail_thread_id = Column(String, nullable=True, index=True)
+    history_id = Column(BigInteger, nullable=True)
@@ -0,0 +1,16 @@
+# backend/models/gmail_sync_state.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime
+from db.database import Base
+
+class GmailSyncState(Base):
+    __tablename__ = "gmail_sync_state"
+
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    # Mailbox historyId as of the last successful sync: where the next incremental sync resumes
+    history_id = Column(BigInteger, nullable=True)
+    # A full sync cut short by the page cap: the historyId taken when it started
+    # (the checkpoint once it completes) and the listing page it resumes from
+    full_sync_history_id = Column(BigInteger, nullable=True)
+    full_sync_page_token = Column(String, nullable=True)
+    synced_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,27 @@
+# backend/models/ingestion_job.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from db.database import Base
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    filename = Column(String)
+    file_type = Column(String)
+    file_path = Column(String)
+    status = Column(String, default="queued", index=True)  # queued | running | completed | failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    locked_until = Column(DateTime, nullable=True)
+    stage = Column(String, nullable=True)  # parsing | embedding
+    progress_current = Column(Integer, default=0)
+    progress_total = Column(Integer, default=0)
+    chunks = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,38 +1,54 @@
 # backend/services/ai_service.py
 
-import os
-import openai
-from chromadb import PersistentClient
+import asyncio
+import time
 from config import get_settings
+from services.concurrency import run_blocking
+from services.openai_client import get_async_openai_client, get_openai_client
+from services.answer_cache import get_answer_cache, get_corpus_version
+from services.context_service import count_prompt_tokens, pack_context
+from services.embedding_cache import normalize_text
+from services.source_catalog import resolve_source_ids, to_chroma_where
+from services.chunking_service import count_tokens
+from services.metrics import annotate, count_answer_cache, count_tokens_used, record_stage, timed
+from services.rate_limiter import get_completion_scheduler
+from services.vector_service import get_query_embedding, similarity_search, similarity_search_many
 
 settings = get_settings()
-CHROMA_DIR = settings.chroma_persist_dir
-OPENAI_API_KEY = settings.openai_api_key
 
-# Set OpenAI API key
-openai.api_key = OPENAI_API_KEY
+SYSTEM_PROMPT = "You are a helpful legal assistant. Answer questions based on the provided context."
+# Bump when the prompt changes so cached answers from the old prompt are not reused
+PROMPT_VERSION = "1"
 
-def ask_question(client_id: int, question: str):
-    # Get ChromaDB client
-    chroma_client = PersistentClient(path=os.path.join(CHROMA_DIR, f"client_{client_id}"))
-    
-    try:
-        collection = chroma_client.get_collection(name="default")
-    except:
+def retrieve_context(client_id: int, question: str, filters: dict = None, retrieval: dict = None):
+    """
+    Run retrieval for a question (raises ValueError if the client has no documents).
+    Filters (see source_catalog.build_filters) are resolved to candidate sources
+    in the database first, then applied as vector store metadata filters.
+    `retrieval` holds search options (see vector_service.build_retrieval_options).
+    """
+    filters = filters or {}
+    source_ids = resolve_source_ids(client_id, filters) if filters else None
+    results = similarity_search(client_id, question, where=to_chroma_where(filters), source_ids=source_ids,
+                                **(retrieval or {}))
+    if results is None:
         raise ValueError(f"No documents found for client {client_id}")
+    return results
+
+def retrieve_contexts(client_id: int, questions: list, filters: dict = None, retrieval: dict = None):
+    """retrieve_context for several questions, sharing the embedding call, vector query and chunk fetch"""
+    filters = filters or {}
+    source_ids = resolve_source_ids(client_id, filters) if filters else None
+    results = similarity_search_many(client_id, questions, where=to_chroma_where(filters), source_ids=source_ids,
+                                     **(retrieval or {}))
+    if results is None:
+        raise ValueError(f"No documents found for client {client_id}")
+    return results
+
+def build_messages(context: dict, question: str):
+    # Combine the packed passages
+    context = "\n\n".join(context['documents'][0])
 
-    # Search for relevant documents
-    results = collection.query(
-        query_texts=[question],
-        n_results=5
-    )
-    
-    if not results['documents'] or not results['documents'][0]:
-        return {"answer": "No relevant documents found.", "sources": []}
-    
-    # Combine retrieved documents
-    context = "\n\n".join(results['documents'][0])
-    
     # Create prompt
     prompt = f"""Based on the following context, answer the question:
 
@@ -43,28 +59,286 @@ Question: {question}
 
 Answer:"""
 
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def extract_sources(results: dict):
+    """Extract sources from metadata"""
+    sources = []
+    if results['metadatas'] and results['metadatas'][0]:
+        for metadata in results['metadatas'][0]:
+            if metadata.get('source_type') == 'email':
+                sources.append({"type": "email", "subject": metadata.get('subject', 'Unknown')})
+            else:
+                source = {"type": "document", "filename": metadata.get('filename', 'Unknown')}
+                if 'page_start' in metadata:
+                    source["pages"] = [metadata['page_start'], metadata.get('page_end', metadata['page_start'])]
+                sources.append(source)
+    return sources
+
+def _has_results(results: dict) -> bool:
+    return bool(results['documents'] and results['documents'][0])
+
+NO_RESULTS = {"answer": "No relevant documents found.", "sources": [], "prompt_tokens": 0}
+
+def _answer_variant(filters: dict = None, retrieval: dict = None) -> str:
+    variant = f"{settings.chat_model}:{PROMPT_VERSION}"
+    options = {**(filters or {}), **(retrieval or {})}
+    if options:
+        # Semantic matches must not cross between differently filtered or retrieved questions
+        variant += ":" + ",".join(f"{key}={options[key]}" for key in sorted(options))
+    return variant
+
+def prepare_answer(client_id: int, question: str, semantic_cache: bool = None, filters: dict = None,
+                   results: dict = None, retrieval: dict = None):
+    """
+    Retrieval plus answer-cache lookup, shared by the sync, async and streaming paths.
+    Returns a dict with "cached" set to a previous answer on a cache hit, otherwise
+    the retrieval "results", the packed prompt "context" and what is needed to
+    cache the new answer. Pass `results` if retrieval has already been done.
+    """
+    annotate(client_id=client_id)
+    cache = get_answer_cache() if settings.answer_cache_enabled else None
+    semantic = settings.answer_cache_semantic if semantic_cache is None else semantic_cache
+    corpus_version = get_corpus_version(client_id)
+    prepared = {"cached": None, "results": None, "context": None, "cache_key": None,
+                "variant": _answer_variant(filters, retrieval), "corpus_version": corpus_version, "question_embedding": None}
+
+    if cache is not None:
+        # Same LRU-cached embedding the vector search uses; stored so later semantic lookups can match it
+        prepared["question_embedding"] = get_query_embedding(question)
+    if cache is not None and semantic:
+        hit = cache.find_similar(client_id, prepared["question_embedding"], prepared["variant"],
+                                 settings.answer_cache_semantic_threshold)
+        if hit is not None:
+            prepared["cached"] = {**hit, "cached": "semantic"}
+            count_answer_cache(client_id, "semantic")
+            return prepared
+
+    if results is None:
+        results = retrieve_context(client_id, question, filters, retrieval)
+    prepared["results"] = results
+    if cache is not None and _has_results(results):
+        prepared["cache_key"] = cache.make_key(question, results['ids'][0], prepared["variant"])
+        hit = cache.get(client_id, prepared["cache_key"])
+        if hit is not None:
+            prepared["cached"] = {**hit, "cached": "exact"}
+            count_answer_cache(client_id, "exact")
+            return prepared
+        count_answer_cache(client_id, "miss")
+    if _has_results(results):
+        prepared["context"] = pack_context(results, question)
+    return prepared
+
+def prepare_answers(client_id: int, questions: list, semantic_cache: bool = None, filters: dict = None,
+                    retrieval: dict = None):
+    """prepare_answer for a batch of questions, with retrieval done once for all of them"""
+    annotate(client_id=client_id, questions=len(questions))
+    retrieved = retrieve_contexts(client_id, questions, filters, retrieval)
+    return [
+        prepare_answer(client_id, question, semantic_cache, filters, results=results, retrieval=retrieval)
+        for question, results in zip(questions, retrieved)
+    ]
+
+def remember_answer(client_id: int, prepared: dict, result: dict):
+    if prepared["cache_key"] is None:
+        return
+    get_answer_cache().put(
+        client_id, prepared["cache_key"], result, prepared["variant"],
+        question_embedding=prepared["question_embedding"],
+        corpus_version=prepared["corpus_version"]
+    )
+
+def record_usage(client_id: int, response, prompt_tokens: int, answer: str = ""):
+    """Count a completion's tokens, preferring the usage the API reports"""
+    usage = getattr(response, "usage", None)
+    count_tokens_used(client_id, "prompt", getattr(usage, "prompt_tokens", None) or prompt_tokens)
+    count_tokens_used(client_id, "completion", getattr(usage, "completion_tokens", None) or count_tokens(answer or ""))
+
+def ask_question(client_id: int, question: str, semantic_cache: bool = None, filters: dict = None,
+                 retrieval: dict = None):
+    # Search for relevant documents, embedding the question like the stored chunks
+    prepared = prepare_answer(client_id, question, semantic_cache, filters, retrieval=retrieval)
+    if prepared["cached"] is not None:
+        return prepared["cached"]
+    results = prepared["results"]
+
+    if not _has_results(results):
+        return {**NO_RESULTS, "cached": False}
+
+    context = prepared["context"]
+    messages = build_messages(context, question)
+    prompt_tokens = count_prompt_tokens(messages)
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful legal assistant. Answer questions based on the provided context."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0
-        )
-        
+        with timed("llm", model=settings.chat_model):
+            response = get_openai_client().chat.completions.create(
+                model=settings.chat_model,
+                messages=messages,
+                temperature=0
+            )
+
+        answer = response.choices[0].message.content
+    except Exception as e:
+        raise Exception(f"OpenAI API error: {str(e)}")
+
+    record_usage(client_id, response, prompt_tokens, answer)
+    result = {"answer": answer, "sources": extract_sources(context), "prompt_tokens": prompt_tokens}
+    remember_answer(client_id, prepared, result)
+    return {**result, "cached": False}
+
+async def complete_answer_async(client_id: int, question: str, prepared: dict, scheduler=None):
+    """
+    The completion half of ask_question_async, for an already prepared question.
+    With a scheduler (see rate_limiter), the call waits for its rate-limit budget.
+    """
+    if prepared["cached"] is not None:
+        return prepared["cached"]
+    results = prepared["results"]
+
+    if not _has_results(results):
+        return {**NO_RESULTS, "cached": False}
+
+    context = prepared["context"]
+    messages = build_messages(context, question)
+    prompt_tokens = count_prompt_tokens(messages)
+
+    async def create():
+        # Timed here, so time spent queued in the scheduler isn't counted as model latency
+        with timed("llm", model=settings.chat_model):
+            return await get_async_openai_client().chat.completions.create(
+                model=settings.chat_model,
+                messages=messages,
+                temperature=0
+            )
+
+    try:
+        if scheduler is None:
+            response = await create()
+        else:
+            response = await scheduler.run(create, tokens=prompt_tokens)
+
         answer = response.choices[0].message.content
-        
-        # Extract sources from metadata
-        sources = []
-        if results['metadatas'] and results['metadatas'][0]:
-            for metadata in results['metadatas'][0]:
-                if metadata.get('source_type') == 'email':
-                    sources.append({"type": "email", "subject": metadata.get('subject', 'Unknown')})
-                else:
-                    sources.append({"type": "document", "filename": metadata.get('filename', 'Unknown')})
-        
-        return {"answer": answer, "sources": sources}
-        
     except Exception as e:
         raise Exception(f"OpenAI API error: {str(e)}")
+
+    record_usage(client_id, response, prompt_tokens, answer)
+    if scheduler is not None:
+        usage = getattr(response, "usage", None)
+        scheduler.charge(getattr(usage, "completion_tokens", None) or count_tokens(answer or ""))
+    result = {"answer": answer, "sources": extract_sources(context), "prompt_tokens": prompt_tokens}
+    remember_answer(client_id, prepared, result)
+    return {**result, "cached": False}
+
+async def ask_question_async(client_id: int, question: str, semantic_cache: bool = None, filters: dict = None,
+                             retrieval: dict = None):
+    """ask_question for request handlers: retrieval runs on the thread pool, the completion on the async client"""
+    prepared = await run_blocking(prepare_answer, client_id, question, semantic_cache, filters, retrieval=retrieval)
+    return await complete_answer_async(client_id, question, prepared)
+
+async def answer_batch(client_id: int, questions: list, semantic_cache: bool = None, filters: dict = None,
+                       retrieval: dict = None):
+    """
+    Answer a checklist of questions against one client's corpus, yielding
+    (index, result) as each answer finishes, in completion order. Retrieval is
+    shared across the batch; completions run concurrently under the process-wide
+    completion scheduler. A failed question yields {"error": ...} instead of
+    stopping the batch.
+
+    Questions that differ only in case or whitespace (the answer cache's
+    normalization) are answered once; later copies get the same result with
+    "duplicate_of" set to the index of the first.
+    """
+    positions = {}
+    for index, question in enumerate(questions):
+        positions.setdefault(normalize_text(question).casefold(), []).append(index)
+    groups = list(positions.values())
+    distinct = [questions[indexes[0]] for indexes in groups]
+    prepared_all = await run_blocking(prepare_answers, client_id, distinct, semantic_cache, filters, retrieval)
+    scheduler = get_completion_scheduler()
+
+    async def answer(group: int):
+        try:
+            result = await complete_answer_async(client_id, distinct[group], prepared_all[group], scheduler)
+        except Exception as e:
+            result = {"error": str(e)}
+        return group, result
+
+    tasks = [asyncio.create_task(answer(group)) for group in range(len(distinct))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            group, result = await finished
+            first, *copies = groups[group]
+            yield first, result
+            for index in copies:
+                yield index, {**result, "duplicate_of": first}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_answer(client_id: int, question: str, semantic_cache: bool = None, filters: dict = None,
+                        retrieval: dict = None):
+    """
+    Answer a question incrementally, yielding (event, data) pairs:
+    "sources" once retrieval finishes, "token" for each piece of the answer,
+    then "done" with retrieval, time-to-first-token and total latency in ms
+    and the prompt token count.
+    """
+    start = time.perf_counter()
+    prepared = await run_blocking(prepare_answer, client_id, question, semantic_cache, filters, retrieval=retrieval)
+    retrieval_ms = (time.perf_counter() - start) * 1000
+    results = prepared["results"]
+
+    # Cached or empty answers are sent whole as a single token event
+    whole = prepared["cached"] or (None if _has_results(results) else {**NO_RESULTS, "cached": False})
+    if whole is not None:
+        yield "sources", {"sources": whole["sources"]}
+        yield "token", {"text": whole["answer"]}
+        total_ms = (time.perf_counter() - start) * 1000
+        yield "done", {
+            "retrieval_ms": round(retrieval_ms, 1),
+            "time_to_first_token_ms": round(total_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "prompt_tokens": whole.get("prompt_tokens", 0),
+            "cached": whole["cached"]
+        }
+        return
+
+    context = prepared["context"]
+    messages = build_messages(context, question)
+    prompt_tokens = count_prompt_tokens(messages)
+    sources = extract_sources(context)
+    yield "sources", {"sources": sources}
+
+    first_token_ms = None
+    parts = []
+    try:
+        stream = await get_async_openai_client().chat.completions.create(
+            model=settings.chat_model,
+            messages=messages,
+            temperature=0,
+            stream=True
+        )
+        async for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            parts.append(text)
+            yield "token", {"text": text}
+    except Exception as e:
+        raise Exception(f"OpenAI API error: {str(e)}")
+
+    remember_answer(client_id, prepared, {"answer": "".join(parts), "sources": sources, "prompt_tokens": prompt_tokens})
+    total_ms = (time.perf_counter() - start) * 1000
+    record_usage(client_id, None, prompt_tokens, "".join(parts))
+    record_stage("llm", (total_ms - retrieval_ms) / 1000, model=settings.chat_model, streamed=True)
+    yield "done", {
+        "retrieval_ms": round(retrieval_ms, 1),
+        "time_to_first_token_ms": round(first_token_ms if first_token_ms is not None else total_ms, 1),
+        "total_ms": round(total_ms, 1),
+        "prompt_tokens": prompt_tokens,
+        "cached": False
+    }
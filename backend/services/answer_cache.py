@@ -0,0 +1,161 @@
+# backend/services/answer_cache.py
+
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+
+from config import get_settings
+from services.embedding_cache import normalize_text
+
+settings = get_settings()
+
+
+def _version_path(client_id: int) -> str:
+    return os.path.join(settings.chroma_persist_dir, "versions", f"client_{client_id}")
+
+
+def get_corpus_version(client_id: int) -> int:
+    """Modification stamp of the client's corpus; changes whenever its vectors change"""
+    try:
+        return os.stat(_version_path(client_id)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def bump_corpus_version(client_id: int):
+    """Mark the client's corpus as changed (visible to every worker process)"""
+    path = _version_path(client_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    previous = get_corpus_version(client_id)
+    with open(path, "w"):
+        pass
+    # Always move forward, even on filesystems with coarse timestamps
+    stamp = max(time.time_ns(), previous + 1)
+    os.utime(path, ns=(stamp, stamp))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class _Entry:
+    __slots__ = ("result", "created_at", "corpus_version", "question_embedding", "variant")
+
+    def __init__(self, result, created_at, corpus_version, question_embedding, variant):
+        self.result = result
+        self.created_at = created_at
+        self.corpus_version = corpus_version
+        self.question_embedding = question_embedding
+        self.variant = variant
+
+
+class AnswerCache:
+    """
+    Per-client cache of generated answers.
+
+    Exact keys combine the normalized question, the retrieved chunk IDs and the
+    model/prompt version. Entries expire after `ttl_seconds`, each client keeps
+    at most `max_entries` (least recently used evicted first), and everything
+    cached for a client is dropped when its corpus version changes.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(question: str, chunk_ids: List[str], variant: str) -> str:
+        parts = [normalize_text(question).casefold(), ",".join(sorted(chunk_ids)), variant]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _live_entries(self, client_id: int) -> OrderedDict:
+        """Entries for a client, after dropping expired or outdated ones (lock held)"""
+        entries = self._clients.get(client_id)
+        if not entries:
+            return OrderedDict()
+        version = get_corpus_version(client_id)
+        cutoff = time.time() - self.ttl_seconds
+        for key in [k for k, e in entries.items() if e.corpus_version != version or e.created_at < cutoff]:
+            del entries[key]
+        return entries
+
+    def get(self, client_id: int, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._live_entries(client_id).get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._clients[client_id].move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def find_similar(self, client_id: int, question_embedding: List[float], variant: str, threshold: float) -> Optional[dict]:
+        """Best cached answer whose question embedding is at least `threshold` cosine-similar"""
+        with self._lock:
+            best_key, best_score = None, threshold
+            for key, entry in self._live_entries(client_id).items():
+                if entry.variant != variant or entry.question_embedding is None:
+                    continue
+                score = _cosine(question_embedding, entry.question_embedding)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._clients[client_id].move_to_end(best_key)
+            self.semantic_hits += 1
+            return self._clients[client_id][best_key].result
+
+    def put(self, client_id: int, key: str, result: dict, variant: str,
+            question_embedding: List[float] = None, corpus_version: int = None):
+        """Store an answer; pass the corpus_version read before retrieval so a concurrent change wins"""
+        if corpus_version is None:
+            corpus_version = get_corpus_version(client_id)
+        entry = _Entry(result, time.time(), corpus_version, question_embedding, variant)
+        with self._lock:
+            entries = self._clients.setdefault(client_id, OrderedDict())
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate_client(self, client_id: int):
+        """Forget a client's answers here and, via the corpus version, in other processes"""
+        bump_corpus_version(client_id)
+        with self._lock:
+            self._clients.pop(client_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "entries": sum(len(entries) for entries in self._clients.values()),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+            }
+
+
+@lru_cache()
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache"""
+    return AnswerCache(
+        max_entries=settings.answer_cache_max_entries_per_client,
+        ttl_seconds=settings.answer_cache_ttl_seconds,
+    )
+
+
+def invalidate_client_answers(client_id: int):
+    """Called whenever a client's vector store changes"""
+    get_answer_cache().invalidate_client(client_id)
@@ -0,0 +1,192 @@
+# backend/services/bulk_ingest_service.py
+
+import os
+import tempfile
+import zipfile
+from typing import List
+
+from fastapi import UploadFile
+from config import get_settings
+from db.database import SessionLocal
+from models.document import Document
+from services.document_service import SUPPORTED_TYPES, UploadTooLargeError, copy_to_disk
+from services.ingestion_service import client_upload_path, enqueue_files
+
+settings = get_settings()
+
+MB = 1024 * 1024
+
+
+def _file_type(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+class _StagedFile:
+    __slots__ = ("filename", "ext", "path", "content_hash", "size")
+
+    def __init__(self, filename, ext, path, content_hash, size):
+        self.filename = filename
+        self.ext = ext
+        self.path = path
+        self.content_hash = content_hash
+        self.size = size
+
+
+def _stage_archive(upload: UploadFile, work_dir: str, stage, results: list):
+    """Stage the supported members of a ZIP upload, within the archive and uncompressed size caps"""
+    archive_path = os.path.join(work_dir, "archive.zip")
+    try:
+        copy_to_disk(upload.file, archive_path, upload.filename, max_bytes=settings.bulk_max_archive_mb * MB)
+    except UploadTooLargeError as e:
+        results.append({"filename": upload.filename, "status": "failed", "error": str(e)})
+        return
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = []
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                    continue
+                if _file_type(name) not in SUPPORTED_TYPES:
+                    results.append({"filename": name, "status": "skipped", "error": "Unsupported file type"})
+                    continue
+                members.append(member)
+            # Declared sizes are checked up front; the copy enforces the real ones, in case they lie
+            budget = settings.bulk_max_uncompressed_mb * MB
+            if sum(member.file_size for member in members) > budget:
+                results.append({
+                    "filename": upload.filename, "status": "failed",
+                    "error": f"Archive expands to more than {settings.bulk_max_uncompressed_mb} MB",
+                })
+                return
+            for member in members:
+                with archive.open(member) as source:
+                    item = stage(source, member.filename, max_bytes=min(settings.max_upload_mb * MB, budget))
+                if item is not None:
+                    budget -= item.size
+    except zipfile.BadZipFile:
+        results.append({"filename": upload.filename, "status": "failed", "error": "Invalid ZIP archive"})
+    finally:
+        os.unlink(archive_path)
+
+
+def _stage_files(client_id: int, files: List[UploadFile], results: list) -> List[_StagedFile]:
+    """Copy uploads (and the supported members of ZIP archives) into the client's upload directory"""
+    staged = []
+
+    def stage(source, name, max_bytes=None):
+        if len(staged) >= settings.bulk_max_files:
+            results.append({"filename": name, "status": "skipped", "error": f"More than {settings.bulk_max_files} files in one request"})
+            return None
+        ext = _file_type(name)
+        path = client_upload_path(client_id, ext)
+        try:
+            size, content_hash = copy_to_disk(source, path, name, max_bytes)
+        except UploadTooLargeError as e:
+            results.append({"filename": name, "status": "failed", "error": str(e)})
+            return None
+        item = _StagedFile(name, ext, path, content_hash, size)
+        staged.append(item)
+        return item
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="bulk_upload_") as work_dir:
+            for upload in files:
+                ext = _file_type(upload.filename)
+                if ext == "zip":
+                    _stage_archive(upload, work_dir, stage, results)
+                elif ext in SUPPORTED_TYPES:
+                    stage(upload.file, upload.filename)
+                else:
+                    results.append({"filename": upload.filename, "status": "skipped", "error": "Unsupported file type"})
+    except Exception:
+        # e.g. an encrypted ZIP member or a full disk: drop what was staged before re-raising
+        _remove_staged(staged)
+        raise
+
+    return staged
+
+
+def _remove_staged(staged: List[_StagedFile]):
+    for item in staged:
+        if os.path.exists(item.path):
+            os.unlink(item.path)
+
+
+def _known_hashes(client_id: int, hashes: List[str]) -> dict:
+    """Processing status of the client's documents with these content hashes, if indexed or on the way"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Document.content_hash, Document.processing_status)
+            .filter(
+                Document.client_id == client_id,
+                Document.content_hash.in_(hashes),
+                Document.processing_status.in_(("completed", "queued", "processing")),
+            )
+            .all()
+        )
+        return {content_hash: status for content_hash, status in rows}
+    finally:
+        db.close()
+
+
+def ingest_bulk_uploads(client_id: int, files: List[UploadFile]) -> dict:
+    """
+    Queue many uploaded files and/or ZIP archives for background ingestion.
+
+    Files are deduplicated by SHA-256 of their content, both within the request
+    and against the client's documents that are indexed or already queued.
+    Each remaining file becomes an ingestion job; the workers' chunks meet in
+    the shared embedding batcher, so embeddings go out in large shared batches.
+    """
+    results = []
+    staged = _stage_files(client_id, files, results)
+    try:
+        discarded = []
+
+        unique = {}
+        for item in staged:
+            if item.content_hash in unique:
+                results.append({
+                    "filename": item.filename,
+                    "content_hash": item.content_hash,
+                    "status": "duplicate",
+                    "duplicate_of": unique[item.content_hash].filename,
+                })
+                discarded.append(item)
+            else:
+                unique[item.content_hash] = item
+
+        known = _known_hashes(client_id, list(unique)) if unique else {}
+        to_queue = []
+        for content_hash, item in unique.items():
+            if content_hash in known:
+                status = "unchanged" if known[content_hash] == "completed" else "already_queued"
+                results.append({"filename": item.filename, "content_hash": content_hash, "status": status})
+                discarded.append(item)
+            else:
+                to_queue.append(item)
+
+        for item in discarded:
+            os.unlink(item.path)
+
+        if to_queue:
+            jobs = enqueue_files(client_id, [
+                {"filename": item.filename, "file_type": item.ext, "path": item.path, "content_hash": item.content_hash}
+                for item in to_queue
+            ])
+            results.extend(
+                {"filename": item.filename, "content_hash": item.content_hash, "bytes": item.size,
+                 "status": "queued", "job_id": job["job_id"], "document_id": job["document_id"]}
+                for item, job in zip(to_queue, jobs)
+            )
+    except Exception:
+        # Nothing was queued; don't leave the staged files in the upload directory
+        _remove_staged(staged)
+        raise
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"files": results, "summary": summary}
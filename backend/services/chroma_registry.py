@@ -0,0 +1,373 @@
+# backend/services/chroma_registry.py
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from chromadb import EphemeralClient, PersistentClient
+from chromadb.api.client import SharedSystemClient
+from config import get_settings
+
+settings = get_settings()
+
+COLLECTION_NAME = "default"
+
+
+class _OpenStore:
+    """An open Chroma store and the number of calls currently using it"""
+
+    __slots__ = ("system", "collection", "leases")
+
+    def __init__(self, client, collection):
+        # client._system looks the System up in Chroma's cache, which _detach empties
+        self.system = client._system
+        self.collection = collection
+        self.leases = 0
+
+
+class ClientCollection:
+    """
+    Handle to a tenant's collection in a ChromaClientRegistry, with the Chroma
+    collection API the vector service uses (upsert, get, query, delete, count).
+
+    Each call leases the store for its duration, so the registry never closes
+    a store under a running call; a handle kept past its store's eviction
+    reopens the store on its next call.
+    """
+
+    def __init__(self, registry, client_id: int):
+        self.registry = registry
+        self.client_id = client_id
+
+    def upsert(self, *args, **kwargs):
+        with self.registry.lease(self.client_id) as collection:
+            return collection.upsert(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        with self.registry.lease(self.client_id) as collection:
+            return collection.get(*args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        with self.registry.lease(self.client_id) as collection:
+            return collection.query(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with self.registry.lease(self.client_id) as collection:
+            return collection.delete(*args, **kwargs)
+
+    def count(self) -> int:
+        with self.registry.lease(self.client_id) as collection:
+            return collection.count()
+
+
+class ChromaClientRegistry:
+    """
+    Process-wide pool of open Chroma stores, one per tenant directory.
+
+    Opening a PersistentClient loads SQLite and the HNSW segments, so stores are
+    kept open and reused. The least recently used tenants are evicted once more
+    than `max_clients` are open; an evicted store that is still leased by a
+    running call is closed when its last lease is released.
+    """
+
+    def __init__(self, base_dir: str, max_clients: int = 64):
+        self.base_dir = base_dir
+        self.max_clients = max_clients
+        self.opened = 0
+        self.evicted = 0
+        self._entries = OrderedDict()  # client_id -> _OpenStore
+        self._closing = {}  # client_id -> evicted _OpenStore still leased
+        self._lock = threading.Lock()
+        self._open_locks = {}
+
+    def path_for(self, client_id: int) -> str:
+        return os.path.join(self.base_dir, f"client_{client_id}")
+
+    def get_collection(self, client_id: int, create: bool = True):
+        """Return a handle to the tenant's collection, or None if it doesn't exist and create is False"""
+        if self._open(client_id, create) is None:
+            return None
+        return ClientCollection(self, client_id)
+
+    @contextmanager
+    def lease(self, client_id: int, create: bool = True):
+        """Hold the tenant's open Chroma collection; it is not closed until released"""
+        store = self._open(client_id, create, lease=True)
+        if store is None:
+            raise ValueError(f"No vector store for client {client_id}")
+        try:
+            yield store.collection
+        finally:
+            with self._lock:
+                store.leases -= 1
+                close = store.leases == 0 and self._closing.get(client_id) is store
+                if close:
+                    del self._closing[client_id]
+                    self._detach(client_id)
+            if close:
+                self._close(client_id, store.system)
+
+    def _acquire(self, client_id: int, lease: bool):
+        """The tenant's open store, reviving it if evicted but not yet closed (under the registry lock)"""
+        store = self._entries.get(client_id)
+        if store is None:
+            store = self._closing.pop(client_id, None)
+            if store is None:
+                return None
+            self._entries[client_id] = store
+        self._entries.move_to_end(client_id)
+        store.leases += lease
+        return store
+
+    def _open(self, client_id: int, create: bool, lease: bool = False):
+        with self._lock:
+            store = self._acquire(client_id, lease)
+            if store is not None:
+                evicted = self._evict_over_limit()
+            else:
+                open_lock = self._open_locks.setdefault(client_id, threading.Lock())
+        if store is not None:
+            self._close_all(evicted)
+            return store
+
+        # Open outside the registry lock so a slow tenant doesn't block the others
+        with open_lock:
+            with self._lock:
+                store = self._acquire(client_id, lease)
+                if store is not None:
+                    return store
+
+            path = self.path_for(client_id)
+            if not create and not os.path.isdir(path):
+                return None
+            os.makedirs(path, exist_ok=True)
+            client = PersistentClient(path=path)
+            if create:
+                collection = client.get_or_create_collection(name=COLLECTION_NAME)
+            else:
+                try:
+                    collection = client.get_collection(name=COLLECTION_NAME)
+                except ValueError:
+                    return None
+
+            with self._lock:
+                store = self._entries[client_id] = _OpenStore(client, collection)
+                store.leases += lease
+                self.opened += 1
+                evicted = self._evict_over_limit()
+                self._open_locks.pop(client_id, None)
+
+        self._close_all(evicted)
+        return store
+
+    def _evict_over_limit(self) -> list:
+        """Drop the least recently used stores beyond max_clients; returns those free to close now"""
+        evicted = []
+        while len(self._entries) > self.max_clients:
+            evicted.append(self._entries.popitem(last=False))
+        return self._release_evicted(evicted)
+
+    def _release_evicted(self, evicted: list) -> list:
+        closable = []
+        for client_id, store in evicted:
+            if store.leases:
+                self._closing[client_id] = store
+            else:
+                self._detach(client_id)
+                closable.append((client_id, store))
+        return closable
+
+    def _detach(self, client_id: int):
+        """
+        Chroma caches one System per persist directory; drop it (under the
+        registry lock) so the store is really released and a reopen of the
+        tenant gets a fresh System rather than the one being stopped.
+        """
+        self.evicted += 1
+        SharedSystemClient._identifer_to_system.pop(self.path_for(client_id), None)
+
+    def _close_all(self, stores: list):
+        for client_id, store in stores:
+            self._close(client_id, store.system)
+
+    def evict(self, client_id: int):
+        """Close a tenant's store if it is open (once no call is using it)"""
+        with self._lock:
+            store = self._entries.pop(client_id, None)
+            closable = self._release_evicted([(client_id, store)]) if store is not None else []
+        self._close_all(closable)
+
+    def _close(self, client_id: int, system):
+        try:
+            system.stop()
+        except Exception as e:
+            print(f"Error closing Chroma store for client {client_id}: {e}")
+
+    def warm(self, client_ids: Iterable[int]):
+        """Open the stores of tenants expected to be busy"""
+        for client_id in client_ids:
+            try:
+                self.get_collection(client_id, create=False)
+            except Exception as e:
+                print(f"Error warming Chroma store for client {client_id}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open_clients": len(self._entries),
+                "closing_clients": len(self._closing),
+                "max_clients": self.max_clients,
+                "opened": self.opened,
+                "evicted": self.evicted,
+            }
+
+
+def tenant_where(client_id: int, where: Optional[dict] = None) -> dict:
+    """Combine a Chroma metadata filter with the tenant filter"""
+    tenant = {"client_id": client_id}
+    return {"$and": [tenant, where]} if where else tenant
+
+
+class TenantCollection:
+    """
+    One tenant's view of a shared collection, with the Chroma collection API
+    the vector service uses (upsert, get, query, delete, count).
+
+    Every chunk is stored with a client_id metadata field and every read or
+    delete is filtered on it. IDs are prefixed with the client ID, since chunk
+    IDs are only unique within a tenant; callers never see the prefix.
+    """
+
+    def __init__(self, collection, client_id: int):
+        self.collection = collection
+        self.client_id = client_id
+        self._prefix = f"{client_id}|"
+
+    def _store_ids(self, ids: List[str]) -> List[str]:
+        return [self._prefix + chunk_id for chunk_id in ids]
+
+    def _tenant_ids(self, ids: List[str]) -> List[str]:
+        return [chunk_id[len(self._prefix):] for chunk_id in ids]
+
+    def upsert(self, ids: List[str], embeddings=None, documents=None, metadatas=None):
+        metadatas = [{**(metadata or {}), "client_id": self.client_id} for metadata in (metadatas or [{}] * len(ids))]
+        self.collection.upsert(ids=self._store_ids(ids), embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def get(self, ids: List[str] = None, where: dict = None, limit: int = None, offset: int = None,
+            include=("metadatas", "documents")):
+        results = self.collection.get(
+            ids=self._store_ids(ids) if ids is not None else None,
+            where=tenant_where(self.client_id, where), limit=limit, offset=offset, include=list(include),
+        )
+        results["ids"] = self._tenant_ids(results["ids"])
+        return results
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        results = self.collection.query(
+            query_embeddings=query_embeddings, n_results=n_results,
+            where=tenant_where(self.client_id, where), include=list(include),
+        )
+        results["ids"] = [self._tenant_ids(ids) for ids in results["ids"]]
+        return results
+
+    def delete(self, ids: List[str] = None, where: dict = None):
+        self.collection.delete(
+            ids=self._store_ids(ids) if ids is not None else None, where=tenant_where(self.client_id, where)
+        )
+
+    def count(self) -> int:
+        return len(self.collection.get(where=tenant_where(self.client_id), include=[])["ids"])
+
+
+class SharedChromaRegistry:
+    """
+    All tenants in one Chroma store, spread over `shards` collections and
+    isolated by client_id metadata.
+
+    One SQLite database and a handful of HNSW indexes replace a directory per
+    tenant, so file descriptors, memory and cold-start cost no longer grow
+    with the number of clients. Queries are filtered by tenant instead.
+    """
+
+    def __init__(self, base_dir: str, shards: int = 1):
+        self.base_dir = base_dir
+        self.shards = max(1, shards)
+        self._client = None
+        self._collections = {}
+        self._tenants = set()  # clients known to have chunks
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.base_dir, "shared")
+
+    def shard_for(self, client_id: int) -> int:
+        return client_id % self.shards
+
+    def _shard(self, shard: int):
+        with self._lock:
+            collection = self._collections.get(shard)
+            if collection is None:
+                if self._client is None:
+                    os.makedirs(self.path, exist_ok=True)
+                    self._client = PersistentClient(path=self.path)
+                collection = self._collections[shard] = self._client.get_or_create_collection(name=f"tenants_{shard}")
+            return collection
+
+    def get_collection(self, client_id: int, create: bool = True):
+        """Return the tenant's view, or None if it has no chunks and create is False"""
+        collection = TenantCollection(self._shard(self.shard_for(client_id)), client_id)
+        if client_id in self._tenants:
+            return collection
+        if not create and not collection.get(limit=1, include=[])["ids"]:
+            return None
+        with self._lock:
+            self._tenants.add(client_id)
+        return collection
+
+    def evict(self, client_id: int):
+        """Nothing is held open per tenant; just forget that it has chunks"""
+        with self._lock:
+            self._tenants.discard(client_id)
+
+    def warm(self, client_ids: Iterable[int]):
+        """Open the shard collections of tenants expected to be busy"""
+        for client_id in client_ids:
+            try:
+                self.get_collection(client_id, create=False)
+            except Exception as e:
+                print(f"Error warming Chroma shard for client {client_id}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "shards": self.shards,
+                "open_shards": len(self._collections),
+                "known_clients": len(self._tenants),
+            }
+
+
+@lru_cache()
+def get_chroma_registry():
+    """Process-wide registry shared by ingestion and query paths, for the configured layout"""
+    if settings.chroma_layout == "shared":
+        return SharedChromaRegistry(settings.chroma_persist_dir, shards=settings.chroma_shards)
+    return ChromaClientRegistry(settings.chroma_persist_dir, max_clients=settings.chroma_max_open_clients)
+
+
+def warm_query_path():
+    """
+    Run one query on a throwaway in-memory collection.
+
+    Chroma imports its query modules on the first query, and threads making
+    that first query at the same time can deadlock on those imports.
+    """
+    client = EphemeralClient()
+    collection = client.get_or_create_collection("lexsy_warmup")
+    collection.upsert(ids=["warmup"], embeddings=[[0.0, 1.0]], documents=["warmup"])
+    collection.query(query_embeddings=[[0.0, 1.0]], n_results=1)
+    client.delete_collection("lexsy_warmup")
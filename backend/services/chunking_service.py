@@ -0,0 +1,260 @@
+# backend/services/chunking_service.py
+
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from config import get_settings
+
+settings = get_settings()
+
+# Boundary strength of the unit that starts at a given position
+SENTENCE = 0
+PARAGRAPH = 1
+SECTION = 2
+
+_HEADING_RE = re.compile(
+    r"^(?:(?:article|section|schedule|exhibit|appendix|annex)\s+[\dIVXLC]+[\w.]*"
+    r"|\d+(?:\.\d+)*[.)]?\s+[A-Z]"
+    r"|[IVXLC]+\.\s+[A-Z])",
+    re.IGNORECASE,
+)
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9\"'(\[])")
+_WORD_RE = re.compile(r"\S+")
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache()
+def get_tokenizer():
+    """Returns the tiktoken encoding, or None if it cannot be loaded (e.g. offline)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(settings.tokenizer_encoding)
+    except Exception as e:
+        print(f"Tokenizer {settings.tokenizer_encoding} unavailable, using approximate counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens the way the embedding/chat models will"""
+    encoding = get_tokenizer()
+    if encoding is None:
+        return len(_APPROX_TOKEN_RE.findall(text))
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    encoding = get_tokenizer()
+    if encoding is None:
+        matches = list(_APPROX_TOKEN_RE.finditer(text))
+        return text if len(matches) <= max_tokens else text[:matches[max_tokens].start()]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def _is_heading(line: str) -> bool:
+    if _HEADING_RE.match(line):
+        return True
+    # Short all-caps lines ("TERMINATION", "GOVERNING LAW") are section titles
+    letters = [c for c in line if c.isalpha()]
+    return len(line) <= 80 and len(letters) >= 3 and all(c.isupper() for c in letters)
+
+
+class _Unit:
+    """A sentence (or word window) of the source text with its position"""
+
+    __slots__ = ("text", "gap", "start", "end", "page", "tokens", "boundary")
+
+    def __init__(self, text, gap, start, end, page, tokens, boundary):
+        self.text = text
+        self.gap = gap  # original text between the previous unit and this one
+        self.start = start
+        self.end = end
+        self.page = page
+        self.tokens = tokens
+        self.boundary = boundary
+
+
+def _block_spans(text: str) -> Iterator[Tuple[int, int, int]]:
+    """Split text into paragraph/section blocks, yielding (start, end, boundary)"""
+    offset = 0
+    block_start = None
+    block_end = 0
+    boundary = PARAGRAPH
+
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if not stripped:
+            if block_start is not None:
+                yield block_start, block_end, boundary
+                block_start = None
+            offset += len(line)
+            continue
+
+        heading = _is_heading(stripped)
+        if heading and block_start is not None:
+            yield block_start, block_end, boundary
+            block_start = None
+
+        if block_start is None:
+            block_start = offset + len(line) - len(line.lstrip())
+            boundary = SECTION if heading else PARAGRAPH
+        block_end = offset + len(line.rstrip())
+        offset += len(line)
+
+    if block_start is not None:
+        yield block_start, block_end, boundary
+
+
+def _sentence_spans(text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    pos = start
+    for match in _SENTENCE_BREAK_RE.finditer(text, start, end):
+        yield pos, match.start()
+        pos = match.end()
+    yield pos, end
+
+
+def _iter_units(segments: Iterable[Tuple[str, Optional[int]]], chunk_size: int) -> Iterator[_Unit]:
+    """Turn (text, page_number) segments into sentence units with global offsets"""
+    base = 0
+    pending_gap = ""
+
+    for text, page in segments:
+        text = text or ""
+        prev_end = 0
+        for block_start, block_end, block_boundary in _block_spans(text):
+            boundary = block_boundary
+            for start, end in _sentence_spans(text, block_start, block_end):
+                sentence = text[start:end]
+                gap = pending_gap + text[prev_end:start]
+                pending_gap = ""
+                tokens = count_tokens(sentence)
+
+                if tokens <= chunk_size:
+                    yield _Unit(sentence, gap, base + start, base + end, page, tokens, boundary)
+                else:
+                    # Oversized sentence (tables, run-on clauses): fall back to word windows
+                    for w_start, w_end in _word_windows(sentence, chunk_size):
+                        yield _Unit(
+                            sentence[w_start:w_end], gap,
+                            base + start + w_start, base + start + w_end,
+                            page, count_tokens(sentence[w_start:w_end]), boundary,
+                        )
+                        gap = " "
+                        boundary = SENTENCE
+
+                boundary = SENTENCE
+                prev_end = end
+
+        # Pages/segments are joined by a newline in the extracted text
+        pending_gap += text[prev_end:] + "\n"
+        base += len(text) + 1
+
+
+def _word_windows(text: str, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    window_start = None
+    window_end = 0
+    window_tokens = 0
+    for match in _WORD_RE.finditer(text):
+        word_tokens = count_tokens(match.group() + " ")
+        if window_start is not None and window_tokens + word_tokens > chunk_size:
+            yield window_start, window_end
+            window_start = None
+            window_tokens = 0
+        if window_start is None:
+            window_start = match.start()
+        window_end = match.end()
+        window_tokens += word_tokens
+    if window_start is not None:
+        yield window_start, window_end
+
+
+def _build_chunk(units: List[_Unit], index: int) -> dict:
+    text = units[0].text + "".join(u.gap + u.text for u in units[1:])
+    return {
+        "text": text,
+        "chunk_index": index,
+        "start_offset": units[0].start,
+        "end_offset": units[-1].end,
+        "page_start": units[0].page,
+        "page_end": units[-1].page,
+        "token_count": count_tokens(text),
+    }
+
+
+def _overlap_tail(units: List[_Unit], chunk_overlap: int) -> List[_Unit]:
+    tail = []
+    tokens = 0
+    for unit in reversed(units):
+        if tokens + unit.tokens > chunk_overlap:
+            break
+        tail.insert(0, unit)
+        tokens += unit.tokens
+    return tail
+
+
+def iter_chunks(
+    segments: Iterable[Tuple[str, Optional[int]]],
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> Iterator[dict]:
+    """
+    Split (text, page_number) segments into token-bounded chunks.
+
+    Chunks break preferably at section headings, then paragraphs, then sentences,
+    and consecutive chunks share up to `chunk_overlap` tokens of trailing sentences.
+    Offsets refer to the segments joined with newlines.
+    """
+    chunk_size = chunk_size or settings.chunk_size_tokens
+    chunk_overlap = settings.chunk_overlap_tokens if chunk_overlap is None else chunk_overlap
+    chunk_overlap = min(chunk_overlap, chunk_size // 2)
+    min_fill = chunk_size // 2
+
+    current: List[_Unit] = []
+    current_tokens = 0
+    fresh = 0  # units in `current` that are not overlap from the previous chunk
+    index = 0
+
+    for unit in _iter_units(segments, chunk_size):
+        starts_section = unit.boundary == SECTION and current_tokens >= min_fill
+        if fresh and (starts_section or current_tokens + unit.tokens > chunk_size):
+            # Prefer ending the chunk at the last paragraph/section start if it is not too early
+            cut = len(current)
+            if not starts_section:
+                for i in range(len(current) - 1, len(current) - fresh, -1):
+                    if current[i].boundary >= PARAGRAPH:
+                        head_tokens = sum(u.tokens for u in current[:i])
+                        if head_tokens >= min_fill and current_tokens - head_tokens + unit.tokens <= chunk_size:
+                            cut = i
+                        break
+
+            yield _build_chunk(current[:cut], index)
+            index += 1
+
+            carried = current[cut:]
+            overlap = [] if starts_section else _overlap_tail(current[:cut], chunk_overlap)
+            current = overlap + carried
+            current_tokens = sum(u.tokens for u in current)
+            fresh = len(carried)
+
+            # Drop overlap that would not leave room for the new unit
+            while current and current_tokens + unit.tokens > chunk_size and len(current) > fresh:
+                current_tokens -= current.pop(0).tokens
+
+        current.append(unit)
+        current_tokens += unit.tokens
+        fresh += 1
+
+    if fresh:
+        yield _build_chunk(current, index)
+
+
+def chunk_text(text: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None) -> List[dict]:
+    """Chunk a single piece of text without page information"""
+    return list(iter_chunks([(text, None)], chunk_size, chunk_overlap))
+
+
+def chunk_metadata(chunk: dict) -> dict:
+    """Chunk position fields suitable for vector store metadata (no None values)"""
+    return {k: v for k, v in chunk.items() if k != "text" and v is not None}
@@ -0,0 +1,77 @@
+# backend/services/concurrency.py
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from config import get_settings
+
+settings = get_settings()
+
+
+class OverloadedError(Exception):
+    """Raised when an endpoint's concurrency limit stays saturated for too long"""
+
+
+@lru_cache()
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """Bounded pool for blocking I/O (Chroma, SQLite, sync SDK calls)"""
+    return ThreadPoolExecutor(max_workers=settings.blocking_pool_size, thread_name_prefix="blocking")
+
+
+@lru_cache()
+def get_process_executor() -> ProcessPoolExecutor:
+    """Bounded pool for CPU-bound work such as PDF text extraction"""
+    # Forking a multithreaded server can copy locks held by other threads into the child
+    return ProcessPoolExecutor(max_workers=settings.parse_pool_size, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function on the thread pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (e.g. the request trace) over to the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_blocking_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+_semaphores = {}
+
+
+def _endpoint_limits() -> dict:
+    return {
+        "chat": settings.chat_max_concurrency,
+        "upload": settings.upload_max_concurrency,
+        "ingest": settings.ingest_max_concurrency,
+    }
+
+
+@asynccontextmanager
+async def limit_concurrency(endpoint: str):
+    """Admit at most the configured number of concurrent requests for an endpoint"""
+    semaphore = _semaphores.get(endpoint)
+    if semaphore is None:
+        semaphore = _semaphores[endpoint] = asyncio.Semaphore(_endpoint_limits()[endpoint])
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=settings.concurrency_queue_timeout_seconds)
+    except asyncio.TimeoutError:
+        raise OverloadedError(f"Too many concurrent {endpoint} requests, please retry")
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def shutdown_executors():
+    """Stop worker pools and the embedding dispatcher on application shutdown"""
+    for get_executor in (get_blocking_executor, get_process_executor):
+        if get_executor.cache_info().currsize:
+            get_executor().shutdown(wait=False, cancel_futures=True)
+            get_executor.cache_clear()
+    from services.embedding_service import get_embedding_batcher
+    if get_embedding_batcher.cache_info().currsize:
+        get_embedding_batcher().close()
+        get_embedding_batcher.cache_clear()
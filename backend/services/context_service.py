@@ -0,0 +1,139 @@
+# backend/services/context_service.py
+
+import re
+from typing import List, Optional
+
+from config import get_settings
+from services.chunking_service import count_tokens, truncate_to_tokens
+from services.lexical_index import build_match_query
+
+settings = get_settings()
+
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?;:])\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+_REPLY_HEADER_RE = re.compile(
+    r"^(?:On .{0,200}wrote:|-{2,}\s*Original Message\s*-{2,}|From: .+)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+ELLIPSIS = "…"
+# Per-message overhead of the chat format (role and separators), in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def strip_quoted_reply(text: str) -> str:
+    """Drop the quoted earlier messages an email reply carries along"""
+    match = _REPLY_HEADER_RE.search(text)
+    if match and match.start() > 0:
+        text = text[:match.start()]
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith(">")]
+    return "\n".join(lines).strip()
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _is_near_duplicate(shingles: set, kept: List[set], threshold: float) -> bool:
+    """True if most of this passage (or of a kept one) is contained in the other"""
+    for other in kept:
+        overlap = len(shingles & other)
+        smaller = min(len(shingles), len(other))
+        if smaller and overlap / smaller >= threshold:
+            return True
+    return False
+
+
+def trim_to_query(text: str, question: str, max_tokens: int, window: int = 1) -> str:
+    """
+    Keep the sentences that mention query terms, plus `window` sentences either
+    side, when the passage is longer than max_tokens. Falls back to the start
+    of the passage if no sentence matches.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    terms = set(term.strip('"') for term in build_match_query(question).split(" OR ") if term)
+    sentences = [s.strip() for s in _SENTENCE_BREAK_RE.split(text) if s.strip()]
+    hits = [i for i, sentence in enumerate(sentences) if terms & set(_WORD_RE.findall(sentence.lower()))]
+    if not hits:
+        return truncate_to_tokens(text, max_tokens)
+
+    keep = sorted({j for i in hits for j in range(max(0, i - window), min(len(sentences), i + window + 1))})
+    # Hits first (nearest to the first mention), then context sentences, until the cap
+    ordered = sorted(keep, key=lambda j: (j not in hits, j))
+    selected, used = set(), 0
+    for j in ordered:
+        tokens = count_tokens(sentences[j])
+        if used + tokens > max_tokens:
+            continue
+        selected.add(j)
+        used += tokens
+    if not selected:
+        return truncate_to_tokens(sentences[hits[0]], max_tokens)
+
+    parts, previous = [], None
+    for j in sorted(selected):
+        if previous is not None and j != previous + 1:
+            parts.append(ELLIPSIS)
+        parts.append(sentences[j])
+        previous = j
+    return " ".join(parts)
+
+
+def pack_context(results: dict, question: str, max_tokens: Optional[int] = None) -> dict:
+    """
+    Assemble the passages that go into the prompt from retrieval results.
+
+    Passages are taken in rank order: quoted replies are stripped from emails,
+    near-duplicates of an earlier passage are dropped, long passages are
+    trimmed to the sentences around the query terms, and packing stops at the
+    token budget. Returns results-shaped lists of the kept passages plus
+    "context_tokens" and counts of what was dropped.
+    """
+    budget = max_tokens if max_tokens is not None else settings.context_max_tokens
+    ids = results.get('ids', [[]])[0] or []
+    documents = results['documents'][0] if results.get('documents') else []
+    metadatas = results['metadatas'][0] if results.get('metadatas') else [{}] * len(documents)
+
+    packed = {'ids': [[]], 'documents': [[]], 'metadatas': [[]],
+              'context_tokens': 0, 'duplicates_dropped': 0, 'over_budget_dropped': 0}
+    kept_shingles = []
+    used = 0
+    for i, text in enumerate(documents):
+        metadata = metadatas[i] or {}
+        if metadata.get('source_type') == 'email':
+            text = strip_quoted_reply(text) or text
+        if not text.strip():
+            continue
+
+        shingles = _shingles(text)
+        if _is_near_duplicate(shingles, kept_shingles, settings.context_duplicate_threshold):
+            packed['duplicates_dropped'] += 1
+            continue
+
+        remaining = budget - used
+        # Once the budget is nearly spent, only passages that fit whole are worth adding
+        limit = min(settings.context_passage_max_tokens, remaining)
+        if remaining < settings.context_min_passage_tokens:
+            limit = remaining if count_tokens(text) <= remaining else 0
+        passage = trim_to_query(text, question, limit, settings.context_sentence_window) if limit else ""
+        tokens = count_tokens(passage)
+        if not passage or tokens > remaining:
+            packed['over_budget_dropped'] += 1
+            continue
+
+        kept_shingles.append(shingles)
+        used += tokens
+        packed['ids'][0].append(ids[i] if i < len(ids) else None)
+        packed['documents'][0].append(passage)
+        packed['metadatas'][0].append(metadata)
+
+    packed['context_tokens'] = used
+    return packed
+
+
+def count_prompt_tokens(messages: List[dict]) -> int:
+    """Tokens the chat model will be billed for on the prompt side"""
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages) + 3
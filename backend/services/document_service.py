@@ -1,39 +1,213 @@
 # backend/services/document_service.py
 
+import hashlib
 import os
 from fastapi import UploadFile
-from PyPDF2 import PdfReader
-from docx import Document as DocxDocument
-import tempfile
-from services.vector_service import add_text_to_vectorstore
+from collections import deque
+from concurrent.futures import BrokenExecutor
+from services.concurrency import get_process_executor
+from services.chunking_service import iter_chunks, chunk_metadata
+from services.metrics import TimedIterator, record_stage
+from services.vector_service import add_texts_to_vectorstore, delete_stale_chunks, make_source_id, update_source_vectors
+from config import get_settings
 
-def process_document_upload(client_id: int, file: UploadFile):
-    ext = file.filename.split(".")[-1].lower()
-    content = ""
+settings = get_settings()
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{ext}") as tmp:
-        tmp.write(file.file.read())
-        tmp_path = tmp.name
+SUPPORTED_TYPES = ("pdf", "docx", "txt")
+COPY_CHUNK_BYTES = 1024 * 1024
+TXT_SEGMENT_CHARS = 64 * 1024
 
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size cap"""
+
+class DocumentParseError(ValueError):
+    """Raised when a file can't be read as its type (corrupt, encrypted, mislabeled); retrying won't help"""
+
+def copy_to_disk(source, path: str, name: str, max_bytes: int = None):
+    """
+    Copy a binary stream to disk in fixed-size chunks, enforcing the size cap.
+    Returns (bytes written, SHA-256 hex digest of the content).
+    """
+    max_bytes = max_bytes if max_bytes is not None else settings.max_upload_mb * 1024 * 1024
+    written = 0
+    digest = hashlib.sha256()
     try:
-        if ext == "pdf":
-            reader = PdfReader(tmp_path)
-            content = "\n".join(page.extract_text() or "" for page in reader.pages)
-        elif ext == "docx":
-            doc = DocxDocument(tmp_path)
-            content = "\n".join(p.text for p in doc.paragraphs if p.text.strip())
-        elif ext == "txt":
-            with open(tmp_path, "r", encoding="utf-8") as f:
-                content = f.read()
-        else:
-            raise ValueError("Unsupported file type")
+        with open(path, "wb") as out:
+            while True:
+                block = source.read(COPY_CHUNK_BYTES)
+                if not block:
+                    break
+                written += len(block)
+                if written > max_bytes:
+                    raise UploadTooLargeError(f"{name} exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+                digest.update(block)
+                out.write(block)
+    except Exception:
+        os.unlink(path)
+        raise
+    return written, digest.hexdigest()
+
+def save_upload_to_disk(file: UploadFile, path: str, max_bytes: int = None):
+    """Copy an upload to disk, returning (bytes written, content hash)"""
+    return copy_to_disk(file.file, path, file.filename, max_bytes)
+
+def _extract_pdf_range(path: str, start: int, end: int):
+    """Extract the text of pages [start, end) in a worker process"""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def iter_pdf_pages_parallel(path: str, total: int, workers: int):
+    """
+    Yield (text, page_number) for every page, in order, while page ranges are
+    extracted on the shared process pool. At most `workers` ranges of this
+    document are in flight at once, which also bounds buffered pages.
+    """
+    executor = get_process_executor()
+    step = settings.pdf_pages_per_task
+    ranges = iter(range(0, total, step))
+    in_flight = deque()
+
+    def submit_next():
+        start = next(ranges, None)
+        if start is not None:
+            in_flight.append((start, executor.submit(_extract_pdf_range, path, start, min(start + step, total))))
+
+    for _ in range(workers):
+        submit_next()
+    try:
+        while in_flight:
+            start, future = in_flight.popleft()
+            texts = future.result()
+            submit_next()
+            for offset, text in enumerate(texts):
+                yield text, start + offset + 1
     finally:
-        os.unlink(tmp_path)
+        for _, future in in_flight:
+            future.cancel()
+
+def iter_segments(path: str, ext: str, on_progress=None, parallel: bool = None):
+    """
+    Lazily yield (text, page_number) segments from a file; page_number is None for non-paged formats.
+
+    PDFs with at least pdf_parallel_min_pages pages are extracted on the process
+    pool unless `parallel` says otherwise. Whatever the parser raises is
+    re-raised as DocumentParseError, except failures of the process pool or
+    the machine (I/O, memory), which may go away on a retry.
+    """
+    if ext not in SUPPORTED_TYPES:
+        raise ValueError("Unsupported file type")
+    segments = _parse_segments(path, ext, parallel)
+    try:
+        while True:
+            try:
+                text, page_number, total = next(segments)
+            except StopIteration:
+                return
+            except (BrokenExecutor, MemoryError):
+                raise
+            except OSError as e:
+                if not isinstance(e, FileNotFoundError):
+                    raise
+                raise DocumentParseError(f"Could not read the {ext} file: {e}") from e
+            except Exception as e:
+                raise DocumentParseError(f"Could not parse the {ext} file: {e}") from e
+            yield text, page_number
+            if on_progress and total:
+                on_progress("parsing", page_number, total)
+    finally:
+        # Cancels pending page ranges if the consumer stops early
+        segments.close()
+
+def _parse_segments(path: str, ext: str, parallel: bool = None):
+    """(text, page_number, total pages) segments of a file, straight from its parser"""
+    # Parsers are imported on first use to keep worker start-up light
+    if ext == "pdf":
+        from PyPDF2 import PdfReader
+        reader = PdfReader(path)
+        total = len(reader.pages)
+        workers = min(settings.pdf_max_workers_per_document, settings.parse_pool_size)
+        if parallel is None:
+            parallel = workers > 1 and total >= settings.pdf_parallel_min_pages
+        if parallel:
+            pages = iter_pdf_pages_parallel(path, total, workers)
+        else:
+            pages = ((page.extract_text() or "", i + 1) for i, page in enumerate(reader.pages))
+        for text, page_number in pages:
+            yield text, page_number, total
+    elif ext == "docx":
+        from docx import Document as DocxDocument
+        doc = DocxDocument(path)
+        for p in doc.paragraphs:
+            if p.text.strip():
+                yield p.text, None, None
+    elif ext == "txt":
+        # Yield the file in pieces, cut at blank lines where possible
+        with open(path, "r", encoding="utf-8") as f:
+            lines = []
+            size = 0
+            for line in f:
+                lines.append(line)
+                size += len(line)
+                if (size >= TXT_SEGMENT_CHARS and not line.strip()) or size >= 16 * TXT_SEGMENT_CHARS:
+                    yield "".join(lines).rstrip("\n"), None, None
+                    lines = []
+                    size = 0
+            if lines:
+                yield "".join(lines).rstrip("\n"), None, None
+
+def extract_segments(path: str, ext: str, on_progress=None, parallel: bool = None):
+    """Extract all (text, page_number) segments of a file into a list"""
+    return list(iter_segments(path, ext, on_progress, parallel))
+
+def document_source_id(document_id: int) -> str:
+    """Vector store source ID of a document's chunks (also stored on its Document row)"""
+    return make_source_id({"document_id": document_id, "source_type": "document"}, "")
+
+def index_document(client_id: int, source_id: str, filename: str, segments, on_progress=None):
+    """
+    Chunk segments and upsert them into the client's vector store as source_id.
+
+    Segments may be a lazy iterator: chunks are embedded in batches of
+    ingest_batch_chunks as they are produced, so memory stays bounded.
+    """
+    source_metadata = {"filename": filename, "source_type": "document"}
+    texts = []
+    metadatas = []
+    indexed = 0
+
+    def flush():
+        nonlocal indexed, texts, metadatas
+        add_texts_to_vectorstore(client_id, texts, metadatas, replace_sources=False)
+        indexed += len(texts)
+        texts, metadatas = [], []
+        if on_progress:
+            on_progress("embedding", indexed, 0)
+
+    # Parsing, chunking and embedding interleave; time each by what it spends producing items
+    segments = TimedIterator(segments)
+    chunks = TimedIterator(iter_chunks(segments))
+    for chunk in chunks:
+        texts.append(chunk["text"])
+        metadatas.append({**source_metadata, "source_id": source_id, **chunk_metadata(chunk)})
+        if len(texts) >= settings.ingest_batch_chunks:
+            flush()
+    if texts:
+        flush()
+    record_stage("parse", segments.seconds, filename=filename)
+    record_stage("chunk", chunks.seconds - segments.seconds, chunks=indexed)
 
-    if not content.strip():
+    if not indexed:
         raise ValueError("Uploaded file is empty or could not be parsed")
+    delete_stale_chunks(client_id, source_id, indexed)
+    # Chunks were added in batches; the document vector is computed once all are in
+    update_source_vectors(client_id, [source_id])
 
-    metadata = {"filename": file.filename, "source_type": "document"}
-    add_text_to_vectorstore(client_id, content, metadata)
+    return {
+        "message": f"Uploaded and embedded {filename}",
+        "chunks": indexed
+    }
 
-    return {"message": f"Uploaded and embedded {file.filename}"}
+def ingest_document_file(client_id: int, source_id: str, path: str, filename: str, ext: str, on_progress=None):
+    """Parse and index a file already on disk, reporting progress as (stage, done, total)"""
+    return index_document(client_id, source_id, filename, iter_segments(path, ext, on_progress), on_progress)
@@ -0,0 +1,78 @@
+# backend/services/email_service.py
+
+from services.vector_service import add_texts_to_vectorstore
+from services.source_catalog import record_emails
+from datetime import datetime
+
+def ingest_sample_emails(client_id: int):
+    """Ingest sample emails for demo purposes"""
+    
+    sample_emails = [
+        {
+            'subject': 'Contract Review Request',
+            'sender': 'client@example.com',
+            'recipient': 'legal@lexsy.com', 
+            'body': 'Hi, please review the attached service agreement. We need this completed by end of week.',
+            'date_sent': '2025-07-20'
+        },
+        {
+            'subject': 'Re: Contract Review Request',
+            'sender': 'legal@lexsy.com',
+            'recipient': 'client@example.com',
+            'body': 'Thanks for sending this. I have reviewed the agreement and have some concerns about the liability clauses in section 4.',
+            'date_sent': '2025-07-21'
+        },
+        {
+            'subject': 'Compliance Question',
+            'sender': 'client@example.com', 
+            'recipient': 'legal@lexsy.com',
+            'body': 'Do we need to file any additional paperwork for the new state registration?',
+            'date_sent': '2025-07-22'
+        }
+    ]
+    
+    # Embed every email in one batched call instead of one request per email;
+    # if the batch fails, retry one by one so a bad email doesn't sink the rest
+    errors = []
+    try:
+        _index_emails(client_id, sample_emails)
+        emails_processed = len(sample_emails)
+    except Exception as e:
+        print(f"Error processing sample emails as a batch, retrying individually: {e}")
+        emails_processed = 0
+        for email in sample_emails:
+            try:
+                _index_emails(client_id, [email])
+                emails_processed += 1
+            except Exception as e:
+                print(f"Error processing sample email '{email['subject']}': {e}")
+                errors.append({'subject': email['subject'], 'error': str(e)})
+    
+    result = {
+        'emails_processed': emails_processed,
+        'emails_failed': len(errors),
+        'message': f'Successfully ingested {emails_processed} sample emails'
+    }
+    if errors:
+        result['errors'] = errors
+        result['message'] = f'Ingested {emails_processed} of {len(sample_emails)} sample emails'
+    return result
+
+def _index_emails(client_id: int, emails: list):
+    texts = [email['body'] for email in emails]
+    metadatas = [
+        {
+            'source_type': 'email',
+            'subject': email['subject'],
+            'sender': email['sender'],
+            'recipient': email['recipient'],
+            'date_sent': email['date_sent']
+        }
+        for email in emails
+    ]
+    ids = add_texts_to_vectorstore(client_id, texts, metadatas)
+    # Mirror into the emails table so chat filters can resolve senders and dates there
+    record_emails(client_id, [
+        {**email, 'source_id': chunk_id.rsplit(':', 1)[0]}
+        for email, chunk_id in zip(emails, ids)
+    ])
@@ -0,0 +1,214 @@
+# backend/services/embedding_service.py
+
+import hashlib
+import math
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import List
+
+from config import get_settings
+from services.chunking_service import count_tokens, truncate_to_tokens
+from services.openai_client import get_openai_client
+
+settings = get_settings()
+
+_STUB_TOKEN_RE = re.compile(r"\w+")
+
+# Queued by close() to stop the dispatcher thread
+_STOP = object()
+
+
+class OpenAIEmbeddingBackend:
+    """Embeds a list of texts with one OpenAI embeddings request"""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = get_openai_client().embeddings.create(model=self.model, input=texts)
+        # The API documents `index` as the position in the input list
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class StubEmbeddingBackend:
+    """
+    Deterministic local embedder for offline benchmarks and development.
+
+    Words are hashed into a fixed number of dimensions, so texts sharing
+    vocabulary get similar vectors. `request_latency_ms` and `item_latency_ms`
+    simulate the network round-trip and per-input cost of a real API.
+    """
+
+    def __init__(self, dimensions: int = 1536, request_latency_ms: float = 0.0, item_latency_ms: float = 0.0):
+        self.model = f"stub-{dimensions}"
+        self.dimensions = dimensions
+        self.request_latency_ms = request_latency_ms
+        self.item_latency_ms = item_latency_ms
+        self.requests = 0
+
+    def embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in _STUB_TOKEN_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        delay = self.request_latency_ms + self.item_latency_ms * len(texts)
+        if delay:
+            time.sleep(delay / 1000)
+        return [self.embed_one(text) for text in texts]
+
+
+class _PendingText:
+    __slots__ = ("text", "tokens", "future")
+
+    def __init__(self, text: str, tokens: int):
+        self.text = text
+        self.tokens = tokens
+        self.future = Future()
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces embedding requests from concurrent callers into shared API batches.
+
+    Texts are queued individually; a dispatcher thread groups them into batches
+    of at most `max_batch_inputs` texts and `max_batch_tokens` tokens, waiting up
+    to `max_wait_ms` for more work before sending a partial batch.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_batch_inputs: int = 256,
+        max_batch_tokens: int = 100000,
+        max_input_tokens: int = 8191,
+        max_wait_ms: float = 10,
+        max_concurrent_batches: int = 4,
+        timeout_seconds: float = 300,
+    ):
+        self.backend = backend
+        self.max_batch_inputs = max_batch_inputs
+        self.max_batch_tokens = max_batch_tokens
+        self.max_input_tokens = max_input_tokens
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout_seconds
+        self.batches_sent = 0
+        self.texts_embedded = 0
+
+        self._queue = queue.Queue()
+        self._carry = None
+        # Holding back while all batch slots are busy lets the queue grow into bigger batches
+        self._slots = threading.BoundedSemaphore(max_concurrent_batches)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="embed-batch")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embed-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, blocking until every vector is available"""
+        pending = []
+        for text in texts:
+            tokens = count_tokens(text)
+            if tokens > self.max_input_tokens:
+                text = truncate_to_tokens(text, self.max_input_tokens)
+                tokens = self.max_input_tokens
+            item = _PendingText(text, tokens)
+            pending.append(item)
+            self._queue.put(item)
+        deadline = time.monotonic() + self.timeout
+        try:
+            return [item.future.result(timeout=max(deadline - time.monotonic(), 0)) for item in pending]
+        except FutureTimeoutError:
+            raise TimeoutError(f"Embedding {len(texts)} texts timed out after {self.timeout:g}s")
+
+    def close(self):
+        """Stop the dispatcher once the queued texts are sent, and wait for the running batches"""
+        self._queue.put(_STOP)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def _next_batch(self) -> List[_PendingText]:
+        first = self._carry or self._queue.get()
+        self._carry = None
+        if first is _STOP:
+            return []
+        batch = [first]
+        tokens = first.tokens
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_inputs:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP or tokens + item.tokens > self.max_batch_tokens:
+                self._carry = item
+                break
+            batch.append(item)
+            tokens += item.tokens
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            batch = self._next_batch()
+            if not batch:
+                self._slots.release()
+                return
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: List[_PendingText]):
+        try:
+            vectors = self.backend.embed([item.text for item in batch])
+        except Exception as e:
+            for item in batch:
+                item.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        if len(vectors) != len(batch):
+            error = ValueError(f"Embedding backend returned {len(vectors)} vectors for {len(batch)} texts")
+            for item in batch:
+                item.future.set_exception(error)
+            return
+        self.batches_sent += 1
+        self.texts_embedded += len(batch)
+        for item, vector in zip(batch, vectors):
+            item.future.set_result(vector)
+
+
+def create_embedding_backend(name: str = None):
+    """Build the embedding backend selected in settings (openai | stub)"""
+    name = name or settings.embedding_backend
+    if name == "stub":
+        return StubEmbeddingBackend(
+            dimensions=settings.embedding_stub_dimensions,
+            request_latency_ms=settings.embedding_stub_request_latency_ms,
+            item_latency_ms=settings.embedding_stub_item_latency_ms,
+        )
+    if name == "openai":
+        return OpenAIEmbeddingBackend(settings.embedding_model)
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+@lru_cache()
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Process-wide batcher shared by every ingestion path"""
+    return EmbeddingBatcher(
+        create_embedding_backend(),
+        max_batch_inputs=settings.embedding_batch_size,
+        max_batch_tokens=settings.embedding_batch_max_tokens,
+        max_input_tokens=settings.embedding_max_input_tokens,
+        max_wait_ms=settings.embedding_batch_max_wait_ms,
+        max_concurrent_batches=settings.embedding_max_concurrent_batches,
+        timeout_seconds=settings.embedding_timeout_seconds,
+    )
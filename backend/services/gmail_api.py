@@ -0,0 +1,254 @@
+# backend/services/gmail_api.py
+
+import base64
+import threading
+import time
+from email.utils import format_datetime, parseaddr, parsedate_to_datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional
+
+
+class HistoryExpiredError(Exception):
+    """The requested startHistoryId is too old for the mailbox history; do a full sync"""
+
+
+class GmailApiError(Exception):
+    """Any other failure talking to the Gmail API"""
+
+
+def _header(payload: dict, name: str) -> str:
+    for header in payload.get("headers", []):
+        if header.get("name", "").lower() == name.lower():
+            return header.get("value", "")
+    return ""
+
+
+def _decode(data: str) -> str:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", errors="replace")
+
+
+def _plain_text(payload: dict) -> str:
+    """First text/plain body found walking the MIME tree"""
+    if payload.get("mimeType") == "text/plain" and payload.get("body", {}).get("data"):
+        return _decode(payload["body"]["data"])
+    for part in payload.get("parts", []) or []:
+        text = _plain_text(part)
+        if text:
+            return text
+    return ""
+
+
+def parse_message(message: dict) -> dict:
+    """Flatten a Gmail API message resource (format=full) into the fields we index"""
+    payload = message.get("payload", {})
+    date_sent = None
+    if message.get("internalDate"):
+        date_sent = datetime.fromtimestamp(int(message["internalDate"]) / 1000, tz=timezone.utc)
+    elif _header(payload, "Date"):
+        date_sent = parsedate_to_datetime(_header(payload, "Date"))
+    return {
+        "message_id": message["id"],
+        "thread_id": message.get("threadId"),
+        "history_id": int(message.get("historyId") or 0),
+        "subject": _header(payload, "Subject"),
+        "sender": parseaddr(_header(payload, "From"))[1] or _header(payload, "From"),
+        "recipient": parseaddr(_header(payload, "To"))[1] or _header(payload, "To"),
+        "date_sent": date_sent.isoformat() if date_sent else None,
+        "body": _plain_text(payload) or message.get("snippet", ""),
+    }
+
+
+class GoogleGmailApi:
+    """
+    Thin wrapper over the Gmail REST API (google-api-python-client).
+
+    The discovery client is not thread-safe, so each thread builds its own.
+    """
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._local = threading.local()
+
+    def _service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            from googleapiclient.discovery import build
+            service = self._local.service = build("gmail", "v1", credentials=self.credentials, cache_discovery=False)
+        return service
+
+    def _call(self, request):
+        from googleapiclient.errors import HttpError
+        try:
+            return request.execute()
+        except HttpError as e:
+            raise GmailApiError(str(e))
+
+    def get_profile(self) -> dict:
+        return self._call(self._service().users().getProfile(userId="me"))
+
+    def list_messages(self, query: str = None, page_token: str = None, max_results: int = 100) -> dict:
+        return self._call(self._service().users().messages().list(
+            userId="me", q=query or None, pageToken=page_token, maxResults=max_results
+        ))
+
+    def list_history(self, start_history_id: int, page_token: str = None, max_results: int = 100) -> dict:
+        from googleapiclient.errors import HttpError
+        request = self._service().users().history().list(
+            userId="me", startHistoryId=str(start_history_id), historyTypes="messageAdded",
+            pageToken=page_token, maxResults=max_results
+        )
+        try:
+            return request.execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpiredError(str(e))
+            raise GmailApiError(str(e))
+
+    def get_thread(self, thread_id: str) -> dict:
+        return self._call(self._service().users().threads().get(userId="me", id=thread_id, format="minimal"))
+
+    def get_message(self, message_id: str) -> dict:
+        return self._call(self._service().users().messages().get(userId="me", id=message_id, format="full"))
+
+
+class FakeGmailApi:
+    """
+    In-memory stand-in for the Gmail API, for offline development and tests.
+
+    Returns resources shaped like the real API's (base64url bodies, headers,
+    page tokens, history records) so the sync code runs unchanged against it.
+    `latency_ms` simulates the round-trip of each call.
+    """
+
+    def __init__(self, address: str = "me@lexsy.com", latency_ms: float = 0.0, history_retention: int = None):
+        self.address = address
+        self.latency_ms = latency_ms
+        self.history_retention = history_retention
+        self.calls = {"list_messages": 0, "list_history": 0, "get_thread": 0, "get_message": 0}
+        self._messages = {}
+        self._order = []
+        self._history = []  # (history_id, message_id)
+        self._history_id = 1000
+        self._lock = threading.Lock()
+
+    def add_message(self, thread_id: str, sender: str, recipient: str, subject: str, body: str,
+                    date: datetime = None, message_id: str = None) -> str:
+        """Deliver a message to the fake mailbox, returning its ID"""
+        date = date or datetime.now(timezone.utc)
+        with self._lock:
+            self._history_id += 1
+            message_id = message_id or f"msg{self._history_id:08x}"
+            self._messages[message_id] = {
+                "id": message_id,
+                "threadId": thread_id,
+                "historyId": str(self._history_id),
+                "internalDate": str(int(date.timestamp() * 1000)),
+                "snippet": body[:100],
+                "payload": {
+                    "mimeType": "text/plain",
+                    "headers": [
+                        {"name": "From", "value": sender},
+                        {"name": "To", "value": recipient},
+                        {"name": "Subject", "value": subject},
+                        {"name": "Date", "value": format_datetime(date)},
+                    ],
+                    "body": {"data": base64.urlsafe_b64encode(body.encode("utf-8")).decode("ascii")},
+                },
+            }
+            self._order.append(message_id)
+            self._history.append((self._history_id, message_id))
+            if self.history_retention is not None:
+                self._history = self._history[-self.history_retention:]
+        return message_id
+
+    def _tick(self, call: str):
+        with self._lock:
+            self.calls[call] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    @staticmethod
+    def _page(items: List, page_token: Optional[str], max_results: int):
+        start = int(page_token or 0)
+        end = start + max_results
+        return items[start:end], (str(end) if end < len(items) else None)
+
+    def get_profile(self) -> dict:
+        return {"emailAddress": self.address, "historyId": str(self._history_id)}
+
+    def list_messages(self, query: str = None, page_token: str = None, max_results: int = 100) -> dict:
+        self._tick("list_messages")
+        with self._lock:
+            newest_first = [{"id": m, "threadId": self._messages[m]["threadId"]} for m in reversed(self._order)]
+        items, next_token = self._page(newest_first, page_token, max_results)
+        result = {"messages": items, "resultSizeEstimate": len(newest_first)}
+        if next_token:
+            result["nextPageToken"] = next_token
+        return result
+
+    def list_history(self, start_history_id: int, page_token: str = None, max_results: int = 100) -> dict:
+        self._tick("list_history")
+        with self._lock:
+            if self._history and int(start_history_id) < self._history[0][0] - 1:
+                raise HistoryExpiredError(f"startHistoryId {start_history_id} is no longer available")
+            records = [
+                {"id": str(history_id), "messagesAdded": [{"message": {"id": m, "threadId": self._messages[m]["threadId"]}}]}
+                for history_id, m in self._history if history_id > int(start_history_id)
+            ]
+            current = str(self._history_id)
+        items, next_token = self._page(records, page_token, max_results)
+        result = {"history": items, "historyId": current}
+        if next_token:
+            result["nextPageToken"] = next_token
+        return result
+
+    def get_thread(self, thread_id: str) -> dict:
+        self._tick("get_thread")
+        with self._lock:
+            messages = [
+                {"id": m, "threadId": thread_id, "historyId": self._messages[m]["historyId"]}
+                for m in self._order if self._messages[m]["threadId"] == thread_id
+            ]
+        if not messages:
+            raise GmailApiError(f"Thread {thread_id} not found")
+        return {"id": thread_id, "historyId": messages[-1]["historyId"], "messages": messages}
+
+    def get_message(self, message_id: str) -> dict:
+        self._tick("get_message")
+        with self._lock:
+            message = self._messages.get(message_id)
+        if message is None:
+            raise GmailApiError(f"Message {message_id} not found")
+        return message
+
+
+MOCK_THREAD_ID = "mock-thread-equity-grant"
+
+
+def seed_mock_thread(api: FakeGmailApi, thread_id: str = MOCK_THREAD_ID):
+    """A short legal email thread used by the demo and offline tests"""
+    messages = [
+        ("founder@startup.com", "legal@lexsy.com", "Equity grant for John Smith",
+         "Hi team, we'd like to grant John Smith 50,000 options as our new advisor. "
+         "Can you draft the advisor agreement?", datetime(2025, 7, 1, 9, 30, tzinfo=timezone.utc)),
+        ("legal@lexsy.com", "founder@startup.com", "Re: Equity grant for John Smith",
+         "Happy to. Standard advisor terms would be a 2-year vesting schedule with monthly vesting "
+         "and no cliff. Does the board approval from June cover this grant?\n\n"
+         "On Tue, Jul 1, 2025, founder@startup.com wrote:\n> Hi team, we'd like to grant John Smith 50,000 options.",
+         datetime(2025, 7, 1, 14, 5, tzinfo=timezone.utc)),
+        ("founder@startup.com", "legal@lexsy.com", "Re: Equity grant for John Smith",
+         "Yes, the June board consent approved up to 75,000 options for advisors. "
+         "Please add a single-trigger acceleration clause on change of control.",
+         datetime(2025, 7, 2, 10, 0, tzinfo=timezone.utc)),
+    ]
+    for i, (sender, recipient, subject, body, date) in enumerate(messages):
+        api.add_message(thread_id, sender, recipient, subject, body, date, message_id=f"{thread_id}-{i}")
+
+
+@lru_cache()
+def get_fake_gmail_api() -> FakeGmailApi:
+    """Process-wide fake mailbox, seeded with the demo thread"""
+    api = FakeGmailApi()
+    seed_mock_thread(api)
+    return api
@@ -1,53 +1,303 @@
-# backend/services/email_service.py
-
-from services.vector_service import add_text_to_vectorstore
-from datetime import datetime
-
-def ingest_sample_emails(client_id: int):
-    """Ingest sample emails for demo purposes"""
-    
-    sample_emails = [
-        {
-            'subject': 'Contract Review Request',
-            'sender': 'client@example.com',
-            'recipient': 'legal@lexsy.com', 
-            'body': 'Hi, please review the attached service agreement. We need this completed by end of week.',
-            'date_sent': '2025-07-20'
-        },
-        {
-            'subject': 'Re: Contract Review Request',
-            'sender': 'legal@lexsy.com',
-            'recipient': 'client@example.com',
-            'body': 'Thanks for sending this. I have reviewed the agreement and have some concerns about the liability clauses in section 4.',
-            'date_sent': '2025-07-21'
-        },
-        {
-            'subject': 'Compliance Question',
-            'sender': 'client@example.com', 
-            'recipient': 'legal@lexsy.com',
-            'body': 'Do we need to file any additional paperwork for the new state registration?',
-            'date_sent': '2025-07-22'
-        }
-    ]
-    
-    emails_processed = 0
-    for email in sample_emails:
+# backend/services/gmail_service.py
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import get_settings
+from db.database import SessionLocal
+from models.email import Email
+from models.gmail_sync_state import GmailSyncState
+from services.chunking_service import chunk_metadata, chunk_text
+from services.context_service import strip_quoted_reply
+from services.gmail_api import (
+    MOCK_THREAD_ID, GoogleGmailApi, HistoryExpiredError, get_fake_gmail_api, parse_message
+)
+from services.source_catalog import record_emails
+from services.vector_service import add_texts_to_vectorstore
+
+settings = get_settings()
+
+SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
+
+
+def message_source_id(message_id: str) -> str:
+    """Vector store source ID of a Gmail message's chunks"""
+    return f"gmail_{message_id}"
+
+
+class GmailService:
+    """
+    Gmail OAuth plus incremental ingestion of threads and whole mailboxes.
+
+    Every ingested message is recorded in the emails table with its Gmail
+    message ID, so re-syncing only downloads and embeds messages not seen
+    before. Each successful mailbox sync stores the mailbox history ID it
+    reached (gmail_sync_state), which the next sync resumes from; a full sync
+    cut short by the page cap stores its listing position instead, and only
+    moves the checkpoint once the listing is complete.
+    """
+
+    def __init__(self):
+        self._credentials = None
+        self._api = None
+        self._lock = threading.Lock()
+
+    # --- OAuth ---
+
+    def _flow(self):
+        from google_auth_oauthlib.flow import Flow
+        if os.path.exists(settings.gmail_credentials_path):
+            flow = Flow.from_client_secrets_file(settings.gmail_credentials_path, scopes=SCOPES)
+        elif settings.google_client_id and settings.google_client_secret:
+            flow = Flow.from_client_config({"web": {
+                "client_id": settings.google_client_id,
+                "client_secret": settings.google_client_secret,
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            }}, scopes=SCOPES)
+        else:
+            raise ValueError("Gmail OAuth is not configured (no credentials.json or GOOGLE_CLIENT_ID/SECRET)")
+        flow.redirect_uri = settings.gmail_redirect_uri
+        return flow
+
+    def get_authorization_url(self) -> str:
+        auth_url, _ = self._flow().authorization_url(access_type="offline", prompt="consent")
+        return auth_url
+
+    def handle_oauth_callback(self, code: str) -> dict:
+        flow = self._flow()
+        flow.fetch_token(code=code)
+        with open(settings.gmail_token_path, "w") as f:
+            f.write(flow.credentials.to_json())
+        with self._lock:
+            self._credentials = flow.credentials
+            self._api = None
+        return {"authenticated": True}
+
+    def _load_credentials(self):
+        with self._lock:
+            credentials = self._credentials
+            if credentials is None and os.path.exists(settings.gmail_token_path):
+                from google.oauth2.credentials import Credentials
+                with open(settings.gmail_token_path) as f:
+                    credentials = Credentials.from_authorized_user_info(json.load(f), SCOPES)
+            if credentials is not None and not credentials.valid and credentials.expired and credentials.refresh_token:
+                from google.auth.transport.requests import Request
+                credentials.refresh(Request())
+                with open(settings.gmail_token_path, "w") as f:
+                    f.write(credentials.to_json())
+            self._credentials = credentials
+            return credentials
+
+    def is_configured(self) -> bool:
+        """Whether Gmail can be used at all: the fake backend, or OAuth client credentials"""
+        if settings.gmail_backend == "fake":
+            return True
+        return os.path.exists(settings.gmail_credentials_path) or bool(
+            settings.google_client_id and settings.google_client_secret
+        )
+
+    def is_authenticated(self) -> bool:
+        if settings.gmail_backend == "fake":
+            return True
         try:
-            metadata = {
-                'source_type': 'email',
-                'subject': email['subject'],
-                'sender': email['sender'],
-                'recipient': email['recipient'],
-                'date_sent': email['date_sent']
-            }
-            
-            add_text_to_vectorstore(client_id, email['body'], metadata)
-            emails_processed += 1
-            
+            credentials = self._load_credentials()
         except Exception as e:
-            print(f"Error processing sample email: {e}")
-    
-    return {
-        'emails_processed': emails_processed,
-        'message': f'Successfully ingested {emails_processed} sample emails'
-    }
+            print(f"Error loading Gmail credentials: {e}")
+            return False
+        return credentials is not None and credentials.valid
+
+    def get_api(self):
+        """The configured Gmail API: the real one (needs OAuth) or the offline fake"""
+        if settings.gmail_backend == "fake":
+            return get_fake_gmail_api()
+        credentials = self._load_credentials()
+        if credentials is None or not credentials.valid:
+            raise ValueError("Gmail is not connected; authenticate via /auth/gmail first")
+        with self._lock:
+            if self._api is None or self._api.credentials is not credentials:
+                self._api = GoogleGmailApi(credentials)
+            return self._api
+
+    # --- Ingestion ---
+
+    @staticmethod
+    def get_checkpoint(client_id: int):
+        """History ID the next mailbox sync resumes from (None before the first sync)"""
+        db = SessionLocal()
+        try:
+            state = db.get(GmailSyncState, client_id)
+            return state.history_id if state else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_full_sync_progress(client_id: int):
+        """(history ID, page token) of an unfinished full sync, or None"""
+        db = SessionLocal()
+        try:
+            state = db.get(GmailSyncState, client_id)
+            if state is None or not state.full_sync_page_token:
+                return None
+            return state.full_sync_history_id, state.full_sync_page_token
+        finally:
+            db.close()
+
+    @staticmethod
+    def save_checkpoint(client_id: int, history_id: int, full_sync_progress: tuple = None):
+        db = SessionLocal()
+        try:
+            state = db.get(GmailSyncState, client_id)
+            if state is None:
+                state = GmailSyncState(client_id=client_id)
+                db.add(state)
+            state.history_id = history_id
+            state.full_sync_history_id, state.full_sync_page_token = full_sync_progress or (None, None)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _new_message_ids(client_id: int, message_ids: list) -> list:
+        message_ids = list(dict.fromkeys(message_ids))
+        if not message_ids:
+            return []
+        db = SessionLocal()
+        try:
+            known = {
+                row[0] for row in db.query(Email.gmail_message_id)
+                .filter(Email.client_id == client_id, Email.gmail_message_id.in_(message_ids)).all()
+            }
+        finally:
+            db.close()
+        return [message_id for message_id in message_ids if message_id not in known]
+
+    @staticmethod
+    def _index_messages(client_id: int, messages: list, keep_history: bool):
+        texts, metadatas = [], []
+        for message in messages:
+            body = strip_quoted_reply(message["body"]) or message["body"]
+            base = {
+                "source_type": "email",
+                "source_id": message_source_id(message["message_id"]),
+                "subject": message["subject"],
+                "sender": message["sender"],
+                "recipient": message["recipient"],
+                "date_sent": message["date_sent"],
+                "thread_id": message["thread_id"],
+                "message_id": message["message_id"],
+            }
+            base = {k: v for k, v in base.items() if v is not None}
+            for chunk in chunk_text(body):
+                texts.append(chunk["text"])
+                metadatas.append({**base, **chunk_metadata(chunk)})
+        if texts:
+            add_texts_to_vectorstore(client_id, texts, metadatas)
+        # Recorded after the vectors, so a crash in between only means a re-fetch
+        record_emails(client_id, [
+            {**message, "source_id": message_source_id(message["message_id"]),
+             "history_id": message["history_id"] if keep_history else None}
+            for message in messages
+        ])
+
+    def _sync_pages(self, client_id: int, api, list_page, keep_history: bool, page_token: str = None):
+        """
+        Page through message IDs with list_page(page_token) -> (ids, next_token),
+        downloading and indexing only messages not seen before. The next page is
+        listed while the current page's messages download, all on one pool of
+        gmail_fetch_concurrency threads.
+
+        Returns the counts and the token of the first page not listed (None if
+        the listing finished within gmail_max_pages).
+        """
+        processed = skipped = pages = 0
+        with ThreadPoolExecutor(max_workers=settings.gmail_fetch_concurrency, thread_name_prefix="gmail-fetch") as pool:
+            next_page = pool.submit(list_page, page_token)
+            while next_page is not None:
+                message_ids, token = next_page.result()
+                pages += 1
+                next_page = pool.submit(list_page, token) if token and pages < settings.gmail_max_pages else None
+                new_ids = self._new_message_ids(client_id, message_ids)
+                skipped += len(set(message_ids)) - len(new_ids)
+                if new_ids:
+                    messages = [parse_message(message) for message in pool.map(api.get_message, new_ids)]
+                    self._index_messages(client_id, messages, keep_history)
+                    processed += len(messages)
+        result = {"emails_processed": processed, "emails_skipped": skipped, "pages": pages, "has_more": bool(token)}
+        return result, token
+
+    def ingest_gmail_thread(self, client_id: int, thread_id: str, api=None) -> dict:
+        """Ingest the messages of one thread that haven't been ingested yet"""
+        api = api or self.get_api()
+        thread = api.get_thread(thread_id)
+        message_ids = [message["id"] for message in thread.get("messages", [])]
+        result, _ = self._sync_pages(client_id, api, lambda token: (message_ids, None), keep_history=False)
+        return {
+            "thread_id": thread_id,
+            **result,
+            "message": f"Ingested {result['emails_processed']} new emails from thread {thread_id}",
+        }
+
+    def sync_mailbox(self, client_id: int, api=None) -> dict:
+        """
+        Incrementally sync the mailbox: from the client's history checkpoint if
+        there is one, otherwise (or if Gmail no longer has that history) a full
+        listing filtered by gmail_sync_query. Each call lists at most
+        gmail_max_pages pages; has_more in the result means calling again
+        continues where this one stopped.
+        """
+        api = api or self.get_api()
+        checkpoint = self.get_checkpoint(client_id)
+        full_sync_progress = self.get_full_sync_progress(client_id)
+        if checkpoint and not full_sync_progress:
+            reached = {"history_id": checkpoint}
+
+            def list_history_page(token):
+                page = api.list_history(checkpoint, token, settings.gmail_page_size)
+                records = page.get("history", [])
+                message_ids = [
+                    added["message"]["id"]
+                    for record in records
+                    for added in record.get("messagesAdded", [])
+                ]
+                # The last page listed is the last one indexed; if the page cap cut the
+                # history short, resume after its last record rather than the mailbox head
+                if page.get("nextPageToken") and records:
+                    reached["history_id"] = int(records[-1]["id"])
+                elif not page.get("nextPageToken"):
+                    reached["history_id"] = int(page.get("historyId") or checkpoint)
+                return message_ids, page.get("nextPageToken")
+
+            try:
+                result, _ = self._sync_pages(client_id, api, list_history_page, keep_history=True)
+                self.save_checkpoint(client_id, reached["history_id"])
+                return {"mode": "incremental", "previous_checkpoint": checkpoint,
+                        "checkpoint": reached["history_id"], **result}
+            except HistoryExpiredError:
+                print(f"Gmail history {checkpoint} expired for client {client_id}, running a full sync")
+
+        def list_messages_page(token):
+            page = api.list_messages(settings.gmail_sync_query, token, settings.gmail_page_size)
+            return [message["id"] for message in page.get("messages", [])], page.get("nextPageToken")
+
+        if full_sync_progress:
+            history_id, page_token = full_sync_progress
+        else:
+            # Taken before listing, so messages that arrive during the sync are picked up by the next one
+            history_id, page_token = int(api.get_profile()["historyId"]), None
+        result, page_token = self._sync_pages(client_id, api, list_messages_page, keep_history=True, page_token=page_token)
+        if page_token:
+            # Messages past the page cap are listed by the next call before history is followed
+            self.save_checkpoint(client_id, checkpoint, full_sync_progress=(history_id, page_token))
+            return {"mode": "full", "previous_checkpoint": checkpoint, "checkpoint": checkpoint, **result}
+        self.save_checkpoint(client_id, history_id)
+        return {"mode": "full", "previous_checkpoint": checkpoint, "checkpoint": history_id, **result}
+
+    def create_mock_conversation(self, client_id: int) -> dict:
+        """Ingest the demo thread from the offline fake mailbox"""
+        return self.ingest_gmail_thread(client_id, MOCK_THREAD_ID, api=get_fake_gmail_api())
+
+
+gmail_service = GmailService()
@@ -0,0 +1,286 @@
+# backend/services/ingestion_service.py
+
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List
+
+from fastapi import UploadFile
+from sqlalchemy import or_, and_, update
+from config import get_settings
+from db.database import SessionLocal
+from models.document import Document
+from models.ingestion_job import IngestionJob
+from services.document_service import SUPPORTED_TYPES, document_source_id, ingest_document_file, save_upload_to_disk
+from services.vector_service import delete_stale_chunks, update_source_vectors
+
+settings = get_settings()
+
+
+def job_to_dict(job: IngestionJob) -> dict:
+    return {
+        "job_id": job.id,
+        "client_id": job.client_id,
+        "document_id": job.document_id,
+        "filename": job.filename,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": {"current": job.progress_current or 0, "total": job.progress_total or 0},
+        "chunks": job.chunks or 0,
+        "attempts": job.attempts or 0,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def client_upload_path(client_id: int, ext: str) -> str:
+    """A fresh path in the client's upload directory, where queued files wait for a worker"""
+    client_dir = os.path.join(settings.upload_dir, f"client_{client_id}")
+    os.makedirs(client_dir, exist_ok=True)
+    return os.path.join(client_dir, f"{uuid.uuid4().hex}.{ext}")
+
+
+def enqueue_files(client_id: int, files: List[dict]) -> List[dict]:
+    """
+    Queue files already on disk (dicts with filename, file_type, path and
+    content_hash) for background ingestion, in one transaction. The files
+    are removed if queueing fails.
+    """
+    db = SessionLocal()
+    try:
+        jobs = []
+        for file in files:
+            document = Document(
+                client_id=client_id, filename=file["filename"], file_type=file["file_type"],
+                processing_status="queued", content_hash=file["content_hash"]
+            )
+            db.add(document)
+            db.flush()
+            document.source_id = document_source_id(document.id)
+            job = IngestionJob(
+                client_id=client_id,
+                document_id=document.id,
+                filename=file["filename"],
+                file_type=file["file_type"],
+                file_path=file["path"],
+                status="queued",
+                max_attempts=settings.ingest_max_attempts,
+                next_attempt_at=datetime.utcnow(),
+            )
+            db.add(job)
+            jobs.append(job)
+        db.commit()
+        results = [job_to_dict(job) for job in jobs]
+    except Exception:
+        db.rollback()
+        for file in files:
+            IngestionWorkerPool._remove_file(file["path"])
+        raise
+    finally:
+        db.close()
+
+    get_ingestion_workers().notify()
+    return results
+
+
+def enqueue_document_upload(client_id: int, file: UploadFile) -> dict:
+    """Store the upload on disk and queue it for background ingestion"""
+    ext = file.filename.split(".")[-1].lower()
+    if ext not in SUPPORTED_TYPES:
+        raise ValueError("Unsupported file type")
+
+    path = client_upload_path(client_id, ext)
+    _, content_hash = save_upload_to_disk(file, path)
+    return enqueue_files(client_id, [
+        {"filename": file.filename, "file_type": ext, "path": path, "content_hash": content_hash}
+    ])[0]
+
+
+def get_job(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.get(IngestionJob, job_id)
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def list_client_jobs(client_id: int, limit: int = 50):
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.client_id == client_id)
+            .order_by(IngestionJob.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [job_to_dict(job) for job in jobs]
+    finally:
+        db.close()
+
+
+def _set_document_status(db, document_id: int, status: str):
+    if document_id is not None:
+        db.execute(update(Document).where(Document.id == document_id).values(processing_status=status))
+
+
+class IngestionWorkerPool:
+    """
+    Background workers that run queued ingestion jobs from the database.
+
+    Jobs are claimed with a conditional UPDATE and held under a lease that is
+    renewed on each progress report, so a job abandoned by a crashed worker
+    (or another process) is picked up again once the lease expires. Failed
+    jobs are retried with exponential backoff up to their max_attempts; the
+    chunks a failed attempt already indexed are removed, so a document is
+    never searchable half-ingested between attempts or after the last one.
+    """
+
+    def __init__(self, workers: int, poll_interval: float = 2.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers after a job was queued"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job_id = self._claim_next()
+            except Exception as e:
+                print(f"Error claiming ingestion job: {e}")
+                job_id = None
+            if job_id is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self.run_job(job_id)
+
+    def _claim_next(self):
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(IngestionJob.status == "queued", IngestionJob.next_attempt_at <= now),
+            and_(IngestionJob.status == "running", IngestionJob.locked_until < now),
+        )
+        db = SessionLocal()
+        try:
+            while True:
+                job = db.query(IngestionJob).filter(claimable).order_by(IngestionJob.id).first()
+                if job is None:
+                    return None
+                # Only one worker wins the conditional update for a given job
+                claimed = db.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == job.id, claimable)
+                    .values(
+                        status="running",
+                        attempts=IngestionJob.attempts + 1,
+                        locked_until=now + timedelta(seconds=settings.ingest_lease_seconds),
+                        error=None,
+                    )
+                )
+                db.commit()
+                if claimed.rowcount == 1:
+                    return job.id
+        finally:
+            db.close()
+
+    def run_job(self, job_id: int):
+        db = SessionLocal()
+        try:
+            job = db.get(IngestionJob, job_id)
+            # The row's own source_id: documents from before per-document IDs keep their filename-based one
+            source_id = db.get(Document, job.document_id).source_id or document_source_id(job.document_id)
+            _set_document_status(db, job.document_id, "processing")
+            db.commit()
+
+            def on_progress(stage, current, total):
+                job.stage = stage
+                job.progress_current = current
+                job.progress_total = total
+                job.locked_until = datetime.utcnow() + timedelta(seconds=settings.ingest_lease_seconds)
+                db.commit()
+
+            try:
+                result = ingest_document_file(job.client_id, source_id, job.file_path, job.filename, job.file_type, on_progress)
+            except Exception as e:
+                db.rollback()
+                self._discard_chunks(job.client_id, source_id)
+                self._record_failure(db, job, e)
+                return
+
+            job.status = "completed"
+            job.chunks = result.get("chunks", 0)
+            job.finished_at = datetime.utcnow()
+            job.locked_until = None
+            _set_document_status(db, job.document_id, "completed")
+            db.commit()
+            self._remove_file(job.file_path)
+        except Exception as e:
+            print(f"Error running ingestion job {job_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _record_failure(self, db, job: IngestionJob, error: Exception):
+        job.error = str(error)
+        job.locked_until = None
+        if job.attempts < job.max_attempts and not isinstance(error, ValueError):
+            backoff = settings.ingest_retry_backoff_seconds * (2 ** (job.attempts - 1))
+            job.status = "queued"
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+            _set_document_status(db, job.document_id, "queued")
+        else:
+            # ValueError means the file itself is bad (unsupported, empty, DocumentParseError); retrying won't help
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            _set_document_status(db, job.document_id, "failed")
+            self._remove_file(job.file_path)
+        db.commit()
+
+    @staticmethod
+    def _discard_chunks(client_id: int, source_id: str):
+        try:
+            delete_stale_chunks(client_id, source_id, 0)
+            update_source_vectors(client_id, [source_id])
+        except Exception as e:
+            print(f"Error removing the chunks of failed source {source_id}: {e}")
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache()
+def get_ingestion_workers() -> IngestionWorkerPool:
+    """Process-wide ingestion worker pool"""
+    return IngestionWorkerPool(settings.ingest_workers)
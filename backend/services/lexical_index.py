@@ -0,0 +1,144 @@
+# backend/services/lexical_index.py
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from config import get_settings
+
+settings = get_settings()
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does", "for", "from", "has",
+    "have", "how", "i", "in", "is", "it", "of", "on", "or", "our", "that", "the", "their", "there",
+    "this", "to", "was", "we", "were", "what", "when", "where", "which", "who", "why", "will", "with",
+    "you", "your",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL UNIQUE,
+    source_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source_id, chunk_index);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, content='chunks', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+"""
+
+# Each thread keeps its own connections (sqlite3 connections aren't shared across
+# threads), the most recently used few per thread; the schema is created once per file
+MAX_CONNECTIONS_PER_THREAD = 16
+_local = threading.local()
+_schema_lock = threading.Lock()
+_initialized = set()
+
+
+def index_path(client_id: int) -> str:
+    return os.path.join(settings.chroma_persist_dir, "lexical", f"client_{client_id}.sqlite3")
+
+
+def index_exists(client_id: int) -> bool:
+    return os.path.exists(index_path(client_id))
+
+
+def _connect(client_id: int) -> sqlite3.Connection:
+    """The calling thread's connection to the client's index"""
+    path = index_path(client_id)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = OrderedDict()
+    conn = connections.get(path)
+    if conn is not None:
+        connections.move_to_end(path)
+        return conn
+
+    with _schema_lock:
+        if path not in _initialized:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, timeout=30)
+            # WAL mode is stored in the file, so it only needs setting once too
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _initialized.add(path)
+    conn = conn or sqlite3.connect(path, timeout=30)
+    connections[path] = conn
+    while len(connections) > MAX_CONNECTIONS_PER_THREAD:
+        connections.popitem(last=False)[1].close()
+    return conn
+
+
+def upsert_chunks(client_id: int, rows: Iterable[Tuple[str, str, int, str]]):
+    """Insert or replace (chunk_id, source_id, chunk_index, text) rows"""
+    conn = _connect(client_id)
+    with conn:
+        conn.executemany(
+            "INSERT INTO chunks (chunk_id, source_id, chunk_index, text) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(chunk_id) DO UPDATE SET source_id = excluded.source_id, "
+            "chunk_index = excluded.chunk_index, text = excluded.text "
+            "WHERE text != excluded.text OR chunk_index != excluded.chunk_index",
+            rows,
+        )
+
+
+def delete_stale_chunks(client_id: int, source_id: str, chunk_count: int):
+    """Remove chunks of a source beyond its current chunk count"""
+    if not index_exists(client_id):
+        return
+    conn = _connect(client_id)
+    with conn:
+        conn.execute("DELETE FROM chunks WHERE source_id = ? AND chunk_index >= ?", (source_id, chunk_count))
+
+
+def build_match_query(query: str) -> str:
+    """Turn a free-text question into an FTS5 OR-query of its meaningful terms"""
+    terms = []
+    for term in _TERM_RE.findall(query.lower()):
+        if term in _STOPWORDS or term in terms:
+            continue
+        terms.append(term)
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def search(client_id: int, query: str, k: int = 20, source_ids: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+    """
+    BM25-ranked (chunk_id, score) pairs, best first; lower bm25 scores are better.
+    With source_ids, only chunks of those sources are considered.
+    """
+    match = build_match_query(query)
+    if not match or not index_exists(client_id) or source_ids == []:
+        return []
+    sql = ("SELECT c.chunk_id, bm25(chunks_fts) AS score FROM chunks_fts "
+           "JOIN chunks c ON c.rowid = chunks_fts.rowid WHERE chunks_fts MATCH ?")
+    params = [match]
+    if source_ids is not None:
+        sql += " AND c.source_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(source_ids))
+    return _connect(client_id).execute(sql + " ORDER BY score LIMIT ?", (*params, k)).fetchall()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(id) = sum of 1 / (k + rank) over the lists containing it"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,278 @@
+# backend/services/metrics.py
+
+import bisect
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import get_settings
+
+settings = get_settings()
+
+trace_logger = logging.getLogger("lexsy.trace")
+if settings.trace_log_enabled and not trace_logger.handlers:
+    # Uvicorn only configures its own loggers; without a handler the trace lines would be dropped
+    _trace_handler = logging.StreamHandler(sys.stdout)
+    _trace_handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(_trace_handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, **labels) -> Optional[dict]:
+        """Count and sum for one label set (None if never observed)"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return {"count": sum(series[:-1]), "sum": series[-1]} if series else None
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += series[len(self.buckets)]
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the process's metrics plus gauge collectors that read live stats on scrape"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, documentation: str, collect: Callable[[], Dict[str, float]]):
+        """collect() returns {label value: gauge value}, exported as name{stat="..."}"""
+        self._collectors.append((name, documentation, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, documentation, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Error collecting {name}: {e}")
+                continue
+            if values is None:
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for stat, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f'{name}{{stat="{_escape(stat)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "lexsy_stage_duration_seconds",
+    "Time spent in each pipeline stage (parse, chunk, embed, chroma_add, chroma_query, lexical_query, llm)",
+    ["stage"],
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "lexsy_request_duration_seconds", "Total HTTP request time", ["method", "route", "status"],
+))
+TOKENS = registry.register(Counter(
+    "lexsy_tokens_total", "Tokens sent to or received from the models, per client", ["client_id", "kind"],
+))
+ANSWER_CACHE = registry.register(Counter(
+    "lexsy_answer_cache_lookups_total", "Answer cache lookups per client by result (exact, semantic, miss)",
+    ["client_id", "result"],
+))
+EMBEDDING_CACHE = registry.register(Counter(
+    "lexsy_embedding_cache_lookups_total", "Embedding cache lookups by result (hit, miss)", ["result"],
+))
+
+
+# --- Per-request traces ---
+
+_current_trace = contextvars.ContextVar("lexsy_trace", default=None)
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    __slots__ = ("trace_id", "started", "spans", "attributes")
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans = []
+        self.attributes = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            **self.attributes,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": self.spans,
+        }
+
+
+def start_trace(trace_id: str = None) -> Tuple[Trace, contextvars.Token]:
+    trace = Trace(trace_id)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token):
+    _current_trace.reset(token)
+
+
+def annotate(**attributes):
+    """Attach attributes (client_id, cache result, ...) to the current request's trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def record_stage(stage: str, seconds: float, **attributes):
+    """Observe a stage duration and add it to the current trace, if any"""
+    if not settings.metrics_enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append({"stage": stage, "ms": round(seconds * 1000, 2), **attributes})
+
+
+@contextmanager
+def timed(stage: str, **attributes):
+    """Time a block as a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, **attributes)
+
+
+class TimedIterator:
+    """Wraps an iterator, accumulating the time spent producing its items"""
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def count_tokens_used(client_id, kind: str, amount: int):
+    if settings.metrics_enabled and amount:
+        TOKENS.inc(amount, client_id=client_id, kind=kind)
+
+
+def count_embedding_cache(hits: int, misses: int):
+    if settings.metrics_enabled:
+        EMBEDDING_CACHE.inc(hits, result="hit")
+        EMBEDDING_CACHE.inc(misses, result="miss")
+
+
+def count_answer_cache(client_id, result: str):
+    if settings.metrics_enabled:
+        ANSWER_CACHE.inc(client_id=client_id, result=result)
+        annotate(answer_cache=result)
+
+
+def log_trace(trace: Trace, **attributes):
+    """Emit the request's trace as one JSON log line (when trace logging is enabled)"""
+    if not settings.trace_log_enabled:
+        return
+    trace.attributes.update(attributes)
+    data = trace.to_dict()
+    if data["total_ms"] >= settings.trace_log_min_ms:
+        trace_logger.info(json.dumps(data))
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,483 @@
+# backend/services/numpy_store.py
+
+import json
+import operator
+import os
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+DTYPES = {"float16": np.float16, "int8": np.int8}
+SCAN_BYTES = 64 * 1024 * 1024  # float32 working set per block of rows scanned
+COMPACT_MIN_DEAD_ROWS = 1000
+
+# One live NumpyCollection per directory, each with a lock shared by everything that writes there
+_path_locks = {}
+_live = weakref.WeakValueDictionary()
+_live_lock = threading.Lock()
+
+
+def path_lock(path: str) -> threading.RLock:
+    """The lock serializing writes (and file swaps) in a collection directory"""
+    with _live_lock:
+        return _path_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+def open_collection(path: str, dtype: str = "float16") -> "NumpyCollection":
+    """
+    The directory's live NumpyCollection, loading it if nothing holds one.
+    Two instances on one directory would append at different row offsets.
+    """
+    key = os.path.abspath(path)
+    with path_lock(key):
+        with _live_lock:
+            collection = _live.get(key)
+        if collection is None:
+            collection = NumpyCollection(path, dtype)
+            with _live_lock:
+                _live[key] = collection
+        return collection
+
+
+_OPERATORS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+
+def matches_where(metadata: dict, where: Optional[dict]) -> bool:
+    """Evaluate a Chroma metadata filter against one chunk's metadata (a missing key never matches)"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            value = metadata[key]
+            conditions = condition.items() if isinstance(condition, dict) else [("$eq", condition)]
+            for op, operand in conditions:
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                try:
+                    if not _OPERATORS[op](value, operand):
+                        return False
+                except TypeError:
+                    return False
+    return True
+
+
+class _Snapshot:
+    """
+    A consistent view of a collection's rows. Rows are only ever appended
+    (compaction builds new arrays and lists), so searches can run on a
+    snapshot without holding the collection lock.
+    """
+
+    __slots__ = ("ids", "documents", "metadatas", "alive", "norms", "vectors", "scales", "dimensions")
+
+    def __init__(self, ids, documents, metadatas, alive, norms, vectors, scales, dimensions):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.alive = alive
+        self.norms = norms
+        self.vectors = vectors
+        self.scales = scales
+        self.dimensions = dimensions
+
+    def decode(self, rows) -> np.ndarray:
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return block
+
+    def blocks(self, rows: np.ndarray = None):
+        """Yield (row indexes, float32 vectors) in blocks of bounded size"""
+        step = max(1024, SCAN_BYTES // (4 * self.dimensions))
+        total = len(self.alive) if rows is None else len(rows)
+        for start in range(0, total, step):
+            end = min(start + step, total)
+            block_rows = np.arange(start, end) if rows is None else rows[start:end]
+            yield block_rows, self.decode(slice(start, end) if rows is None else block_rows)
+
+    def format(self, rows: List[int], include: Iterable[str]) -> dict:
+        include = set(include)
+        embeddings = None
+        if "embeddings" in include:
+            embeddings = self.decode(rows).tolist() if rows else []
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self.documents[row] for row in rows] if "documents" in include else None,
+            "metadatas": [self.metadatas[row] for row in rows] if "metadatas" in include else None,
+            "embeddings": embeddings,
+        }
+
+    def search(self, queries: np.ndarray, k: int, rows: np.ndarray = None):
+        """Exact top k (squared L2 distances, row indexes) per query, over `rows` or all live rows"""
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        if not k:
+            return best_distances, best_rows
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        for block_rows, block in self.blocks(rows):
+            distances = query_norms[:, None] + self.norms[block_rows][None, :] - 2.0 * (queries @ block.T)
+            if rows is None:
+                distances[:, ~self.alive[block_rows]] = np.inf
+            distances = np.concatenate([best_distances, distances], axis=1)
+            candidates = np.concatenate(
+                [best_rows, np.broadcast_to(block_rows, (len(queries), len(block_rows)))], axis=1
+            )
+            if distances.shape[1] > k:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, top, axis=1)
+                candidates = np.take_along_axis(candidates, top, axis=1)
+            best_distances, best_rows = distances, candidates
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        return np.take_along_axis(best_distances, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+
+class NumpyCollection:
+    """
+    One tenant's vectors in an append-only memory-mapped array, with the Chroma
+    collection API the vector service uses (upsert, get, query, delete, count).
+
+    Files in the tenant directory:
+      meta.json      dimensions and storage dtype
+      vectors.bin    rows of float16, or int8 codes scaled per row
+      scales.bin     float32 scale of each int8 row
+      records.jsonl  one line per added row (id, document, metadata) or deleted id
+
+    Upserting an existing ID appends a new row and retires the old one; dead
+    rows are dropped by compact() once they outnumber the live ones. Search is
+    an exact, vectorized scan in blocks, returning squared L2 distances like
+    Chroma's default space.
+    """
+
+    def __init__(self, path: str, dtype: str = "float16"):
+        self.path = path
+        self._lock = path_lock(path)
+        self.dtype = dtype
+        self.reload()
+
+    def reload(self):
+        """Re-read the directory, e.g. after it was replaced by a rebuild"""
+        with self._lock:
+            self.dimensions = None
+            meta_path = os.path.join(self.path, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                self.dtype, self.dimensions = meta["dtype"], meta["dimensions"]
+            if self.dtype not in DTYPES:
+                raise ValueError(f"Unknown vector dtype: {self.dtype}")
+            self._load()
+
+    # --- Storage ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        self._ids, self._documents, self._metadatas, self._rows = [], [], [], {}
+        alive = []
+        records = self._file("records.jsonl")
+        if os.path.exists(records):
+            with open(records, encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # torn write from a crash; its vectors are truncated below
+                    record = json.loads(line)
+                    if "delete" in record:
+                        row = self._rows.pop(record["delete"], None)
+                        if row is not None:
+                            alive[row] = False
+                        continue
+                    previous = self._rows.get(record["id"])
+                    if previous is not None:
+                        alive[previous] = False
+                    self._rows[record["id"]] = len(self._ids)
+                    self._ids.append(record["id"])
+                    self._documents.append(record.get("document"))
+                    self._metadatas.append(record.get("metadata") or {})
+                    alive.append(True)
+        self._alive = np.array(alive, dtype=bool)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._vectors = self._scales = None
+        if not self._ids:
+            return
+        # Vectors are written before their records, so drop rows a crash left without one
+        for name, row_bytes in self._row_bytes().items():
+            if os.path.getsize(self._file(name)) > len(self._ids) * row_bytes:
+                with open(self._file(name), "r+b") as f:
+                    f.truncate(len(self._ids) * row_bytes)
+        self._map()
+        self._norms = np.concatenate([
+            np.einsum("ij,ij->i", block, block) for _, block in self._snapshot(copy=False).blocks()
+        ])
+
+    def _row_bytes(self) -> dict:
+        sizes = {"vectors.bin": self.dimensions * np.dtype(DTYPES[self.dtype]).itemsize}
+        if self.dtype == "int8":
+            sizes["scales.bin"] = 4
+        return sizes
+
+    def _map(self):
+        rows = len(self._ids)
+        self._vectors = np.memmap(self._file("vectors.bin"), dtype=DTYPES[self.dtype], mode="r",
+                                  shape=(rows, self.dimensions))
+        if self.dtype == "int8":
+            self._scales = np.memmap(self._file("scales.bin"), dtype=np.float32, mode="r", shape=(rows,))
+
+    def _snapshot(self, copy: bool = True) -> _Snapshot:
+        return _Snapshot(self._ids, self._documents, self._metadatas, self._alive.copy() if copy else self._alive,
+                         self._norms, self._vectors, self._scales, self.dimensions)
+
+    def _encode(self, embeddings: np.ndarray):
+        if self.dtype == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return embeddings.astype(np.float16), None
+
+    def _sync_with_disk(self):
+        """Reload if the files hold a different number of rows than memory (written by someone else)"""
+        path = self._file("vectors.bin")
+        on_disk = os.path.getsize(path) // self._row_bytes()["vectors.bin"] if os.path.exists(path) else 0
+        if on_disk != len(self._ids):
+            self._load()
+
+    def _append_records(self, records: List[dict]):
+        with open(self._file("records.jsonl"), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+    def _live_rows(self, ids: List[str] = None, where: dict = None) -> List[int]:
+        if ids is not None:
+            rows = [self._rows[chunk_id] for chunk_id in dict.fromkeys(ids) if chunk_id in self._rows]
+        else:
+            rows = np.flatnonzero(self._alive).tolist()
+        if where:
+            rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+        return rows
+
+    # --- Collection API ---
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[dict] = None):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or len(embeddings) != len(ids):
+            raise ValueError("Expected one embedding per ID")
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        with self._lock:
+            if self.dimensions is None:
+                os.makedirs(self.path, exist_ok=True)
+                self.dimensions = embeddings.shape[1]
+                with open(self._file("meta.json"), "w") as f:
+                    json.dump({"dimensions": self.dimensions, "dtype": self.dtype}, f)
+            elif embeddings.shape[1] != self.dimensions:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match {self.dimensions}")
+            else:
+                self._sync_with_disk()
+
+            codes, scales = self._encode(embeddings)
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(codes.tobytes())
+            if scales is not None:
+                with open(self._file("scales.bin"), "ab") as f:
+                    f.write(scales.tobytes())
+
+            start = len(self._ids)
+            alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            records = []
+            for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                previous = self._rows.get(chunk_id)
+                if previous is not None:
+                    alive[previous] = False
+                self._rows[chunk_id] = start + i
+                self._ids.append(chunk_id)
+                self._documents.append(document)
+                self._metadatas.append(metadata or {})
+                records.append({"id": chunk_id, "document": document, "metadata": metadata or {}})
+            self._append_records(records)
+
+            decoded = codes.astype(np.float32)
+            if scales is not None:
+                decoded *= scales[:, None]
+            self._norms = np.concatenate([self._norms, np.einsum("ij,ij->i", decoded, decoded)])
+            self._alive = alive
+            self._map()
+            # Re-upserting existing IDs retires their old rows
+            self._compact_if_sparse()
+
+    def get(self, ids: List[str] = None, where: dict = None, limit: int = None, offset: int = None,
+            include=("metadatas", "documents")):
+        with self._lock:
+            rows = self._live_rows(ids, where)[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return self._snapshot(copy=False).format(rows, include)
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              include=("metadatas", "documents", "distances")):
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with self._lock:
+            snapshot = self._snapshot()
+            # Filtered searches only read the matching rows
+            rows = np.array(self._live_rows(where=where), dtype=np.int64) if where else None
+        live = len(rows) if rows is not None else int(snapshot.alive.sum())
+        best_distances, best_rows = snapshot.search(queries, min(n_results, live), rows)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": None}
+        for distances, candidates in zip(best_distances, best_rows):
+            found = [int(row) for row, distance in zip(candidates, distances) if np.isfinite(distance)]
+            formatted = snapshot.format(found, include)
+            results["ids"].append(formatted["ids"])
+            results["documents"].append(formatted["documents"])
+            results["metadatas"].append(formatted["metadatas"])
+            results["distances"].append([max(float(distance), 0.0) for distance in distances[:len(found)]])
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def delete(self, ids: List[str] = None, where: dict = None):
+        if ids is None and not where:
+            return
+        with self._lock:
+            rows = self._live_rows(ids, where)
+            if not rows:
+                return
+            self._append_records([{"delete": self._ids[row]} for row in rows])
+            # Replace rather than mutate, so running searches keep their snapshot
+            alive = self._alive.copy()
+            alive[rows] = False
+            self._alive = alive
+            for row in rows:
+                del self._rows[self._ids[row]]
+            self._compact_if_sparse()
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _compact_if_sparse(self):
+        """Compact once dead rows outnumber live ones (under the collection lock)"""
+        dead = len(self._ids) - len(self._rows)
+        if dead >= COMPACT_MIN_DEAD_ROWS and dead > len(self._rows):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the files without dead rows"""
+        with self._lock:
+            if not self._ids:
+                return
+            rows = np.flatnonzero(self._alive)
+            for name in self._row_bytes():
+                source = self._vectors if name == "vectors.bin" else self._scales
+                with open(self._file(name + ".tmp"), "wb") as f:
+                    for start in range(0, len(rows), 65536):
+                        f.write(np.asarray(source[rows[start:start + 65536]]).tobytes())
+            with open(self._file("records.jsonl.tmp"), "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({
+                        "id": self._ids[row], "document": self._documents[row], "metadata": self._metadatas[row]
+                    }) + "\n")
+            # Searches still holding the old maps keep reading the replaced files' inodes
+            for name in list(self._row_bytes()) + ["records.jsonl"]:
+                os.replace(self._file(name + ".tmp"), self._file(name))
+            self._load()
+
+    def nbytes(self) -> int:
+        """Size of the mapped vector files"""
+        with self._lock:
+            return sum(array.nbytes for array in (self._vectors, self._scales) if array is not None)
+
+
+class NumpyStoreRegistry:
+    """
+    Open NumpyCollections, one per tenant directory; least recently used dropped beyond max_clients.
+
+    Dropping only releases the registry's reference: a collection still held by
+    a running call stays live and is handed out again, so a directory never has
+    two instances.
+    """
+
+    def __init__(self, base_dir: str, dtype: str = "float16", max_clients: int = 64):
+        self.base_dir = base_dir
+        self.dtype = dtype
+        self.max_clients = max_clients
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(self, client_id: int) -> str:
+        return os.path.join(self.base_dir, f"client_{client_id}")
+
+    def path_lock(self, client_id: int) -> threading.RLock:
+        return path_lock(self.path_for(client_id))
+
+    def get_collection(self, client_id: int, create: bool = True):
+        """Return the tenant's collection, or None if it doesn't exist and create is False"""
+        with self._lock:
+            collection = self._entries.get(client_id)
+            if collection is not None:
+                self._entries.move_to_end(client_id)
+                return collection
+        path = self.path_for(client_id)
+        if not create and not os.path.isdir(path):
+            return None
+        os.makedirs(path, exist_ok=True)
+        collection = open_collection(path, self.dtype)
+        with self._lock:
+            self._entries[client_id] = collection
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_clients:
+                self._entries.popitem(last=False)
+        return collection
+
+    def evict(self, client_id: int):
+        with self._lock:
+            self._entries.pop(client_id, None)
+
+    def replace(self, client_id: int, built_path: str):
+        """Swap a directory built aside (e.g. by a rebuild) in as the tenant's collection"""
+        path = self.path_for(client_id)
+        with path_lock(path):
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(built_path, path)
+            with _live_lock:
+                live = _live.get(os.path.abspath(path))
+            if live is not None:
+                live.reload()
+
+    def warm(self, client_ids: Iterable[int]):
+        for client_id in client_ids:
+            try:
+                self.get_collection(client_id, create=False)
+            except Exception as e:
+                print(f"Error warming vector store for client {client_id}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            collections = list(self._entries.values())
+        return {
+            "open_clients": len(collections),
+            "max_clients": self.max_clients,
+            "rows": sum(collection.count() for collection in collections),
+            "mapped_mb": round(sum(collection.nbytes() for collection in collections) / 1e6, 2),
+        }
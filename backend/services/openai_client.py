@@ -0,0 +1,154 @@
+# backend/services/openai_client.py
+
+import asyncio
+import re
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+
+from config import get_settings
+
+settings = get_settings()
+
+
+# openai and httpx are imported when the first client is built, not at import time
+
+def _limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=settings.openai_max_connections,
+        max_keepalive_connections=settings.openai_max_connections,
+    )
+
+
+def _timeout():
+    import httpx
+    return httpx.Timeout(settings.openai_timeout_seconds, connect=settings.openai_connect_timeout_seconds)
+
+
+_STUB_WORD_RE = re.compile(r"\S+\s*")
+
+
+class StubChatCompletions:
+    """
+    Deterministic stand-in for chat.completions, for offline benchmarks and development.
+
+    The answer is the first sentence of the prompt's context, so it depends
+    only on the prompt. `latency_ms` simulates the time to the first token and
+    `token_latency_ms` the generation time of each token after it.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, token_latency_ms: float = 0.0, is_async: bool = False):
+        self.latency_ms = latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.is_async = is_async
+        self.requests = 0
+
+    @staticmethod
+    def _answer(messages) -> str:
+        prompt = messages[-1]["content"] if messages else ""
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0].strip()
+        first = re.split(r"(?<=[.!?])\s", context, maxsplit=1)[0] if context else ""
+        return f"According to the provided context: {first[:400]}" if first else "I don't know."
+
+    def _response(self, messages, model: str):
+        from services.chunking_service import count_tokens
+        answer = self._answer(messages)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(count_tokens(message["content"]) for message in messages),
+            completion_tokens=count_tokens(answer),
+        )
+        message = SimpleNamespace(role="assistant", content=answer)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message)], usage=usage)
+
+    @staticmethod
+    def _chunk(text: str):
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=text))])
+
+    def create(self, model: str, messages, stream: bool = False, **kwargs):
+        self.requests += 1
+        if self.is_async:
+            return self._create_async(model, messages, stream)
+        response = self._response(messages, model)
+        words = _STUB_WORD_RE.findall(response.choices[0].message.content)
+        time.sleep((self.latency_ms + self.token_latency_ms * len(words)) / 1000)
+        if stream:
+            return iter([self._chunk(word) for word in words])
+        return response
+
+    async def _create_async(self, model: str, messages, stream: bool):
+        await asyncio.sleep(self.latency_ms / 1000)
+        response = self._response(messages, model)
+        words = _STUB_WORD_RE.findall(response.choices[0].message.content)
+        if not stream:
+            await asyncio.sleep(self.token_latency_ms * len(words) / 1000)
+            return response
+
+        async def chunks():
+            for word in words:
+                yield self._chunk(word)
+                await asyncio.sleep(self.token_latency_ms / 1000)
+        return chunks()
+
+
+class StubEmbeddings:
+    """
+    Stand-in for embeddings, so LLM_BACKEND=stub also works with EMBEDDING_BACKEND=openai.
+    Vectors come from the stub embedding backend, in the API's response shape.
+    """
+
+    def __init__(self, is_async: bool = False):
+        from services.embedding_service import StubEmbeddingBackend
+        self.backend = StubEmbeddingBackend(
+            dimensions=settings.embedding_stub_dimensions,
+            request_latency_ms=settings.embedding_stub_request_latency_ms,
+            item_latency_ms=settings.embedding_stub_item_latency_ms,
+        )
+        self.is_async = is_async
+
+    def _response(self, model: str, input):
+        from services.chunking_service import count_tokens
+        texts = [input] if isinstance(input, str) else list(input)
+        data = [SimpleNamespace(index=i, embedding=vector) for i, vector in enumerate(self.backend.embed(texts))]
+        tokens = sum(count_tokens(text) for text in texts)
+        return SimpleNamespace(model=model, data=data, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+    def create(self, model: str, input, **kwargs):
+        if self.is_async:
+            return asyncio.to_thread(self._response, model, input)
+        return self._response(model, input)
+
+
+def _stub_client(is_async: bool):
+    completions = StubChatCompletions(settings.llm_stub_latency_ms, settings.llm_stub_token_latency_ms, is_async)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions), embeddings=StubEmbeddings(is_async))
+
+
+@lru_cache()
+def get_openai_client():
+    """Shared synchronous client with a pooled HTTP connection pool (or the stub, with LLM_BACKEND=stub)"""
+    if settings.llm_backend == "stub":
+        return _stub_client(is_async=False)
+    import httpx
+    from openai import OpenAI
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        max_retries=settings.openai_max_retries,
+        timeout=_timeout(),
+        http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+    )
+
+
+@lru_cache()
+def get_async_openai_client():
+    """Shared async client for request handlers running on the event loop"""
+    if settings.llm_backend == "stub":
+        return _stub_client(is_async=True)
+    import httpx
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        max_retries=settings.openai_max_retries,
+        timeout=_timeout(),
+        http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+    )
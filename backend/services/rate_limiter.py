@@ -0,0 +1,118 @@
+# backend/services/rate_limiter.py
+
+import asyncio
+import random
+import time
+from functools import lru_cache
+
+from config import get_settings
+
+settings = get_settings()
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute` per minute, holding at most a minute's worth"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the bucket wait for a full one)"""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return needed / self.rate if needed > 0 else 0.0
+
+    def take(self, amount: float):
+        # May go negative: a large request borrows from the next minute
+        self.level -= amount
+
+
+def _retry_after(error) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class CompletionScheduler:
+    """
+    Runs chat completions within the account's rate limits.
+
+    Caps concurrent calls, spaces them out to stay under requests-per-minute
+    and tokens-per-minute budgets (0 disables a budget), and on a 429 pauses
+    every queued call for the server's Retry-After (or an exponential backoff)
+    before retrying. Waiters are admitted in arrival order.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 max_retries: int = 3):
+        self.max_retries = max_retries
+        self.rate_limited = 0
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._admit_lock = asyncio.Lock()
+
+    async def _admit(self, tokens: int):
+        async with self._admit_lock:
+            while True:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if self._requests is not None:
+                    delay = max(delay, self._requests.delay(1, now))
+                if self._tokens is not None:
+                    delay = max(delay, self._tokens.delay(tokens, now))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+
+    def charge(self, tokens: int):
+        """Count tokens only known after the call (the completion) against the budget"""
+        if self._tokens is not None and tokens:
+            self._tokens.take(tokens)
+
+    async def run(self, call, tokens: int = 0):
+        """Await call() once admitted; `tokens` is the prompt size charged up front"""
+        from openai import RateLimitError
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._admit(tokens)
+                try:
+                    return await call()
+                except RateLimitError as e:
+                    self.rate_limited += 1
+                    if attempt == self.max_retries:
+                        raise
+                    pause = _retry_after(e) or min(60.0, 2 ** attempt + random.random())
+                    self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def stats(self) -> dict:
+        return {
+            "rate_limited": self.rate_limited,
+            "requests_available": self._requests.level if self._requests is not None else None,
+            "tokens_available": self._tokens.level if self._tokens is not None else None,
+        }
+
+
+@lru_cache()
+def get_completion_scheduler() -> CompletionScheduler:
+    """Process-wide scheduler, since rate limits apply to the whole API key"""
+    return CompletionScheduler(
+        max_concurrency=settings.llm_max_concurrency,
+        requests_per_minute=settings.llm_requests_per_minute,
+        tokens_per_minute=settings.llm_tokens_per_minute,
+        max_retries=settings.llm_rate_limit_retries,
+    )
@@ -0,0 +1,153 @@
+# backend/services/source_catalog.py
+
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from db.database import SessionLocal
+from models.document import Document
+from models.email import Email
+
+SOURCE_TYPES = ("document", "email")
+
+
+def parse_date(value) -> Optional[datetime]:
+    """Parse an ISO date/datetime string (or pass a datetime through); None if empty"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD or an ISO datetime)")
+
+
+def to_timestamp(value: datetime) -> int:
+    """Seconds since the epoch; naive datetimes are taken as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def build_filters(source_type: str = None, sender: str = None, filename: str = None,
+                  date_from: str = None, date_to: str = None) -> dict:
+    """
+    Validate chat filter parameters into a filters dict (empty if none are set).
+    A date-only date_to includes the whole day.
+    """
+    filters = {}
+    if source_type:
+        if source_type not in SOURCE_TYPES:
+            raise ValueError(f"source_type must be one of {', '.join(SOURCE_TYPES)}")
+        filters["source_type"] = source_type
+    if sender:
+        filters["sender"] = sender.strip()
+    if filename:
+        filters["filename"] = filename.strip()
+    start = parse_date(date_from)
+    end = parse_date(date_to)
+    if end is not None and len(str(date_to).strip()) == 10:
+        end = end + timedelta(days=1) - timedelta(seconds=1)
+    if start is not None:
+        filters["date_from"] = start
+    if end is not None:
+        filters["date_to"] = end
+    if start is not None and end is not None and start > end:
+        raise ValueError("date_from must not be after date_to")
+    # Sender and dates only exist on emails, filename only on documents
+    implied = "email" if ("sender" in filters or start or end) else None
+    if "filename" in filters:
+        if implied == "email":
+            raise ValueError("filename can't be combined with email filters")
+        implied = "document"
+    if implied:
+        if filters.get("source_type", implied) != implied:
+            raise ValueError(f"The given filters only apply to {implied}s")
+        filters["source_type"] = implied
+    return filters
+
+
+def to_chroma_where(filters: dict) -> Optional[dict]:
+    """Chroma `where` clause for filters; dates compare against the numeric date_ts metadata"""
+    conditions = []
+    for field in ("source_type", "sender", "filename"):
+        if field in filters:
+            conditions.append({field: filters[field]})
+    if "date_from" in filters:
+        conditions.append({"date_ts": {"$gte": to_timestamp(filters["date_from"])}})
+    if "date_to" in filters:
+        conditions.append({"date_ts": {"$lte": to_timestamp(filters["date_to"])}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def resolve_source_ids(client_id: int, filters: dict) -> Optional[List[str]]:
+    """
+    Source IDs matching the filters, looked up in the indexed emails/documents
+    tables. None when there is nothing to narrow (no filters, or only a
+    source_type) or no row matches: sources indexed before the tables were
+    mirrored are then still found by the vector store's own metadata filter.
+    """
+    if not set(filters) - {"source_type"}:
+        return None
+    db = SessionLocal()
+    try:
+        if filters["source_type"] == "email":
+            query = db.query(Email.source_id).filter(Email.client_id == client_id, Email.source_id.isnot(None))
+            if "sender" in filters:
+                query = query.filter(Email.sender == filters["sender"])
+            if "date_from" in filters:
+                query = query.filter(Email.date_sent >= _naive_utc(filters["date_from"]))
+            if "date_to" in filters:
+                query = query.filter(Email.date_sent <= _naive_utc(filters["date_to"]))
+        else:
+            query = db.query(Document.source_id).filter(
+                Document.client_id == client_id,
+                Document.source_id.isnot(None),
+                Document.filename == filters["filename"],
+            )
+        return sorted({row[0] for row in query.distinct().all()}) or None
+    finally:
+        db.close()
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def record_emails(client_id: int, emails: List[dict]):
+    """
+    Mirror ingested emails (with their source_id) into the emails table, once
+    per source. Gmail messages also carry message_id, thread_id and history_id.
+    """
+    if not emails:
+        return
+    db = SessionLocal()
+    try:
+        source_ids = [email["source_id"] for email in emails]
+        known = {
+            row[0] for row in db.query(Email.source_id)
+            .filter(Email.client_id == client_id, Email.source_id.in_(source_ids)).all()
+        }
+        for email in emails:
+            if email["source_id"] in known:
+                continue
+            known.add(email["source_id"])
+            db.add(Email(
+                client_id=client_id,
+                source_id=email["source_id"],
+                subject=email.get("subject"),
+                sender=email.get("sender"),
+                recipient=email.get("recipient"),
+                body=email.get("body"),
+                date_sent=_naive_utc(parse_date(email["date_sent"])) if email.get("date_sent") else None,
+                gmail_message_id=email.get("message_id"),
+                gmail_thread_id=email.get("thread_id"),
+                history_id=email.get("history_id"),
+            ))
+        db.commit()
+    finally:
+        db.close()
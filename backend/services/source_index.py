@@ -0,0 +1,196 @@
+# backend/services/source_index.py
+"""
+Document tier for two-stage retrieval: one vector per document or email thread.
+
+Each row is the normalized centroid of the chunk embeddings of a document, or
+of every message in a Gmail thread, with the source IDs it covers and their
+chunk counts. Like the lexical index it is derived from the client's vector
+store, and it is kept in a NumpyCollection under <persist dir>/sources
+whatever the chunk backend: there are few rows per client, so an exact scan
+is cheap.
+
+Chunk IDs follow from source IDs and counts (vector_service.make_chunk_id),
+so the second stage fetches the candidate chunks by ID and ranks them
+exactly instead of running a metadata-filtered vector query.
+"""
+
+import os
+import shutil
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from config import get_settings
+from services.numpy_store import NumpyCollection, NumpyStoreRegistry
+from services.vector_service import make_chunk_id, source_group
+
+settings = get_settings()
+
+# Group keys of email threads (see vector_service.source_group); other groups are source IDs
+THREAD_PREFIX = "thread_"
+
+
+@lru_cache()
+def get_source_store() -> NumpyStoreRegistry:
+    return NumpyStoreRegistry(
+        os.path.join(settings.chroma_persist_dir, "sources"), dtype="float16",
+        max_clients=settings.chroma_max_open_clients,
+    )
+
+
+def index_exists(client_id: int) -> bool:
+    return os.path.isdir(get_source_store().path_for(client_id))
+
+
+def _groups_where(keys: List[str]) -> dict:
+    threads = [key[len(THREAD_PREFIX):] for key in keys if key.startswith(THREAD_PREFIX)]
+    sources = [key for key in keys if not key.startswith(THREAD_PREFIX)]
+    conditions = []
+    if sources:
+        conditions.append({"source_id": {"$in": sources}})
+    if threads:
+        conditions.append({"thread_id": {"$in": threads}})
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+class _Centroids:
+    """Running sums of chunk embeddings per group"""
+
+    def __init__(self):
+        self.sums = {}
+        self.counts = {}
+        self.sources = {}
+        self.metadatas = {}
+
+    def add(self, embeddings, metadatas):
+        for embedding, metadata in zip(embeddings, metadatas):
+            key = source_group(metadata)
+            vector = np.asarray(embedding, dtype=np.float32)
+            if key in self.sums:
+                self.sums[key] += vector
+            else:
+                self.sums[key] = vector.copy()
+                self.metadatas[key] = {
+                    field: metadata[field] for field in ("source_type", "filename", "subject", "thread_id")
+                    if field in metadata
+                }
+            self.counts[key] = self.counts.get(key, 0) + 1
+            sources = self.sources.setdefault(key, {})
+            sources[metadata["source_id"]] = max(sources.get(metadata["source_id"], 0), metadata.get("chunk_index", 0) + 1)
+
+    def upsert_into(self, collection):
+        if not self.sums:
+            return
+        keys = list(self.sums)
+        vectors = np.stack([self.sums[key] / self.counts[key] for key in keys])
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        collection.upsert(
+            ids=keys,
+            embeddings=vectors,
+            documents=[""] * len(keys),
+            metadatas=[
+                {
+                    **self.metadatas[key],
+                    "sources": sorted(self.sources[key]),
+                    "source_chunks": [self.sources[key][source_id] for source_id in sorted(self.sources[key])],
+                    "chunks": self.counts[key],
+                }
+                for key in keys
+            ],
+        )
+
+
+def rebuild(client_id: int, collection, page_size: int = 1000):
+    """Rebuild a client's source vectors from every chunk in its vector store"""
+    # Updates and rebuilds of a client's index hold its directory lock, so a
+    # rebuild never swaps the files out from under a running update
+    with get_source_store().path_lock(client_id):
+        _rebuild(client_id, collection, page_size)
+
+
+def _rebuild(client_id: int, collection, page_size: int = 1000):
+    centroids = _Centroids()
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        centroids.add(page["embeddings"], page["metadatas"])
+        offset += len(page["ids"])
+    # Built aside and swapped in, so an interrupted rebuild never looks complete
+    store = get_source_store()
+    built = store.path_for(client_id) + ".tmp"
+    shutil.rmtree(built, ignore_errors=True)
+    centroids.upsert_into(NumpyCollection(built, store.dtype))
+    os.makedirs(built, exist_ok=True)
+    store.replace(client_id, built)
+
+
+def update_groups(client_id: int, collection, keys: Iterable[str]):
+    """Recompute the vectors of the given groups from their chunks (the first update builds the whole index)"""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    with get_source_store().path_lock(client_id):
+        if not index_exists(client_id):
+            _rebuild(client_id, collection)
+            return
+        chunks = collection.get(where=_groups_where(keys), include=["embeddings", "metadatas"])
+        centroids = _Centroids()
+        centroids.add(chunks["embeddings"], chunks["metadatas"])
+        target = get_source_store().get_collection(client_id)
+        centroids.upsert_into(target)
+        emptied = [key for key in keys if key not in centroids.sums]
+        if emptied:
+            target.delete(ids=emptied)
+
+
+def top_sources(client_id: int, query_embeddings, n: int, where: dict = None) -> List[Dict[str, int]]:
+    """
+    {source ID: chunk count} of the n closest documents/threads for each query
+    (empty per query if there is no index)
+    """
+    collection = get_source_store().get_collection(client_id, create=False)
+    if collection is None:
+        return [{} for _ in query_embeddings]
+    results = collection.query(query_embeddings=query_embeddings, n_results=n, where=where, include=["metadatas"])
+    return [
+        {
+            source_id: chunks
+            for metadata in metadatas
+            for source_id, chunks in zip(metadata["sources"], metadata["source_chunks"])
+        }
+        for metadatas in results["metadatas"]
+    ]
+
+
+def search_chunks(collection, query_embeddings, sources: List[Dict[str, int]], n: int, where: dict = None) -> dict:
+    """
+    Chroma-shaped query results: for each query, the n chunks of its sources
+    nearest by squared L2 distance (the chunk collections' metric). The chunks
+    of all queries are fetched by ID in one call.
+    """
+    chunk_ids = [
+        [make_chunk_id(source_id, index) for source_id, chunks in query_sources.items() for index in range(chunks)]
+        for query_sources in sources
+    ]
+    unique = list(dict.fromkeys(chunk_id for ids in chunk_ids for chunk_id in ids))
+    fetched = collection.get(ids=unique, where=where, include=["embeddings", "documents", "metadatas"])
+    position = {chunk_id: row for row, chunk_id in enumerate(fetched["ids"])}
+    vectors = np.asarray(fetched["embeddings"], dtype=np.float32) if fetched["ids"] else None
+
+    results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    for query, ids in zip(np.asarray(query_embeddings, dtype=np.float32), chunk_ids):
+        rows = np.array([position[chunk_id] for chunk_id in ids if chunk_id in position], dtype=np.int64)
+        if len(rows):
+            distances = ((vectors[rows] - query) ** 2).sum(axis=1)
+            order = np.argsort(distances, kind="stable")[:n]
+            rows, distances = rows[order], distances[order]
+        else:
+            distances = np.empty(0, dtype=np.float32)
+        results["ids"].append([fetched["ids"][row] for row in rows])
+        results["documents"].append([fetched["documents"][row] for row in rows])
+        results["metadatas"].append([fetched["metadatas"][row] for row in rows])
+        results["distances"].append([float(distance) for distance in distances])
+    return results
@@ -1,62 +1,346 @@
 # backend/services/vector_service.py
 
-import os
-import openai
-from chromadb import PersistentClient
+import hashlib
+import threading
+from collections import OrderedDict
 from config import get_settings
+from services.answer_cache import invalidate_client_answers
+from services.embedding_cache import get_embedding_cache, normalize_text
+from services.embedding_service import get_embedding_batcher
+from services.source_catalog import parse_date, to_timestamp
+from services.vector_store import get_vector_store
+from services import lexical_index
+from services.metrics import count_embedding_cache, timed
 
 settings = get_settings()
-CHROMA_DIR = settings.chroma_persist_dir
-OPENAI_API_KEY = settings.openai_api_key
 
-# Set OpenAI API key
-openai.api_key = OPENAI_API_KEY
+# Recent query embeddings, most recently used last
+_query_embeddings = OrderedDict()
+_query_embedding_lock = threading.Lock()
 
 def get_embedding(text: str):
     """Get OpenAI embedding for text"""
-    response = openai.embeddings.create(
-        model="text-embedding-ada-002",
-        input=text
-    )
-    return response.data[0].embedding
-
-def get_client_vectordb(client_id: int):
-    """Returns the ChromaDB client for a specific client."""
-    vector_path = os.path.join(CHROMA_DIR, f"client_{client_id}")
-    os.makedirs(vector_path, exist_ok=True)
-    
-    client = PersistentClient(path=vector_path)
-    
-    # Get or create collection
-    try:
-        collection = client.get_collection(name="default")
-    except:
-        collection = client.create_collection(name="default")
-    
-    return collection
+    return get_embeddings([text])[0]
+
+def get_embeddings(texts: list):
+    """Get embeddings for many texts, serving repeats from the embedding cache"""
+    batcher = get_embedding_batcher()
+    cache = get_embedding_cache()
+    if cache is None:
+        with timed("embed", texts=len(texts)):
+            return batcher.embed(texts)
+
+    model = batcher.backend.model
+    vectors = cache.get_many(model, texts)
+
+    # Embed each distinct missing text once, even if it repeats within this call
+    missing = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(cache.make_key(model, texts[i]), []).append(i)
+    misses = sum(len(indexes) for indexes in missing.values())
+    count_embedding_cache(len(texts) - misses, misses)
+    if missing:
+        positions = list(missing.values())
+        new_texts = [texts[indexes[0]] for indexes in positions]
+        with timed("embed", texts=len(new_texts)):
+            new_vectors = batcher.embed(new_texts)
+        cache.put_many(model, new_texts, new_vectors)
+        for indexes, vector in zip(positions, new_vectors):
+            for i in indexes:
+                vectors[i] = vector
+
+    return vectors
+
+def get_client_vectordb(client_id: int, create: bool = True):
+    """Returns the vector store collection for a specific client (None if missing and create is False)."""
+    return get_vector_store().get_collection(client_id, create=create)
+
+def make_source_id(metadata: dict, text: str) -> str:
+    """Stable ID of the document or email a piece of text belongs to"""
+    if metadata.get('source_id'):
+        return metadata['source_id']
+    source_type = metadata.get('source_type', 'document')
+    if source_type == 'email':
+        key = "|".join(str(metadata.get(f, '')) for f in ('sender', 'recipient', 'date_sent', 'subject')) + "|" + text
+    elif metadata.get('document_id') is not None:
+        # Documents are told apart by their row, not their name: two uploads of "contract.pdf" are two sources
+        key = f"document_id:{metadata['document_id']}"
+    elif metadata.get('filename'):
+        key = metadata['filename']
+    else:
+        key = text
+    return f"{source_type}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+def make_chunk_id(source_id: str, chunk_index: int) -> str:
+    """Deterministic vector ID, so re-ingesting a source overwrites its chunks"""
+    return f"{source_id}:{chunk_index}"
 
 def add_text_to_vectorstore(client_id: int, text: str, metadata: dict):
     """Add text to vector store"""
+    add_texts_to_vectorstore(client_id, [text], [metadata])
+
+def add_texts_to_vectorstore(client_id: int, texts: list, metadatas: list, replace_sources: bool = True):
+    """
+    Upsert several texts (e.g. the chunks of one document) into the vector store.
+
+    IDs are derived from each text's source and chunk index. With replace_sources,
+    chunks left over from a previous, longer version of a source are removed.
+    """
+    if not texts:
+        return
     collection = get_client_vectordb(client_id)
+
+    ids = []
+    chunk_counts = {}
+    groups = set()
+    metadatas = [dict(metadata) for metadata in metadatas]
+    for text, metadata in zip(texts, metadatas):
+        source_id = make_source_id(metadata, text)
+        chunk_index = metadata.setdefault('chunk_index', chunk_counts.get(source_id, 0))
+        metadata['source_id'] = source_id
+        if metadata.get('date_sent') and 'date_ts' not in metadata:
+            # Chroma range filters only work on numbers, so keep a numeric copy of the date
+            try:
+                metadata['date_ts'] = to_timestamp(parse_date(metadata['date_sent']))
+            except ValueError:
+                pass
+        chunk_counts[source_id] = max(chunk_counts.get(source_id, 0), chunk_index + 1)
+        groups.add(source_group(metadata))
+        ids.append(make_chunk_id(source_id, chunk_index))
     
-    # Generate embedding
-    embedding = get_embedding(text)
+    # Generate embeddings
+    embeddings = get_embeddings(texts)
     
-    # Add to collection
-    collection.add(
-        embeddings=[embedding],
-        documents=[text],
-        metadatas=[metadata],
-        ids=[f"doc_{len(collection.get()['ids']) + 1}"]
-    )
-
-def similarity_search(client_id: int, query: str, k: int = 5):
-    """Search for similar documents"""
+    # Upsert into collection
+    with timed("chroma_add", chunks=len(ids)):
+        collection.upsert(
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas,
+            ids=ids
+        )
+    with timed("lexical_add", chunks=len(ids)):
+        lexical_index.upsert_chunks(client_id, [
+            (chunk_id, metadata['source_id'], metadata['chunk_index'], text)
+            for chunk_id, metadata, text in zip(ids, metadatas, texts)
+        ])
+
+    if replace_sources:
+        for source_id, chunk_count in chunk_counts.items():
+            delete_stale_chunks(client_id, source_id, chunk_count)
+        update_source_vectors(client_id, groups)
+    invalidate_client_answers(client_id)
+
+    return ids
+
+def delete_stale_chunks(client_id: int, source_id: str, chunk_count: int):
+    """Remove chunks of a source beyond its current chunk count"""
     collection = get_client_vectordb(client_id)
-    
-    results = collection.query(
-        query_texts=[query],
-        n_results=k
-    )
-    
-    return results
+    collection.delete(where={"$and": [{"source_id": source_id}, {"chunk_index": {"$gte": chunk_count}}]})
+    lexical_index.delete_stale_chunks(client_id, source_id, chunk_count)
+    invalidate_client_answers(client_id)
+
+def source_group(metadata: dict) -> str:
+    """Key of the document or email thread a chunk's source vector belongs to"""
+    if metadata.get('thread_id'):
+        return f"thread_{metadata['thread_id']}"
+    return metadata['source_id']
+
+def update_source_vectors(client_id: int, groups):
+    """
+    Refresh the document-tier vectors (see source_index) of sources whose
+    chunks are final, e.g. once a document has been fully indexed.
+    """
+    if not settings.source_index_enabled or not groups:
+        return
+    from services import source_index
+    with timed("source_index", groups=len(groups)):
+        source_index.update_groups(client_id, get_client_vectordb(client_id), groups)
+
+def get_query_embedding(query: str):
+    """Embed a search query with the same backend as ingestion, reusing recent queries"""
+    return get_query_embeddings([query])[0]
+
+def get_query_embeddings(queries: list):
+    """Embed several search queries, reusing recent and cached ones; the rest go in one backend call"""
+    backend = get_embedding_batcher().backend
+    keys = [(backend.model, normalize_text(query).casefold()) for query in queries]
+    embeddings = [None] * len(queries)
+    with _query_embedding_lock:
+        for i, key in enumerate(keys):
+            embedding = _query_embeddings.get(key)
+            if embedding is not None:
+                _query_embeddings.move_to_end(key)
+                embeddings[i] = embedding
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if not missing:
+        return embeddings
+
+    cache = get_embedding_cache()
+    if cache is not None:
+        for i, embedding in zip(missing, cache.get_many(backend.model, [queries[i] for i in missing])):
+            embeddings[i] = embedding
+        missing = [i for i in missing if embeddings[i] is None]
+    if missing:
+        unique = {}
+        for i in missing:
+            unique.setdefault(keys[i], i)
+        texts = [queries[i] for i in unique.values()]
+        # Call the backend directly: a waiting user shouldn't sit in the ingestion batch window
+        with timed("embed_query", queries=len(texts)):
+            vectors = dict(zip(unique, backend.embed(texts)))
+        if cache is not None:
+            cache.put_many(backend.model, texts, list(vectors.values()))
+        for i in missing:
+            embeddings[i] = vectors[keys[i]]
+
+    with _query_embedding_lock:
+        for key, embedding in zip(keys, embeddings):
+            _query_embeddings[key] = embedding
+            _query_embeddings.move_to_end(key)
+        while len(_query_embeddings) > settings.query_embedding_cache_size:
+            _query_embeddings.popitem(last=False)
+    return embeddings
+
+def rebuild_lexical_index(client_id: int, collection=None, page_size: int = 1000):
+    """Fill a client's lexical index from its vector store (for corpora indexed before it existed)"""
+    collection = collection or get_client_vectordb(client_id)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        lexical_index.upsert_chunks(client_id, [
+            (chunk_id, metadata.get('source_id', chunk_id), metadata.get('chunk_index', 0), text)
+            for chunk_id, metadata, text in zip(page['ids'], page['metadatas'], page['documents'])
+        ])
+        offset += len(page['ids'])
+
+def _empty_results():
+    return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'scores': [[]]}
+
+def _split_results(results: dict, count: int):
+    """One single-query Chroma result per query of a multi-query result"""
+    return [
+        {key: [value[i]] if isinstance(value, list) else value for key, value in results.items()}
+        for i in range(count)
+    ]
+
+def _fused_results(collection, rankings: list, k: int, where: dict = None):
+    """
+    Chroma-shaped results for the top k fused (id, score) pairs of each ranking
+    that exist and match `where`. Chunks are fetched in one call, once each.
+    """
+    ids = list(dict.fromkeys(chunk_id for ranked in rankings for chunk_id, _ in ranked))
+    fetched = collection.get(ids=ids, where=where, include=["documents", "metadatas"]) if ids else {'ids': []}
+    by_id = {chunk_id: (fetched['documents'][i], fetched['metadatas'][i]) for i, chunk_id in enumerate(fetched['ids'])}
+    fused = []
+    for ranked in rankings:
+        ranked = [(chunk_id, score) for chunk_id, score in ranked if chunk_id in by_id][:k]
+        fused.append({
+            'ids': [[chunk_id for chunk_id, _ in ranked]],
+            'documents': [[by_id[chunk_id][0] for chunk_id, _ in ranked]],
+            'metadatas': [[by_id[chunk_id][1] for chunk_id, _ in ranked]],
+            'scores': [[score for _, score in ranked]],
+        })
+    return fused
+
+RETRIEVAL_TIERS = ("chunks", "two_stage")
+
+def build_retrieval_options(tier: str = None, source_candidates: int = None, candidates: int = None) -> dict:
+    """Validate per-question retrieval parameters into keyword arguments for similarity_search"""
+    options = {}
+    if tier:
+        if tier not in RETRIEVAL_TIERS:
+            raise ValueError(f"tier must be one of {', '.join(RETRIEVAL_TIERS)}")
+        options["tier"] = tier
+    for name, value in (("source_candidates", source_candidates), ("candidates", candidates)):
+        if value is not None:
+            if not 1 <= value <= 1000:
+                raise ValueError(f"{name} must be between 1 and 1000")
+            options[name] = value
+    return options
+
+def similarity_search(client_id: int, query: str, k: int = None, mode: str = None,
+                      where: dict = None, source_ids: list = None, tier: str = None,
+                      source_candidates: int = None, candidates: int = None):
+    """
+    Search for the k most relevant chunks (None if the client has no vector store).
+
+    In hybrid mode the vector and BM25 rankings are combined with reciprocal rank
+    fusion, so exact clause numbers, names and defined terms are found even when
+    their embeddings are not the nearest. `where` is a Chroma metadata filter;
+    `source_ids`, if given, limits both retrievers to those sources.
+
+    With tier="two_stage", the source_candidates documents or email threads
+    whose centroid vectors are closest to the query are picked first, and only
+    their chunks are searched. `candidates` is the number of chunks each
+    retriever contributes before fusion.
+    """
+    results = similarity_search_many(client_id, [query], k, mode, where, source_ids,
+                                     tier, source_candidates, candidates)
+    return results[0] if results is not None else None
+
+def similarity_search_many(client_id: int, queries: list, k: int = None, mode: str = None,
+                           where: dict = None, source_ids: list = None, tier: str = None,
+                           source_candidates: int = None, candidates: int = None):
+    """
+    similarity_search for several queries at once, returning one result per query
+    (None if the client has no vector store). The queries share one embedding
+    call, one multi-query vector search and one fetch of the fused chunks.
+    """
+    k = k or settings.retrieval_top_k
+    mode = mode or settings.retrieval_mode
+    tier = tier or settings.retrieval_tier
+    collection = get_client_vectordb(client_id, create=False)
+    if collection is None:
+        return None
+    if not queries:
+        return []
+    query_embeddings = None
+    query_sources = None
+    # Filters that resolved to sources already narrow the search; document rows only carry source_type
+    if (tier == "two_stage" and settings.source_index_enabled and source_ids is None
+            and (where is None or set(where) == {"source_type"})):
+        from services import source_index
+        if not source_index.index_exists(client_id) and collection.count():
+            source_index.rebuild(client_id, collection)
+        query_embeddings = get_query_embeddings(queries)
+        source_candidates = source_candidates or settings.retrieval_source_candidates
+        with timed("source_query", n_results=source_candidates, queries=len(queries)):
+            query_sources = source_index.top_sources(client_id, query_embeddings, source_candidates, where)
+        if not any(query_sources):
+            query_sources = None
+    if source_ids is not None:
+        if not source_ids:
+            return [_empty_results() for _ in queries]
+        source_filter = {"source_id": {"$in": list(source_ids)}}
+        where = {"$and": [where, source_filter]} if where else source_filter
+
+    candidates = max(k, candidates or settings.retrieval_candidates) if mode == "hybrid" else k
+    if query_embeddings is None:
+        query_embeddings = get_query_embeddings(queries)
+    if query_sources is not None:
+        with timed("source_chunks_query", n_results=candidates, queries=len(queries)):
+            results = source_index.search_chunks(collection, query_embeddings, query_sources, candidates, where)
+    else:
+        with timed("chroma_query", n_results=candidates, queries=len(queries)):
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=candidates,
+                where=where
+            )
+    if mode != "hybrid":
+        return _split_results(results, len(queries))
+
+    if not lexical_index.index_exists(client_id) and collection.count():
+        rebuild_lexical_index(client_id, collection)
+    rankings = []
+    with timed("lexical_query", queries=len(queries)):
+        for i, query in enumerate(queries):
+            sources = list(query_sources[i]) if query_sources is not None else source_ids
+            lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(client_id, query, candidates, sources)]
+            rankings.append(lexical_index.reciprocal_rank_fusion([results['ids'][i], lexical_ids], k=settings.rrf_k))
+    with timed("chroma_get", chunks=sum(len(ranked) for ranked in rankings)):
+        return _fused_results(collection, rankings, k, where)
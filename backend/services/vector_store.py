@@ -0,0 +1,49 @@
+# backend/services/vector_store.py
+"""
+Vector store backends.
+
+A backend is a registry with get_collection(client_id, create), evict,
+warm and stats. get_collection hands out one collection per client, which
+implements the part of the Chroma collection API the vector service uses:
+
+    upsert(ids, embeddings, documents, metadatas)
+    get(ids=None, where=None, limit=None, offset=None, include=[...])
+    query(query_embeddings, n_results, where=None, include=[...])
+    delete(ids=None, where=None)
+    count()
+
+with Chroma's result shapes and metadata filter syntax ($and, $in, $gte, ...).
+
+Backends (VECTOR_STORE_BACKEND):
+    chroma  Chroma, per-client directories or the shared layout (CHROMA_LAYOUT)
+    numpy   memory-mapped float16/int8 arrays with exact search (services.numpy_store)
+"""
+
+import os
+from functools import lru_cache
+
+from config import get_settings
+
+settings = get_settings()
+
+
+def create_vector_store(name: str = None):
+    """Build the vector store registry selected in settings (chroma | numpy)"""
+    name = name or settings.vector_store_backend
+    if name == "chroma":
+        from services.chroma_registry import get_chroma_registry
+        return get_chroma_registry()
+    if name == "numpy":
+        from services.numpy_store import NumpyStoreRegistry
+        return NumpyStoreRegistry(
+            os.path.join(settings.chroma_persist_dir, "numpy"),
+            dtype=settings.numpy_store_dtype,
+            max_clients=settings.chroma_max_open_clients,
+        )
+    raise ValueError(f"Unknown vector store backend: {name}")
+
+
+@lru_cache()
+def get_vector_store():
+    """Process-wide vector store shared by ingestion and query paths"""
+    return create_vector_store()
@@ -0,0 +1,131 @@
+# backend/services/warmup.py
+
+import importlib
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable
+
+from sqlalchemy import text
+from config import get_settings
+
+settings = get_settings()
+
+
+def warm_database():
+    from db.database import SessionLocal
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+
+
+def warm_tokenizer():
+    from services.chunking_service import get_tokenizer
+    get_tokenizer()
+
+
+def warm_models():
+    from services.embedding_cache import get_embedding_cache
+    from services.embedding_service import get_embedding_batcher
+    from services.openai_client import get_async_openai_client, get_openai_client
+    get_openai_client()
+    get_async_openai_client()
+    get_embedding_batcher()
+    get_embedding_cache()
+    # Imported by the rate limiter on the first completion
+    importlib.import_module("openai")
+
+
+def warm_parsers():
+    for module in ("PyPDF2", "docx"):
+        importlib.import_module(module)
+
+
+def warm_vector_store(client_ids: Iterable[int]):
+    """Open the stores of hot tenants and run one query on each, so no request pays for the first query"""
+    from services.vector_store import get_vector_store
+    if settings.vector_store_backend == "chroma":
+        from services.chroma_registry import warm_query_path
+        warm_query_path()
+    store = get_vector_store()
+    store.warm(client_ids)
+    for client_id in client_ids:
+        try:
+            collection = store.get_collection(client_id, create=False)
+            if collection is None:
+                continue
+            sample = collection.get(limit=1, include=["embeddings"])
+            if sample["ids"]:
+                collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+        except Exception as e:
+            print(f"Error warming vector store for client {client_id}: {e}")
+
+
+class Warmup:
+    """
+    Loads the heavy dependencies and backends that are otherwise initialized by
+    the first request, and tracks readiness.
+
+    The process serves /health as soon as it is up; /ready reports whether the
+    warm-up has finished. A failed step is recorded and left to lazy
+    initialization, so it does not keep the instance out of rotation.
+    """
+
+    def __init__(self, mode: str = "background", client_ids: Iterable[int] = ()):
+        self.mode = mode
+        self.steps = [
+            ("database", warm_database),
+            ("tokenizer", warm_tokenizer),
+            ("models", warm_models),
+            ("parsers", warm_parsers),
+            ("vector_store", lambda: warm_vector_store(client_ids)),
+        ]
+        self.started = time.monotonic()
+        self.status = "cold"
+        self.durations = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def run(self):
+        with self._lock:
+            if self.status != "cold":
+                return
+            self.status = "warming"
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                print(f"Warm-up step {name} failed: {e}")
+                self.errors[name] = str(e)
+            self.durations[name] = time.perf_counter() - start
+        self.status = "degraded" if self.errors else "warm"
+        print(f"Warm-up finished in {sum(self.durations.values()):.2f}s ({self.status})")
+
+    def start(self):
+        """Run the warm-up in a daemon thread"""
+        threading.Thread(target=self.run, name="warmup", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        return self.mode == "off" or self.status in ("warm", "degraded")
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "status": self.status,
+            "mode": self.mode,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "steps": {
+                name: {"seconds": round(seconds, 3), **({"error": self.errors[name]} if name in self.errors else {})}
+                for name, seconds in list(self.durations.items())
+            },
+        }
+
+    def stats(self) -> dict:
+        return {"ready": int(self.ready), **{f"{name}_seconds": seconds for name, seconds in list(self.durations.items())}}
+
+
+@lru_cache()
+def get_warmup() -> Warmup:
+    """Process-wide warm-up state, configured by STARTUP_PREWARM (background | blocking | off)"""
+    return Warmup(settings.startup_prewarm, settings.chroma_warm_client_ids)
@@ -0,0 +1,21 @@
+# backend/tests/conftest.py
+import uuid
+
+import pytest
+
+import init_db  # noqa: F401 - creates the tables in the test database
+from db.database import SessionLocal
+from models.client import Client
+
+
+@pytest.fixture
+def client_id():
+    """A new client, so each test starts with an empty corpus"""
+    db = SessionLocal()
+    try:
+        client = Client(name=f"test-{uuid.uuid4().hex}")
+        db.add(client)
+        db.commit()
+        return client.id
+    finally:
+        db.close()
@@ -0,0 +1,80 @@
+# backend/tests/test_answer_cache.py
+import pytest
+
+from services import answer_cache
+from services.ai_service import ask_question
+from services.answer_cache import AnswerCache, bump_corpus_version, get_corpus_version
+from services.vector_service import add_texts_to_vectorstore
+
+ANSWER = {"answer": "Thirty days.", "sources": []}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1_000_000.0}
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now["t"])
+    return now
+
+
+def test_keys_ignore_case_whitespace_and_chunk_order():
+    key = AnswerCache.make_key("What is the  notice period?", ["b", "a"], "v1")
+    assert key == AnswerCache.make_key("what is the notice period?", ["a", "b"], "v1")
+    assert key != AnswerCache.make_key("what is the notice period?", ["a", "b", "c"], "v1")
+    assert key != AnswerCache.make_key("what is the notice period?", ["a", "b"], "v2")
+
+
+def test_corpus_change_invalidates(client_id):
+    cache = AnswerCache()
+    cache.put(client_id, "k", ANSWER, "v1")
+    assert cache.get(client_id, "k") == ANSWER
+
+    # Another process changing the corpus only bumps the shared version
+    bump_corpus_version(client_id)
+    assert cache.get(client_id, "k") is None
+
+
+def test_answer_computed_before_a_change_is_not_served(client_id):
+    cache = AnswerCache()
+    version = get_corpus_version(client_id)
+    bump_corpus_version(client_id)  # e.g. an ingestion finishing while the answer was generated
+    cache.put(client_id, "k", ANSWER, "v1", corpus_version=version)
+    assert cache.get(client_id, "k") is None
+
+
+def test_versions_only_move_forward(client_id):
+    versions = [get_corpus_version(client_id)]
+    for _ in range(5):
+        bump_corpus_version(client_id)
+        versions.append(get_corpus_version(client_id))
+    assert versions == sorted(set(versions))
+
+
+def test_ttl_and_per_client_lru(client_id, clock):
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    for key in ("a", "b"):
+        cache.put(client_id, key, ANSWER, "v1")
+    cache.get(client_id, "a")
+    cache.put(client_id, "c", ANSWER, "v1")
+    assert cache.get(client_id, "b") is None
+    assert cache.get(client_id, "a") == ANSWER
+
+    clock["t"] += 61
+    assert cache.get(client_id, "a") is None
+
+
+def test_semantic_lookup_needs_threshold_and_same_variant(client_id):
+    cache = AnswerCache()
+    cache.put(client_id, "k", ANSWER, "v1", question_embedding=[1.0, 0.0])
+    assert cache.find_similar(client_id, [0.99, 0.05], "v1", threshold=0.95) == ANSWER
+    assert cache.find_similar(client_id, [0.6, 0.8], "v1", threshold=0.95) is None
+    assert cache.find_similar(client_id, [1.0, 0.0], "v2", threshold=0.95) is None
+
+
+def test_ingestion_invalidates_cached_answers(client_id):
+    metadata = {"source_type": "document", "filename": "lease.txt"}
+    add_texts_to_vectorstore(client_id, ["The notice period is thirty days."], [metadata])
+    assert ask_question(client_id, "What is the notice period?")["cached"] is False
+    assert ask_question(client_id, "what is the notice  period?")["cached"] == "exact"
+
+    add_texts_to_vectorstore(client_id, ["Rent is due monthly."], [{**metadata, "filename": "rent.txt"}])
+    assert ask_question(client_id, "What is the notice period?")["cached"] is False
@@ -0,0 +1,36 @@
+# backend/tests/test_batch_answers.py
+import asyncio
+
+from services import ai_service
+from services.ai_service import answer_batch
+from services.vector_service import add_texts_to_vectorstore
+
+
+def _collect(client_id, questions):
+    async def main():
+        return [item async for item in answer_batch(client_id, questions)]
+
+    return asyncio.run(main())
+
+
+def test_repeated_questions_are_answered_once(client_id, monkeypatch):
+    add_texts_to_vectorstore(client_id, ["Rent is 2,000 dollars a month.", "The landlord is Acme LLC."], [
+        {"source_type": "document", "filename": "lease.txt", "chunk_index": n} for n in range(2)
+    ])
+    completed = []
+    complete = ai_service.complete_answer_async
+
+    async def counting(client_id, question, prepared, scheduler=None):
+        completed.append(question)
+        return await complete(client_id, question, prepared, scheduler)
+
+    monkeypatch.setattr(ai_service, "complete_answer_async", counting)
+    questions = ["What is the rent?", "Who is the landlord?", "what is the  rent?", "WHAT IS THE RENT?\n"]
+    results = dict(_collect(client_id, questions))
+
+    assert sorted(completed) == ["What is the rent?", "Who is the landlord?"]
+    assert sorted(results) == [0, 1, 2, 3]
+    assert "error" not in results[0]
+    assert results[2]["answer"] == results[3]["answer"] == results[0]["answer"]
+    assert results[2]["duplicate_of"] == results[3]["duplicate_of"] == 0
+    assert "duplicate_of" not in results[0] and "duplicate_of" not in results[1]
@@ -0,0 +1,63 @@
+# backend/tests/test_bulk_ingest.py
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+from services.bulk_ingest_service import ingest_bulk_uploads, settings
+
+
+def _upload(name, content: bytes):
+    return UploadFile(file=io.BytesIO(content), filename=name)
+
+
+def _zip(members: dict, encrypted=()):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    data = bytearray(buffer.getvalue())
+    # zipfile can't write encrypted members, so set the flag in their local and central headers
+    with zipfile.ZipFile(io.BytesIO(bytes(data))) as archive:
+        central = archive.start_dir
+        for info in archive.infolist():
+            if info.filename in encrypted:
+                data[info.header_offset + 6] |= 0x1
+                data[central + 8] |= 0x1
+            central += 46 + sum(int.from_bytes(data[central + n:central + n + 2], "little") for n in (28, 30, 32))
+    return bytes(data)
+
+
+def _upload_dir(client_id):
+    path = os.path.join(settings.upload_dir, f"client_{client_id}")
+    return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+
+def test_duplicates_are_queued_once(client_id):
+    result = ingest_bulk_uploads(client_id, [
+        _upload("a.txt", b"Indemnification clause."),
+        _upload("bundle.zip", _zip({"copy-of-a.txt": b"Indemnification clause.", "b.txt": b"Term sheet.", "notes.rtf": b"x"})),
+    ])
+    assert result["summary"] == {"queued": 2, "duplicate": 1, "skipped": 1}
+    assert len(_upload_dir(client_id)) == 2
+
+
+def test_encrypted_member_leaves_nothing_staged(client_id):
+    archive = _zip({"a.txt": b"First.", "secret.txt": b"Second."}, encrypted={"secret.txt"})
+    with pytest.raises(RuntimeError):
+        ingest_bulk_uploads(client_id, [_upload("plain.txt", b"Plain."), _upload("bundle.zip", archive)])
+    assert _upload_dir(client_id) == []
+
+
+def test_read_error_leaves_nothing_staged(client_id):
+    class FailingStream(io.BytesIO):
+        def read(self, *args):
+            raise OSError("connection lost")
+
+    with pytest.raises(OSError):
+        ingest_bulk_uploads(client_id, [
+            _upload("plain.txt", b"Plain."), UploadFile(file=FailingStream(), filename="broken.pdf"),
+        ])
+    assert _upload_dir(client_id) == []
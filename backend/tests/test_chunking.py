@@ -0,0 +1,67 @@
+# backend/tests/test_chunking.py
+from services.chunking_service import chunk_text, count_tokens, iter_chunks
+
+
+def _contract(clauses=12):
+    sections = []
+    for n in range(1, clauses + 1):
+        body = " ".join(f"Clause {n}.{k} binds the parties to obligation {k} of section {n}." for k in range(1, 9))
+        sections.append(f"SECTION {n}. OBLIGATIONS\n{body}")
+    return "\n\n".join(sections)
+
+
+def test_offsets_point_into_the_source_text():
+    text = _contract()
+    chunks = chunk_text(text, chunk_size=120, chunk_overlap=30)
+    assert len(chunks) > 3
+    assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert text[chunk["start_offset"]:chunk["end_offset"]] == chunk["text"]
+        assert chunk["token_count"] == count_tokens(chunk["text"])
+
+
+def test_offsets_and_pages_span_segments():
+    pages = [_contract(2), _contract(3), "Signed by both parties."]
+    joined = "\n".join(pages)
+    chunks = list(iter_chunks([(page, number) for number, page in enumerate(pages, 1)], chunk_size=80, chunk_overlap=0))
+    for chunk in chunks:
+        assert joined[chunk["start_offset"]:chunk["end_offset"]] == chunk["text"]
+    assert chunks[0]["page_start"] == 1
+    assert chunks[-1]["page_end"] == 3
+    assert [chunk["page_start"] for chunk in chunks] == sorted(chunk["page_start"] for chunk in chunks)
+    # The short last page joins the chunk before it
+    assert (chunks[-1]["page_start"], chunks[-1]["page_end"]) == (2, 3)
+
+
+def test_consecutive_chunks_overlap_within_a_section():
+    text = " ".join(f"Sentence {n} of the recitals sets out fact {n}." for n in range(200))
+    chunks = chunk_text(text, chunk_size=100, chunk_overlap=25)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        shared = previous["end_offset"] - chunk["start_offset"]
+        assert shared > 0
+        assert count_tokens(text[chunk["start_offset"]:previous["end_offset"]]) <= 25
+        assert chunk["token_count"] <= 100 + 10  # units fit the budget; joining whitespace adds a little
+
+
+def test_no_overlap_when_disabled():
+    text = " ".join(f"Sentence {n} of the recitals sets out fact {n}." for n in range(200))
+    chunks = chunk_text(text, chunk_size=100, chunk_overlap=0)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start_offset"] > previous["end_offset"]
+
+
+def test_sections_start_new_chunks_without_overlap():
+    chunks = chunk_text(_contract(), chunk_size=300, chunk_overlap=50)
+    starts = [chunk for chunk in chunks if chunk["text"].startswith("SECTION")]
+    assert len(starts) >= len(chunks) - 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        if chunk["text"].startswith("SECTION"):
+            assert chunk["start_offset"] > previous["end_offset"]
+
+
+def test_oversized_sentence_is_split_into_word_windows():
+    text = " ".join(f"cell{n}" for n in range(2000))
+    chunks = chunk_text(text, chunk_size=100, chunk_overlap=0)
+    assert len(chunks) > 5
+    assert all(chunk["token_count"] <= 100 for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks).split() == text.split()
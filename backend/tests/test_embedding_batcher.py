@@ -0,0 +1,109 @@
+# backend/tests/test_embedding_batcher.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.embedding_service import EmbeddingBatcher, StubEmbeddingBackend
+
+
+class RecordingBackend(StubEmbeddingBackend):
+    def __init__(self, **kwargs):
+        super().__init__(dimensions=16, **kwargs)
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        return super().embed(texts)
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(backend, **kwargs):
+        batcher = EmbeddingBatcher(backend, **kwargs)
+        batchers.append(batcher)
+        return batcher
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def test_concurrent_callers_share_batches(make_batcher):
+    backend = RecordingBackend(request_latency_ms=20)
+    batcher = make_batcher(backend, max_wait_ms=50, max_concurrent_batches=1)
+    requests = [[f"caller {n} text {k}" for k in range(4)] for n in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(batcher.embed, requests))
+
+    for texts, vectors in zip(requests, results):
+        assert vectors == [backend.embed_one(text) for text in texts]
+    assert batcher.texts_embedded == 32
+    assert len(backend.batches) < 8
+
+
+def test_batches_respect_input_and_token_limits(make_batcher):
+    backend = RecordingBackend()
+    batcher = make_batcher(backend, max_batch_inputs=3, max_batch_tokens=12, max_wait_ms=50)
+    texts = [f"one two three four {n}" for n in range(10)]  # 5 approximate tokens or fewer each
+    assert batcher.embed(texts) == [backend.embed_one(text) for text in texts]
+    assert all(len(batch) <= 3 for batch in backend.batches)
+    assert sum(len(batch) for batch in backend.batches) == 10
+    assert len(backend.batches) >= 5  # two texts per batch fit the token cap
+
+
+def test_backend_errors_reach_every_caller(make_batcher):
+    class FailingBackend:
+        model = "failing"
+
+        def embed(self, texts):
+            raise ConnectionError("embedding API unavailable")
+
+    batcher = make_batcher(FailingBackend(), max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(batcher.embed, [f"text {n}"]) for n in range(3)]
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result()
+
+
+def test_vector_count_mismatch_is_an_error(make_batcher):
+    class ShortBackend(StubEmbeddingBackend):
+        def embed(self, texts):
+            return super().embed(texts)[:-1]
+
+    batcher = make_batcher(ShortBackend(dimensions=8), max_wait_ms=20)
+    with pytest.raises(ValueError, match="returned 1 vectors for 2 texts"):
+        batcher.embed(["first", "second"])
+
+
+def test_embed_times_out(make_batcher):
+    release = threading.Event()
+
+    class StuckBackend(StubEmbeddingBackend):
+        def embed(self, texts):
+            release.wait(5)
+            return super().embed(texts)
+
+    batcher = make_batcher(StuckBackend(dimensions=8), max_wait_ms=1, timeout_seconds=0.2)
+    with pytest.raises(TimeoutError, match="timed out after 0.2s"):
+        batcher.embed(["slow"])
+    release.set()
+
+
+def test_close_sends_queued_texts():
+    backend = RecordingBackend()
+    batcher = EmbeddingBatcher(backend, max_wait_ms=5000, timeout_seconds=5)
+    result = {}
+    caller = threading.Thread(target=lambda: result.update(vectors=batcher.embed(["queued"])))
+    caller.start()
+    time.sleep(0.1)  # the dispatcher now holds the text, in a batch window that outlasts the test
+    started = time.monotonic()
+    batcher.close()
+    assert time.monotonic() - started < 1
+    caller.join(2)
+    assert result["vectors"] == [backend.embed_one("queued")]
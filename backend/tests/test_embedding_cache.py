@@ -0,0 +1,66 @@
+# backend/tests/test_embedding_cache.py
+import itertools
+
+import pytest
+
+from services import embedding_cache, vector_service
+from services.embedding_cache import EmbeddingCache
+from services.embedding_service import EmbeddingBatcher, StubEmbeddingBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing time.time(), so least-recently-used order is unambiguous"""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_hits_misses_and_normalization(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get_many("m", ["alpha"]) == [None]
+    cache.put_many("m", ["alpha"], [[0.5, -0.25]])
+
+    assert cache.get_many("m", ["alpha", "  alpha\n", "beta"]) == [[0.5, -0.25], [0.5, -0.25], None]
+    assert cache.get_many("other-model", ["alpha"]) == [None]
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 3
+
+
+def test_entries_persist_across_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(path).put_many("m", ["alpha", "beta"], [[1.0], [2.0]])
+    reopened = EmbeddingCache(path)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.get_many("m", ["beta"]) == [[2.0]]
+
+
+def test_least_recently_used_are_evicted(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    for n in range(10):
+        cache.put_many("m", [f"text {n}"], [[float(n)]])
+    cache.get_many("m", ["text 0", "text 1"])  # used again, so they outlive texts 2 and 3
+
+    cache.put_many("m", ["text 10"], [[10.0]])
+    assert cache.stats()["entries"] == 9
+    kept = cache.get_many("m", [f"text {n}" for n in range(11)])
+    assert [n for n, vector in enumerate(kept) if vector is None] == [2, 3]
+
+
+def test_get_embeddings_embeds_each_new_text_once(tmp_path, monkeypatch):
+    backend = StubEmbeddingBackend(dimensions=8)
+    batcher = EmbeddingBatcher(backend, max_wait_ms=1)
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(vector_service, "get_embedding_batcher", lambda: batcher)
+    monkeypatch.setattr(vector_service, "get_embedding_cache", lambda: cache)
+    try:
+        first = vector_service.get_embeddings(["lease", "lease ", "deposit"])
+        assert batcher.texts_embedded == 2
+        assert first[0] == first[1]
+
+        second = vector_service.get_embeddings(["deposit", "lease", "notice"])
+        assert batcher.texts_embedded == 3
+        # Served from the cache as float32, so equal up to rounding
+        assert second[0] == pytest.approx(first[2])
+        assert second[1] == pytest.approx(first[0])
+    finally:
+        batcher.close()
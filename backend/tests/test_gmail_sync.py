@@ -0,0 +1,106 @@
+# backend/tests/test_gmail_sync.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.gmail_api import FakeGmailApi
+from services.gmail_service import gmail_service, settings
+
+
+def _deliver(api, count, start=0):
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        api.add_message(
+            thread_id=f"thread{n // 3}", sender="opposing@counsel.com", recipient="me@lexsy.com",
+            subject=f"Matter {n // 3}", body=f"Message {n} about the lease terms.", date=base + timedelta(hours=n),
+        )
+        for n in range(start, start + count)
+    ]
+
+
+@pytest.fixture
+def small_pages(monkeypatch):
+    monkeypatch.setattr(settings, "gmail_page_size", 2)
+    monkeypatch.setattr(settings, "gmail_max_pages", 2)
+
+
+def test_full_sync_then_incremental(client_id):
+    api = FakeGmailApi()
+    _deliver(api, 5)
+
+    full = gmail_service.sync_mailbox(client_id, api=api)
+    assert full["mode"] == "full"
+    assert full["emails_processed"] == 5
+    assert not full["has_more"]
+    assert full["checkpoint"] == int(api.get_profile()["historyId"])
+
+    _deliver(api, 2, start=5)
+    listed = api.calls["list_messages"]
+    incremental = gmail_service.sync_mailbox(client_id, api=api)
+    assert incremental["mode"] == "incremental"
+    assert incremental["previous_checkpoint"] == full["checkpoint"]
+    assert incremental["emails_processed"] == 2
+    assert incremental["checkpoint"] == int(api.get_profile()["historyId"])
+    assert api.calls["list_messages"] == listed
+
+
+def test_full_sync_resumes_past_page_cap(client_id, small_pages):
+    api = FakeGmailApi()
+    delivered = _deliver(api, 9)
+    start_history_id = int(api.get_profile()["historyId"])
+
+    first = gmail_service.sync_mailbox(client_id, api=api)
+    assert first["mode"] == "full"
+    assert first["emails_processed"] == 4
+    assert first["has_more"]
+    assert first["checkpoint"] is None
+    assert gmail_service.get_checkpoint(client_id) is None
+
+    # Delivered mid-sync: not in the remaining listing pages, picked up from history afterwards
+    late = _deliver(api, 1, start=9)
+    second = gmail_service.sync_mailbox(client_id, api=api)
+    assert second["mode"] == "full"
+    assert second["has_more"]
+
+    third = gmail_service.sync_mailbox(client_id, api=api)
+    assert third["mode"] == "full"
+    assert not third["has_more"]
+    assert third["checkpoint"] == start_history_id
+    assert gmail_service.get_full_sync_progress(client_id) is None
+
+    incremental = gmail_service.sync_mailbox(client_id, api=api)
+    assert incremental["mode"] == "incremental"
+    total = sum(result["emails_processed"] for result in (first, second, third, incremental))
+    assert total == len(delivered) + len(late)
+
+
+def test_incremental_sync_reports_page_cap(client_id, small_pages):
+    api = FakeGmailApi()
+    _deliver(api, 1)
+    gmail_service.sync_mailbox(client_id, api=api)
+    _deliver(api, 6, start=1)
+
+    first = gmail_service.sync_mailbox(client_id, api=api)
+    assert first["mode"] == "incremental"
+    assert first["has_more"]
+    assert first["emails_processed"] == 4
+    second = gmail_service.sync_mailbox(client_id, api=api)
+    assert not second["has_more"]
+    assert second["emails_processed"] == 2
+
+
+def test_already_ingested_messages_are_skipped(client_id):
+    api = FakeGmailApi()
+    _deliver(api, 3)
+    thread = gmail_service.ingest_gmail_thread(client_id, "thread0", api=api)
+    assert thread["emails_processed"] == 3
+
+    fetched = api.calls["get_message"]
+    again = gmail_service.ingest_gmail_thread(client_id, "thread0", api=api)
+    assert again["emails_processed"] == 0
+    assert again["emails_skipped"] == 3
+
+    full = gmail_service.sync_mailbox(client_id, api=api)
+    assert full["emails_processed"] == 0
+    assert full["emails_skipped"] == 3
+    assert api.calls["get_message"] == fetched
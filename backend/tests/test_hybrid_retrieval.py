@@ -0,0 +1,117 @@
+# backend/tests/test_hybrid_retrieval.py
+import sqlite3
+import threading
+
+import pytest
+
+from services import lexical_index
+from services.lexical_index import build_match_query, reciprocal_rank_fusion
+from services.vector_service import add_texts_to_vectorstore, similarity_search
+
+
+def _rows(texts, source_id="doc"):
+    return [(f"{source_id}:{n}", source_id, n, text) for n, text in enumerate(texts)]
+
+
+def test_match_query_drops_stopwords_and_repeats():
+    assert build_match_query("What is the indemnity cap? The CAP!") == '"indemnity" OR "cap"'
+    assert build_match_query("what is the") == ""
+
+
+def test_bm25_ranks_matching_chunks(client_id):
+    lexical_index.upsert_chunks(client_id, _rows([
+        "The tenant pays rent monthly.",
+        "Indemnification: the supplier indemnifies the buyer against indemnity claims.",
+        "Governing law is Delaware.",
+    ]))
+    results = lexical_index.search(client_id, "indemnity claims")
+    assert [chunk_id for chunk_id, _ in results] == ["doc:1"]
+    # Porter stemming matches other forms of a word
+    assert [chunk_id for chunk_id, _ in lexical_index.search(client_id, "governed")] == ["doc:2"]
+    assert lexical_index.search(client_id, "arbitration") == []
+
+
+def test_bm25_prefers_more_specific_chunks(client_id):
+    lexical_index.upsert_chunks(client_id, _rows([
+        "Termination for convenience on thirty days notice.",
+        "Termination.",
+        "Notice periods and notice addresses.",
+    ]))
+    ranked = [chunk_id for chunk_id, _ in lexical_index.search(client_id, "termination notice")]
+    assert ranked[0] == "doc:0"
+    assert set(ranked) == {"doc:0", "doc:1", "doc:2"}
+
+
+def test_upserts_replace_text_and_stale_chunks_are_removed(client_id):
+    lexical_index.upsert_chunks(client_id, _rows(["Escrow release.", "Escrow agent fees.", "Escrow account."]))
+    lexical_index.upsert_chunks(client_id, _rows(["Deposit release."]))
+    lexical_index.delete_stale_chunks(client_id, "doc", 1)
+    assert lexical_index.search(client_id, "escrow") == []
+    assert [chunk_id for chunk_id, _ in lexical_index.search(client_id, "deposit")] == ["doc:0"]
+
+
+def test_search_restricted_to_sources(client_id):
+    lexical_index.upsert_chunks(client_id, _rows(["Warranty period."], "a") + _rows(["Warranty claims."], "b"))
+    assert [chunk_id for chunk_id, _ in lexical_index.search(client_id, "warranty", source_ids=["b"])] == ["b:0"]
+    assert lexical_index.search(client_id, "warranty", source_ids=[]) == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    scores = dict(fused)
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert [item_id for item_id, _ in fused] == ["a", "c", "b"]
+
+
+def test_hybrid_search_finds_exact_terms(client_id):
+    filler = [f"General provision {n} about the obligations of the parties under this agreement." for n in range(30)]
+    texts = filler + ["Schedule Q7 lists the Zephyrine trademark licence fees."]
+    add_texts_to_vectorstore(client_id, texts, [
+        {"source_type": "document", "filename": "agreement.txt", "chunk_index": n} for n in range(len(texts))
+    ])
+    results = similarity_search(client_id, "Zephyrine licence fees", k=3, mode="hybrid")
+    assert "Zephyrine" in results["documents"][0][0]
+    scores = results["scores"][0]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_connections_are_reused_per_thread(client_id, monkeypatch):
+    first = lexical_index._connect(client_id)
+    assert lexical_index._connect(client_id) is first
+    assert lexical_index.index_path(client_id) in lexical_index._initialized
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(lexical_index._connect(client_id)))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+    # Beyond the per-thread cap the least recently used connection is closed
+    monkeypatch.setattr(lexical_index, "MAX_CONNECTIONS_PER_THREAD", 2)
+    lexical_index._connect(client_id + 100_000)
+    lexical_index._connect(client_id + 200_000)
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute("SELECT 1")
+    assert lexical_index._connect(client_id) is not first
+
+
+def test_concurrent_writers_and_readers(client_id):
+    errors = []
+
+    def work(worker_id):
+        try:
+            for n in range(20):
+                lexical_index.upsert_chunks(client_id, _rows([f"Easement number {n} granted."], f"w{worker_id}"))
+                lexical_index.search(client_id, "easement")
+        except Exception as e:  # noqa: BLE001 - collected and asserted below
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(lexical_index.search(client_id, "easement", k=100)) == 6
@@ -0,0 +1,74 @@
+# backend/tests/test_ingestion_jobs.py
+import hashlib
+
+from sqlalchemy import update
+
+from db.database import SessionLocal
+from models.ingestion_job import IngestionJob
+from services import ingestion_service
+from services.ingestion_service import client_upload_path, enqueue_files, get_ingestion_workers, get_job
+
+
+def _enqueue(client_id, filename, content: bytes):
+    ext = filename.rsplit(".", 1)[-1]
+    path = client_upload_path(client_id, ext)
+    with open(path, "wb") as f:
+        f.write(content)
+    return enqueue_files(client_id, [{
+        "filename": filename, "file_type": ext, "path": path,
+        "content_hash": hashlib.sha256(content).hexdigest(),
+    }])[0]["job_id"]
+
+
+def _run(job_id):
+    """Claim one specific job the way a worker does, then run it"""
+    db = SessionLocal()
+    try:
+        db.execute(update(IngestionJob).where(IngestionJob.id == job_id)
+                   .values(status="running", attempts=IngestionJob.attempts + 1))
+        db.commit()
+    finally:
+        db.close()
+    get_ingestion_workers().run_job(job_id)
+    return get_job(job_id)
+
+
+def test_unparseable_file_fails_without_retry(client_id):
+    job = _run(_enqueue(client_id, "scan.pdf", b"%PDF-1.4 truncated"))
+    assert job["status"] == "failed"
+    assert job["attempts"] == 1
+    assert job["error"].startswith("Could not parse the pdf file")
+
+
+def test_transient_error_is_retried(client_id, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("embedding service unavailable")
+
+    monkeypatch.setattr(ingestion_service, "ingest_document_file", unavailable)
+    job_id = _enqueue(client_id, "notes.txt", b"Lease renewal terms.")
+    job = _run(job_id)
+    assert job["status"] == "queued"
+    assert job["error"] == "embedding service unavailable"
+
+    monkeypatch.undo()
+    job = _run(job_id)
+    assert job["status"] == "completed"
+    assert job["chunks"] == 1
+
+
+def test_failed_attempt_leaves_no_chunks(client_id, monkeypatch):
+    from services import document_service, lexical_index
+    from services.vector_service import get_client_vectordb
+
+    def fail_after_indexing(client_id, groups):
+        raise ConnectionError("connection reset")
+
+    # Fails once every chunk is in the vector store, in batches of one
+    monkeypatch.setattr(document_service.settings, "ingest_batch_chunks", 1)
+    monkeypatch.setattr(document_service, "update_source_vectors", fail_after_indexing)
+    text = "\n\n".join(f"Clause {n}. " + "The tenant shall maintain the premises. " * 80 for n in range(4))
+    job = _run(_enqueue(client_id, "lease.txt", text.encode()))
+    assert job["status"] == "queued"
+
+    assert get_client_vectordb(client_id).get()["ids"] == []
+    assert lexical_index.search(client_id, "tenant premises") == []
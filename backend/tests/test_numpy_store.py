@@ -0,0 +1,116 @@
+# backend/tests/test_numpy_store.py
+import threading
+
+import numpy as np
+import pytest
+
+from services import numpy_store
+from services.numpy_store import NumpyCollection, NumpyStoreRegistry
+
+
+def _vectors(n, dimensions=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dimensions)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 1.5 / 127)])
+def test_round_trip_through_reopen(tmp_path, dtype, tolerance):
+    vectors = _vectors(50)
+    collection = NumpyCollection(str(tmp_path), dtype)
+    collection.upsert(
+        ids=[f"c{n}" for n in range(50)], embeddings=vectors,
+        documents=[f"text {n}" for n in range(50)], metadatas=[{"n": n, "even": n % 2 == 0} for n in range(50)],
+    )
+
+    reopened = NumpyCollection(str(tmp_path))
+    assert reopened.dtype == dtype
+    stored = reopened.get(ids=["c3", "c7"], include=["embeddings", "documents", "metadatas"])
+    assert stored["ids"] == ["c3", "c7"]
+    assert stored["documents"] == ["text 3", "text 7"]
+    assert stored["metadatas"] == [{"n": 3, "even": False}, {"n": 7, "even": False}]
+    # float16 error is relative to each value, int8 error to the row's largest magnitude
+    error = np.abs(np.array(stored["embeddings"]) - vectors[[3, 7]])
+    scale = np.abs(vectors[[3, 7]]) if dtype == "float16" else np.abs(vectors[[3, 7]]).max(axis=1, keepdims=True)
+    assert (error <= tolerance * scale + 1e-6).all()
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_query_matches_exact_search(tmp_path, dtype):
+    vectors = _vectors(300, seed=1)
+    collection = NumpyCollection(str(tmp_path), dtype)
+    collection.upsert(ids=[f"c{n}" for n in range(300)], embeddings=vectors, metadatas=[{"n": n} for n in range(300)])
+
+    queries = vectors[:5] + 0.01 * _vectors(5, seed=2)
+    results = collection.query(queries, n_results=3)
+    for query, ids, distances in zip(queries, results["ids"], results["distances"]):
+        exact = ((vectors - query) ** 2).sum(axis=1)
+        assert ids[0] == f"c{int(np.argmin(exact))}"
+        assert distances == sorted(distances)
+        assert distances[0] == pytest.approx(float(exact.min()), rel=0.05, abs=0.05)
+
+    filtered = collection.query(queries[:1], n_results=5, where={"n": {"$gte": 250}})
+    assert all(metadata["n"] >= 250 for metadata in filtered["metadatas"][0])
+
+
+def test_upserts_deletes_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(numpy_store, "COMPACT_MIN_DEAD_ROWS", 10)
+    collection = NumpyCollection(str(tmp_path))
+    ids = [f"c{n}" for n in range(20)]
+    collection.upsert(ids=ids, embeddings=_vectors(20), documents=["v1"] * 20, metadatas=[{"n": n} for n in range(20)])
+    collection.upsert(ids=ids[:5], embeddings=_vectors(5, seed=3), documents=["v2"] * 5)
+    assert collection.count() == 20
+    assert collection.get(ids=["c0", "c19"])["documents"] == ["v2", "v1"]
+
+    # 15 dead rows against 10 live ones: compacted
+    collection.delete(where={"n": {"$gte": 10}})
+    assert collection.count() == 10
+    assert len(collection._ids) == 10
+    collection.delete(ids=ids[5:10])
+    assert collection.count() == 5
+
+    reopened = NumpyCollection(str(tmp_path))
+    assert sorted(reopened.get()["ids"]) == sorted(ids[:5])
+    assert reopened.get(ids=["c3"])["documents"] == ["v2"]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    collection = NumpyCollection(str(tmp_path))
+    collection.upsert(ids=["a"], embeddings=_vectors(1, dimensions=8))
+    with pytest.raises(ValueError, match="dimension 16 does not match 8"):
+        collection.upsert(ids=["b"], embeddings=_vectors(1, dimensions=16))
+
+
+def test_registry_eviction_under_concurrent_upserts(tmp_path):
+    # One open slot for three tenants, so collections are dropped while threads still write to them
+    registry = NumpyStoreRegistry(str(tmp_path), max_clients=1)
+    tenants, threads, upserts = 3, 8, 80
+    errors = []
+
+    def worker(worker_id):
+        rng = np.random.default_rng(worker_id)
+        try:
+            for i in range(upserts):
+                client_id = (worker_id + i) % tenants
+                # Every other write re-upserts an ID already written by this worker
+                key = f"w{worker_id}-{i - i % 2}"
+                registry.get_collection(client_id).upsert(
+                    ids=[key], embeddings=rng.random((1, 8), dtype=np.float32),
+                    documents=[key], metadatas=[{"worker": worker_id}],
+                )
+        except Exception as e:  # noqa: BLE001 - collected and asserted below
+            errors.append(e)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    assert errors == []
+    expected = {client_id: set() for client_id in range(tenants)}
+    for worker_id in range(threads):
+        for i in range(upserts):
+            expected[(worker_id + i) % tenants].add(f"w{worker_id}-{i - i % 2}")
+    for client_id, ids in expected.items():
+        reopened = NumpyCollection(registry.path_for(client_id))
+        assert reopened.count() == len(ids)
+        assert set(reopened.get()["ids"]) == ids
@@ -0,0 +1,107 @@
+# backend/tests/test_rate_limiter.py
+import asyncio
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from services import rate_limiter
+from services.rate_limiter import CompletionScheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic time that the scheduler's sleeps advance instantly"""
+    now = {"t": 1000.0}
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        now["t"] += max(seconds, 0)
+        await real_sleep(0)
+
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now["t"])
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", sleep)
+    return now
+
+
+def _rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def _run_all(scheduler, count, tokens=0, clock=None):
+    started = []
+
+    async def call():
+        started.append(clock["t"] if clock else None)
+        return len(started)
+
+    async def main():
+        return await asyncio.gather(*(scheduler.run(call, tokens) for _ in range(count)))
+
+    return asyncio.run(main()), started
+
+
+def test_requests_per_minute(clock):
+    scheduler = CompletionScheduler(requests_per_minute=60)
+    results, started = _run_all(scheduler, 65, clock=clock)
+    assert sorted(results) == list(range(1, 66))
+    # A full bucket admits a minute's worth at once; the rest follow at one per second
+    assert started[59] == 1000.0
+    assert started[64] == pytest.approx(1005.0)
+
+
+def test_tokens_per_minute(clock):
+    scheduler = CompletionScheduler(tokens_per_minute=600)
+    _, started = _run_all(scheduler, 8, tokens=100, clock=clock)
+    assert started[5] == 1000.0
+    assert started[6] == pytest.approx(1010.0)
+    assert started[7] == pytest.approx(1020.0)
+
+    # Tokens known only after the call count too
+    scheduler.charge(600)
+    assert scheduler.stats()["tokens_available"] == pytest.approx(-600.0)  # 800 taken, 200 refilled, 600 charged
+
+
+def test_concurrency_cap():
+    scheduler = CompletionScheduler(max_concurrency=2)
+    running = {"now": 0, "peak": 0}
+
+    async def call():
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+
+    async def main():
+        await asyncio.gather(*(scheduler.run(call) for _ in range(6)))
+
+    asyncio.run(main())
+    assert running["peak"] == 2
+
+
+def test_rate_limit_pauses_for_retry_after(clock):
+    scheduler = CompletionScheduler(max_retries=2)
+    attempts = []
+
+    async def call():
+        attempts.append(clock["t"])
+        if len(attempts) == 1:
+            raise _rate_limit_error(retry_after=7)
+        return "ok"
+
+    assert asyncio.run(scheduler.run(call)) == "ok"
+    assert attempts == [1000.0, pytest.approx(1007.0)]
+    assert scheduler.rate_limited == 1
+
+
+def test_rate_limit_retries_are_bounded(clock):
+    scheduler = CompletionScheduler(max_retries=2)
+
+    async def call():
+        raise _rate_limit_error()
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(scheduler.run(call))
+    assert scheduler.rate_limited == 3
@@ -0,0 +1,53 @@
+# backend/tests/test_source_index.py
+import threading
+
+import numpy as np
+
+from services import source_index
+from services.numpy_store import NumpyCollection, NumpyStoreRegistry
+from services.vector_service import make_chunk_id
+
+
+def _add_document(chunks, source_id, n_chunks, rng):
+    chunks.upsert(
+        ids=[make_chunk_id(source_id, index) for index in range(n_chunks)],
+        embeddings=rng.random((n_chunks, 8), dtype=np.float32),
+        documents=[f"{source_id} {index}" for index in range(n_chunks)],
+        metadatas=[{"source_id": source_id, "source_type": "document", "chunk_index": index} for index in range(n_chunks)],
+    )
+
+
+def test_rebuild_concurrent_with_updates(tmp_path, monkeypatch):
+    store = NumpyStoreRegistry(str(tmp_path / "sources"), max_clients=1)
+    monkeypatch.setattr(source_index, "get_source_store", lambda: store)
+    chunks = NumpyCollection(str(tmp_path / "chunks"))
+    errors = []
+
+    def writer(worker_id):
+        rng = np.random.default_rng(worker_id)
+        try:
+            for i in range(20):
+                source_id = f"doc-{worker_id}-{i}"
+                _add_document(chunks, source_id, 3, rng)
+                source_index.update_groups(1, chunks, [source_id])
+        except Exception as e:  # noqa: BLE001 - collected and asserted below
+            errors.append(e)
+
+    def rebuilder():
+        try:
+            for _ in range(10):
+                source_index.rebuild(1, chunks)
+        except Exception as e:  # noqa: BLE001 - collected and asserted below
+            errors.append(e)
+
+    pool = [threading.Thread(target=writer, args=(n,)) for n in range(4)] + [threading.Thread(target=rebuilder)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    assert errors == []
+    expected = {f"doc-{worker_id}-{i}" for worker_id in range(4) for i in range(20)}
+    reopened = NumpyCollection(store.path_for(1))
+    assert set(reopened.get()["ids"]) == expected
+    assert store.get_collection(1).count() == len(expected)
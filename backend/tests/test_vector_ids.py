@@ -0,0 +1,46 @@
+# backend/tests/test_vector_ids.py
+from services import lexical_index
+from services.document_service import document_source_id, index_document
+from services.vector_service import add_texts_to_vectorstore, get_client_vectordb, make_chunk_id, make_source_id
+
+
+def _segments(paragraphs):
+    return [("\n\n".join(f"Paragraph {n}. " + "The landlord shall repair the roof. " * 60 for n in range(paragraphs)), None)]
+
+
+def _stored_ids(client_id, source_id):
+    return sorted(get_client_vectordb(client_id).get(where={"source_id": source_id})["ids"])
+
+
+def test_source_ids_are_stable():
+    email = {"source_type": "email", "sender": "a@x.com", "recipient": "b@x.com", "date_sent": "2024-01-02", "subject": "Lease"}
+    assert make_source_id(email, "body") == make_source_id(dict(email), "body")
+    assert make_source_id(email, "body") != make_source_id(email, "other body")
+    assert document_source_id(1) == make_source_id({"document_id": 1, "source_type": "document"}, "")
+    # Two uploads with one filename are two sources
+    assert document_source_id(1) != document_source_id(2)
+    assert make_source_id({"source_id": "explicit"}, "text") == "explicit"
+
+
+def test_reupserting_a_source_overwrites_its_chunks(client_id):
+    metadatas = [{"source_type": "document", "filename": "nda.txt", "chunk_index": n} for n in range(3)]
+    ids = add_texts_to_vectorstore(client_id, ["one", "two", "three"], metadatas)
+    source_id = make_source_id(metadatas[0], "")
+    assert ids == [make_chunk_id(source_id, n) for n in range(3)]
+
+    again = add_texts_to_vectorstore(client_id, ["one v2", "two v2", "three v2"], metadatas)
+    assert again == ids
+    stored = get_client_vectordb(client_id).get(ids=ids)
+    assert sorted(stored["documents"]) == ["one v2", "three v2", "two v2"]
+
+
+def test_reindexing_a_shorter_version_removes_stale_chunks(client_id):
+    source_id = document_source_id(10_000 + client_id)
+    long = index_document(client_id, source_id, "lease.txt", _segments(12))
+    assert _stored_ids(client_id, source_id) == sorted(make_chunk_id(source_id, n) for n in range(long["chunks"]))
+
+    short = index_document(client_id, source_id, "lease.txt", _segments(2))
+    assert short["chunks"] < long["chunks"]
+    assert _stored_ids(client_id, source_id) == sorted(make_chunk_id(source_id, n) for n in range(short["chunks"]))
+    lexical = {chunk_id for chunk_id, _ in lexical_index.search(client_id, "landlord roof", k=100)}
+    assert lexical == set(_stored_ids(client_id, source_id))